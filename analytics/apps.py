@@ -2,4 +2,14 @@ from django.apps import AppConfig
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'analytics' 
\ No newline at end of file
+    name = 'analytics'
+
+    def ready(self):
+        # Invalidation du cache des prédictions (analytics/prediction_cache.py)
+        import analytics.signals  # noqa: F401
+
+        from django.conf import settings
+        if getattr(settings, 'ML_PRELOAD_MODELS', False):
+            # Modèles actifs (et forêts aplaties) chargés au démarrage plutôt qu'à la première requête
+            from ml.inference import preload_models
+            preload_models()
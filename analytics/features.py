@@ -0,0 +1,176 @@
+"""
+Variables explicatives des projets pour les prédictions, calculées en lot.
+
+Une requête (Projet LEFT JOIN ProjectStats) alimente la matrice de variables
+de N projets; deux agrégats groupés par projet y ajoutent l'équipe (membres)
+et les signaux des risques ouverts (modèles enrichis). Les calculs (durées,
+ratios) sont vectorisés avec NumPy. Les statistiques absentes sont
+reconstruites en un lot puis relues, soit au plus cinq requêtes quel que soit N.
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+import numpy as np
+from django.db.models import Count, Q
+
+from projects.models import Projet, ProjectStats, Risque
+from projects.services import ProjectStatsService
+
+# Colonnes de la matrice, dans l'ordre
+FEATURE_COLUMNS = (
+    'planned_days', 'days_elapsed', 'days_left', 'progress_ratio', 'budget_ratio', 'nb_risques',
+    'team_size', 'open_risks', 'permit_signals', 'supply_signals',
+)
+INTEGER_COLUMNS = (
+    'planned_days', 'days_elapsed', 'days_left', 'nb_risques',
+    'team_size', 'open_risks', 'permit_signals', 'supply_signals',
+)
+
+# Risques ouverts signalant un retard administratif ou d'approvisionnement (nom ou description)
+PERMIT_KEYWORDS = ('permis', 'autorisation', 'administratif')
+SUPPLY_KEYWORDS = ('approvisionnement', 'fournisseur', 'livraison', 'matériau', 'materiau')
+
+_STATS_FIELDS = (
+    ['stats__pk']
+    + [f'stats__{column}' for column in ProjectStats.PHASE_COLUMNS.values()]
+    + [f'stats__{column}' for column in ProjectStats.RISQUE_COLUMNS.values()]
+    + ['stats__budget_reel_total']
+)
+_FIELDS = ['id', 'statut', 'date_debut', 'date_fin_prevue', 'budget_prevue', 'budget_reel', 'chef_projet_id'] + _STATS_FIELDS
+
+
+class PortfolioFeatures(NamedTuple):
+    """Matrice de variables d'un portefeuille: ligne i = projet ids[i]"""
+    ids: np.ndarray
+    matrix: np.ndarray  # float64, colonnes FEATURE_COLUMNS
+    statuts: list
+
+    def column(self, name):
+        return self.matrix[:, FEATURE_COLUMNS.index(name)]
+
+    def row(self, index):
+        """Variables d'un projet au format dict (compatible avec les vues existantes)"""
+        values = dict(zip(FEATURE_COLUMNS, self.matrix[index].tolist()))
+        for name in INTEGER_COLUMNS:
+            values[name] = int(values[name])
+        values['statut'] = self.statuts[index]
+        return values
+
+    def index_of(self, projet_id):
+        positions = np.flatnonzero(self.ids == projet_id)
+        return int(positions[0]) if positions.size else None
+
+
+def _fetch(queryset):
+    return list(queryset.values_list(*_FIELDS))
+
+
+def _mentions(keywords):
+    condition = Q()
+    for keyword in keywords:
+        condition |= Q(nom__icontains=keyword) | Q(description__icontains=keyword)
+    return condition
+
+
+def _team_and_risks(queryset):
+    """{projet_id: nombre de membres}, {projet_id: (ouverts, permis, approvisionnement)}"""
+    projet_ids = queryset.values('id')
+    members = dict(
+        Projet.membres.through.objects.filter(projet_id__in=projet_ids)
+        .values('projet_id').annotate(n=Count('user_id')).values_list('projet_id', 'n')
+    )
+    risks = {
+        row[0]: row[1:]
+        for row in Risque.objects.filter(projet_id__in=projet_ids, date_resolution__isnull=True)
+        .values('projet_id')
+        .annotate(
+            ouverts=Count('id'),
+            permis=Count('id', filter=_mentions(PERMIT_KEYWORDS)),
+            approvisionnement=Count('id', filter=_mentions(SUPPLY_KEYWORDS)),
+        )
+        .values_list('projet_id', 'ouverts', 'permis', 'approvisionnement')
+    }
+    return members, risks
+
+
+def portfolio_features(projets=None, today: Optional[date] = None) -> PortfolioFeatures:
+    """Variables de tous les projets du queryset (ou d'une liste d'ids), ordonnés par id"""
+    if projets is None:
+        queryset = Projet.objects.all()
+    elif hasattr(projets, 'values_list'):
+        queryset = projets
+    else:
+        queryset = Projet.objects.filter(id__in=list(projets))
+    queryset = queryset.order_by('id')
+
+    rows = _fetch(queryset)
+    stats_pk = _FIELDS.index('stats__pk')
+    missing = [row[0] for row in rows if row[stats_pk] is None]
+    if missing:
+        ProjectStatsService.rebuild(missing)
+        rows = _fetch(queryset)
+
+    members, risks = _team_and_risks(queryset)
+    return _build(rows, members, risks, today or date.today())
+
+
+def _build(rows, members, risks, today):
+    n = len(rows)
+    if n == 0:
+        return PortfolioFeatures(np.empty(0, dtype=np.int64), np.empty((0, len(FEATURE_COLUMNS))), [])
+
+    columns = list(zip(*rows))
+    at = {name: i for i, name in enumerate(_FIELDS)}
+
+    def numeric(name):
+        return np.array([float(v or 0) for v in columns[at[name]]], dtype=np.float64)
+
+    def ordinals(name):
+        return np.fromiter((d.toordinal() for d in columns[at[name]]), dtype=np.int64, count=n)
+
+    ids = np.fromiter(columns[at['id']], dtype=np.int64, count=n)
+    debut = ordinals('date_debut')
+    fin = ordinals('date_fin_prevue')
+    today_ordinal = today.toordinal()
+
+    # Durées
+    planned_days = fin - debut
+    days_elapsed = np.maximum(0, np.minimum(today_ordinal, fin) - debut)
+    days_left = fin - today_ordinal
+
+    # Phases
+    total_phases = sum(numeric(f'stats__{c}') for c in ProjectStats.PHASE_COLUMNS.values())
+    done_phases = numeric('stats__phases_terminees')
+    progress_ratio = done_phases / np.where(total_phases > 0, total_phases, 1)
+
+    # Budgets: dépenses des lignes REEL, à défaut budget réel saisi sur le projet
+    budget_prevu = numeric('budget_prevue')
+    spent = numeric('stats__budget_reel_total')
+    spent = np.where(spent != 0, spent, numeric('budget_reel'))
+    budget_ratio = np.divide(spent, budget_prevu, out=np.zeros(n), where=budget_prevu > 0)
+
+    # Risques
+    nb_risques = sum(numeric(f'stats__{c}') for c in ProjectStats.RISQUE_COLUMNS.values())
+    no_risk = (0, 0, 0)
+    open_risks, permit_signals, supply_signals = (
+        np.array([risks.get(projet_id, no_risk)[k] for projet_id in columns[at['id']]], dtype=np.float64)
+        for k in range(3)
+    )
+
+    # Équipe: chef de projet + membres
+    team_size = np.array([members.get(projet_id, 0) for projet_id in columns[at['id']]], dtype=np.float64)
+    team_size += np.array([chef is not None for chef in columns[at['chef_projet_id']]], dtype=np.float64)
+
+    matrix = np.column_stack([
+        planned_days, days_elapsed, days_left, progress_ratio, budget_ratio, nb_risques,
+        team_size, open_risks, permit_signals, supply_signals,
+    ]).astype(np.float64)
+    return PortfolioFeatures(ids, matrix, list(columns[at['statut']]))
+
+
+def project_features(projet_id, today: Optional[date] = None):
+    """Variables d'un projet (dict), ou None si le projet n'existe pas"""
+    features = portfolio_features(Projet.objects.filter(id=projet_id), today=today)
+    if not len(features.ids):
+        return None
+    return features.row(0)
@@ -0,0 +1,66 @@
+"""
+Exécution des inférences du module analytics.
+
+Par défaut, les modèles sont évalués dans le worker WSGI. Avec
+``ML_INFERENCE_EXECUTOR``, ils le sont dans le pool de processus de
+ml/executor.py (``ML_INFERENCE_WORKERS`` processus), qui regroupe les demandes
+concurrentes; au-delà de ``ML_INFERENCE_TIMEOUT`` secondes, ``score`` lève
+``TimeoutError`` et les vues répondent avec les heuristiques.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from ml.executor import InferenceExecutor, create_executor
+from ml.inference import predict_batch, predict_enhanced_batch
+from ml.registry import ENHANCED_MODELS
+
+from .prediction_cache import get_prediction_cache
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+_timeouts = 0
+
+
+def executor_enabled() -> bool:
+    return getattr(settings, 'ML_INFERENCE_EXECUTOR', False)
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Pool d'inférence du processus (démarré au premier appel)"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = create_executor(
+                    workers=getattr(settings, 'ML_INFERENCE_WORKERS', 2),
+                    cache_size=getattr(settings, 'ML_PREDICTION_CACHE_SIZE', 10000),
+                    cache_ttl=getattr(settings, 'ML_PREDICTION_CACHE_TTL', 900),
+                )
+    return _executor
+
+
+def score(name: str, inputs: dict) -> dict:
+    """Prédictions en lot du modèle ``name`` (registre), en ligne ou dans le pool d'inférence"""
+    global _timeouts
+    if not executor_enabled():
+        if name == ENHANCED_MODELS:
+            return predict_enhanced_batch(inputs, cache=get_prediction_cache())
+        return predict_batch(**inputs, cache=get_prediction_cache())
+    try:
+        return get_inference_executor().predict(name, inputs, timeout=getattr(settings, 'ML_INFERENCE_TIMEOUT', 2.0))
+    except TimeoutError:
+        with _lock:
+            _timeouts += 1
+        logger.warning("Inférence %s hors délai, heuristiques utilisées", name)
+        raise
+
+
+def executor_stats():
+    """Compteurs du pool d'inférence (None s'il n'est pas démarré)"""
+    if _executor is None:
+        return None
+    return {**_executor.stats(), 'timeouts': _timeouts}
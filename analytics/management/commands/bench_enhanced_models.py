@@ -0,0 +1,162 @@
+import time
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+import ml.inference
+from analytics.prediction_cache import cached_features, get_prediction_cache, invalidate_features
+from analytics.views import _insights
+from projects.models import Projet, Risque
+
+RISK_NAMES = (
+    'Retard du permis de construire',
+    'Rupture fournisseur béton',
+    'Intempéries prolongées',
+    'Autorisation de voirie en attente',
+)
+
+
+class _Rollback(Exception):
+    """Annule les projets générés pour le benchmark"""
+
+
+class _QueryCounter:
+    """Compte les requêtes exécutées (sans la limite du journal de CaptureQueriesContext)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le classifieur de retard (4 variables) aux modèles enrichis (8 variables, "
+        "ML_ENHANCED_MODELS) sur un portefeuille et projet par projet, avec les moteurs "
+        "scikit-learn et forêt aplatie. Les projets générés sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projets', type=int, default=500)
+        parser.add_argument('--membres', type=int, default=6, help="Membres maximum par projet")
+        parser.add_argument('--single', type=int, default=50, help="Projets mesurés un par un")
+
+    def handle(self, *args, **options):
+        # Modèles entraînés avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+        self._ids = []
+        try:
+            with transaction.atomic():
+                user, ids = self._seed(options['projets'], options['membres'])
+                self._report(user, ids, options['single'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # Le cache ne suit pas l'annulation: les ids générés seront réutilisés
+            invalidate_features(self._ids)
+
+    def _seed(self, size, max_members):
+        user = User.objects.create_superuser(username='bench-enhanced', password='bench')
+        User.objects.bulk_create([User(username=f'bench-enhanced-{i}') for i in range(max_members)])
+        members = list(User.objects.filter(username__startswith='bench-enhanced-').order_by('id'))
+        today = date.today()
+        Projet.objects.bulk_create(
+            [
+                Projet(
+                    nom=f"bench-{i}",
+                    date_debut=today - timedelta(days=i % 400),
+                    date_fin_prevue=today + timedelta(days=180 - i % 365),
+                    budget_prevue=Decimal(1000000 + i),
+                    budget_reel=Decimal(300000 + 1500 * i),
+                    chef_projet=user,
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        self._ids = list(Projet.objects.filter(chef_projet=user).order_by('id').values_list('id', flat=True))
+
+        through = Projet.membres.through
+        through.objects.bulk_create(
+            [
+                through(projet_id=projet_id, user_id=member.id)
+                for i, projet_id in enumerate(self._ids)
+                for member in members[:i % (len(members) + 1)]
+            ],
+            batch_size=1000,
+        )
+        Risque.objects.bulk_create(
+            [
+                Risque(
+                    projet_id=projet_id, nom=RISK_NAMES[k], description='', niveau='MOYEN',
+                    probabilite=50, impact='',
+                )
+                for i, projet_id in enumerate(self._ids)
+                for k in range(i % (len(RISK_NAMES) + 1))
+            ],
+            batch_size=1000,
+        )
+        # bulk_create n'émet pas de signaux: entrées éventuellement restées en cache
+        invalidate_features(self._ids)
+        return user, self._ids
+
+    def _report(self, user, ids, single):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        sample = ids[:single]
+
+        self.stdout.write(
+            f"{'modèle':<12} {'moteur':<8} {'portefeuille (ms)':>18} {'requêtes':>9} "
+            f"{'insights (ms)':>14} {'requêtes':>9}"
+        )
+        engine = ml.inference.INFERENCE_ENGINE
+        try:
+            for enhanced in (False, True):
+                for name in ('sklearn', 'flat'):
+                    ml.inference.INFERENCE_ENGINE = name
+                    with override_settings(ML_ENHANCED_MODELS=enhanced):
+                        # Premier appel hors mesure: modèles, aplatissement et statistiques des projets
+                        _insights(cached_features(ids))
+                        portfolio, portfolio_queries = self._measure(lambda: _insights(cached_features(ids)), ids)
+                        timings, queries = [], 0
+                        for projet_id in sample:
+                            elapsed, count = self._measure(
+                                lambda: client.get('/api/analytics/insights/', {'projet': projet_id}), [projet_id],
+                            )
+                            timings.append(elapsed)
+                            queries += count
+                    self.stdout.write(
+                        f"{'enrichi' if enhanced else 'retard':<12} {name:<8} {portfolio * 1000:>18.1f} "
+                        f"{portfolio_queries:>9} {sum(timings) / len(timings) * 1000:>14.2f} "
+                        f"{queries / len(sample):>9.1f}"
+                    )
+        finally:
+            ml.inference.INFERENCE_ENGINE = engine
+
+        with override_settings(ML_ENHANCED_MODELS=True):
+            results = _insights(cached_features(ids))
+        delays = [result['delay_risk_probability'] for result in results]
+        self.stdout.write(
+            f"modèles enrichis: {len(results)} projets, retard moyen {sum(delays) / len(delays):.3f}, "
+            f"modèle {results[0]['modele']}"
+        )
+
+    @staticmethod
+    def _measure(call, ids):
+        # À froid: variables et inférence recalculées
+        invalidate_features(ids)
+        get_prediction_cache().clear()
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            call()
+        return time.perf_counter() - start, counter.count
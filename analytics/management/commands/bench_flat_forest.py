@@ -0,0 +1,101 @@
+import time
+import warnings
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.flat_forest import flatten_forest
+from ml.inference import predict_from_input
+from ml.registry import DELAY_MODEL, get_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que la forêt aplatie (ml/flat_forest.py) reproduit exactement predict_proba "
+        "de scikit-learn sur un jeu de test, puis compare les latences par taille de lot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Lignes du jeu de test")
+        parser.add_argument('--batches', default='1,100,10000', help="Tailles de lot mesurées")
+        parser.add_argument('--repeat', type=int, default=20, help="Mesures par taille (médiane)")
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        # Modèle entraîné avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+        loaded = get_registry().get(DELAY_MODEL)
+        model = loaded.model
+        start = time.perf_counter()
+        flat = flatten_forest(model)
+        self.stdout.write(
+            f"{loaded.key}: {flat.n_trees} arbres, {len(flat.feature)} nœuds, profondeur {flat.depth}, "
+            f"aplatie en {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+        X = self._test_set(max(options['rows'], max(self._batches(options))), options['seed'])
+        self._check(model, flat, X[:options['rows']])
+
+        self.stdout.write(f"{'lot':>6} {'scikit-learn (ms)':>18} {'aplatie (ms)':>13} {'accélération':>13}")
+        for size in self._batches(options):
+            x = X[:size]
+            repeat = options['repeat'] if size < 10000 else max(3, options['repeat'] // 5)
+            sklearn_time = self._median(lambda: model.predict_proba(x), repeat)
+            flat_time = self._median(lambda: flat.predict_proba(x), repeat)
+            self.stdout.write(
+                f"{size:>6} {sklearn_time * 1000:>18.3f} {flat_time * 1000:>13.3f} {sklearn_time / flat_time:>12.1f}x"
+            )
+
+        row = X[0]
+        single = {
+            engine: self._median(lambda: predict_from_input(*row, engine=engine), options['repeat'])
+            for engine in ('sklearn', 'flat')
+        }
+        self.stdout.write(
+            f"predict_from_input: scikit-learn {single['sklearn'] * 1000:.3f} ms, aplatie {single['flat'] * 1000:.3f} ms"
+        )
+
+    @staticmethod
+    def _batches(options):
+        return [int(size) for size in options['batches'].split(',') if size.strip()]
+
+    @staticmethod
+    def _test_set(rows, seed):
+        # Mêmes distributions que le jeu synthétique de ml/train_model.py
+        rng = np.random.default_rng(seed)
+        return np.column_stack([
+            rng.uniform(0, 100, size=rows),
+            rng.uniform(0, 100, size=rows),
+            rng.integers(0, 3, size=rows),
+            rng.integers(0, 6, size=rows),
+        ]).astype(float)
+
+    def _check(self, model, flat, X):
+        n_jobs = model.n_jobs
+        try:
+            # Accumulation séquentielle des arbres: référence déterministe
+            model.set_params(n_jobs=1)
+            reference = model.predict_proba(X)
+        finally:
+            model.set_params(n_jobs=n_jobs)
+        got = flat.predict_proba(X)
+        if not np.array_equal(reference, got):
+            raise CommandError(
+                f"Écart avec scikit-learn: {np.count_nonzero(reference != got)} valeurs, "
+                f"max {np.abs(reference - got).max():.3e}"
+            )
+        parallel = np.abs(model.predict_proba(X) - got).max()
+        self.stdout.write(
+            f"{len(X)} lignes identiques à scikit-learn (n_jobs=1); "
+            f"écart max avec n_jobs={n_jobs}: {parallel:.1e}"
+        )
+
+    @staticmethod
+    def _median(call, repeat):
+        call()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
@@ -0,0 +1,106 @@
+import threading
+import time
+import warnings
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.executor import InferenceExecutor
+from ml.inference import predict_batch
+from ml.registry import DELAY_MODEL
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit de l'inférence en ligne (dans les threads de requête) et dans le pool "
+        "de processus de ml/executor.py, sous charge concurrente: des clients demandent les "
+        "portefeuilles d'un nombre limité d'équipes, si bien que des demandes identiques se recouvrent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help="Requêtes concurrentes")
+        parser.add_argument('--requests', type=int, default=50, help="Requêtes par client")
+        parser.add_argument('--equipes', type=int, default=4, help="Portefeuilles distincts")
+        parser.add_argument('--projets', type=int, default=200, help="Projets par portefeuille")
+        parser.add_argument('--workers', type=int, default=2, help="Processus du pool")
+        parser.add_argument('--timeout', type=float, default=2.0, help="Délai avant repli sur les heuristiques")
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        # Modèle entraîné avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+        portfolios = self._portfolios(options['equipes'], options['projets'], options['seed'])
+
+        # Sans cache d'inférence des deux côtés: seul le calcul est comparé
+        executor = InferenceExecutor(workers=options['workers'], cache_size=0)
+        try:
+            self._check(executor, portfolios[0])
+            self.stdout.write(
+                f"{'mode':<10} {'requêtes':>9} {'durée (s)':>10} {'req/s':>8} {'p50 (ms)':>9} "
+                f"{'p95 (ms)':>9} {'hors délai':>11}"
+            )
+            self._report('en ligne', options, portfolios, lambda columns: predict_batch(**columns))
+            self._report('pool', options, portfolios,
+                         lambda columns: executor.predict(DELAY_MODEL, columns, timeout=options['timeout']))
+            stats = executor.stats()
+            self.stdout.write(
+                f"pool: {stats['requests']} demandes, {stats['coalesced']} rejointes en cours, "
+                f"{stats['batches']} lots, {stats['rows_requested']} lignes demandées, "
+                f"{stats['rows_scored']} évaluées"
+            )
+        finally:
+            executor.shutdown()
+
+    @staticmethod
+    def _portfolios(teams, size, seed):
+        rng = np.random.default_rng(seed)
+        return [
+            {
+                'progress_percent': rng.uniform(0, 100, size),
+                'budget_spent': rng.uniform(0, 100, size),
+                'weather': np.ones(size),
+                'incidents': rng.integers(0, 6, size).astype(float),
+            }
+            for _ in range(teams)
+        ]
+
+    def _check(self, executor, columns):
+        # Premier appel hors mesure: démarrage du pool et chargement des modèles
+        pooled = executor.predict(DELAY_MODEL, columns, timeout=120)
+        inline = predict_batch(**columns)
+        for key in ('delay_probability', 'budget_overrun_estimate'):
+            if not np.array_equal(pooled[key], inline[key]):
+                raise CommandError(f"Résultats du pool différents de l'inférence en ligne ({key})")
+        if pooled['recommendations'] != inline['recommendations']:
+            raise CommandError("Recommandations du pool différentes de l'inférence en ligne")
+
+    def _report(self, label, options, portfolios, call):
+        latencies, timeouts = [], []
+        lock = threading.Lock()
+
+        def client(index):
+            rng = np.random.default_rng(options['seed'] + index)
+            for _ in range(options['requests']):
+                columns = portfolios[rng.integers(len(portfolios))]
+                start = time.perf_counter()
+                try:
+                    call(columns)
+                except TimeoutError:
+                    with lock:
+                        timeouts.append(1)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(options['clients'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(
+            f"{label:<10} {len(latencies):>9} {elapsed:>10.2f} {len(latencies) / elapsed:>8.1f} "
+            f"{np.percentile(latencies, 50):>9.1f} {np.percentile(latencies, 95):>9.1f} {len(timeouts):>11}"
+        )
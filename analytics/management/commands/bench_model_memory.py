@@ -0,0 +1,136 @@
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+import ml.inference
+import ml.registry
+from ml.inference import predict_batch, predict_enhanced_batch, preload_models
+from ml.registry import ARTIFACT_FILE, DELAY_MODEL, ENHANCED_MODELS, FLAT_DIR, ModelRegistry, get_registry
+
+# (libellé, modèles chargés dans le maître avant le fork, moteur d'inférence)
+MODES = (
+    ('dépicklé par worker', False, 'sklearn'),
+    ('préchargé (fork)', True, 'sklearn'),
+    ('préchargé + mmap', True, 'flat'),
+)
+
+
+def _memory():
+    """(RSS, PSS, privée) du processus en Ko, d'après /proc/self/smaps_rollup"""
+    values = {}
+    with open('/proc/self/smaps_rollup', encoding='ascii') as handle:
+        for line in handle:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def _work(engine, rows):
+    rng = np.random.default_rng(0)
+    progress, budget = rng.uniform(0, 100, rows), rng.uniform(0, 100, rows)
+    incidents = rng.integers(0, 6, rows)
+    predict_batch(progress, budget, 1, incidents, engine=engine)
+    predict_enhanced_batch({
+        'progress_percent': progress, 'budget_spent': budget, 'weather': 1,
+        'incidents': incidents, 'team_size': rng.integers(5, 40, rows),
+    }, engine=engine)
+
+
+def _worker(engine, rows, barrier, results):
+    _work(engine, rows)
+    # Mesure quand tous les workers sont vivants (le PSS répartit les pages partagées)
+    barrier.wait()
+    results.put(_memory())
+    barrier.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la mémoire des workers (RSS, PSS, privée) selon le chargement des modèles: "
+        "dépicklés dans chaque worker, préchargés dans le maître avant le fork (gunicorn.conf.py), "
+        "puis préchargés avec les forêts aplaties projetées en mémoire. Linux uniquement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=100, help="Lignes prédites par chaque worker")
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("/proc/self/smaps_rollup indisponible (Linux requis)")
+        # Modèles entraînés avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+
+        # Registre temporaire: versions actives republiées, forêts aplaties comprises
+        root = tempfile.mkdtemp(prefix='buildflow-registry-')
+        previous = ml.registry._REGISTRY
+        try:
+            registry = ModelRegistry(root)
+            for name in (DELAY_MODEL, ENHANCED_MODELS):
+                loaded = get_registry().get(name)
+                registry.publish(name, loaded.model, {**loaded.metadata, 'source_version': loaded.key})
+            self._sizes(registry)
+
+            self.stdout.write(
+                f"{'chargement':<22} {'RSS/worker (Mo)':>16} {'PSS/worker (Mo)':>16} "
+                f"{'privée/worker (Mo)':>19} {'PSS total (Mo)':>15}"
+            )
+            for label, preload, engine in MODES:
+                rss, pss, private = self._run(root, preload, engine, options['workers'], options['rows'])
+                self.stdout.write(
+                    f"{label:<22} {np.mean(rss) / 1024:>16.1f} {np.mean(pss) / 1024:>16.1f} "
+                    f"{np.mean(private) / 1024:>19.1f} {np.sum(pss) / 1024:>15.1f}"
+                )
+        finally:
+            ml.registry._REGISTRY = previous
+            ml.inference._FLAT_FORESTS.clear()
+            shutil.rmtree(root, ignore_errors=True)
+
+    def _sizes(self, registry):
+        for name in (DELAY_MODEL, ENHANCED_MODELS):
+            path = registry._dir(name, registry.active_version(name))
+            flat = sum(
+                os.path.getsize(os.path.join(directory, filename))
+                for directory, _, filenames in os.walk(os.path.join(path, FLAT_DIR))
+                for filename in filenames
+            )
+            self.stdout.write(
+                f"{name}: pickle {os.path.getsize(os.path.join(path, ARTIFACT_FILE)) / 1e6:.1f} Mo, "
+                f"forêts aplaties {flat / 1e6:.1f} Mo"
+            )
+
+    @staticmethod
+    def _run(root, preload, engine, workers, rows):
+        # Maître dans l'état d'un démarrage gunicorn: rien de chargé
+        ml.registry._REGISTRY = ModelRegistry(root)
+        ml.inference._FLAT_FORESTS.clear()
+        gc.collect()
+        if preload:
+            preload_models(engine)
+            gc.freeze()
+        # Pas de connexion SQLite partagée avec les workers
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(engine, rows, barrier, results)) for _ in range(workers)
+        ]
+        try:
+            for process in processes:
+                process.start()
+            measures = [results.get(timeout=120) for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            gc.unfreeze()
+        return tuple(np.array(values) for values in zip(*measures))
@@ -0,0 +1,126 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from analytics.features import portfolio_features
+from projects.models import Phase, Projet
+from projects.services import ProjectStatsService
+
+
+class _Rollback(Exception):
+    """Annule les projets générés pour le benchmark"""
+
+
+class _QueryCounter:
+    """Compte les requêtes exécutées (sans la limite du journal de CaptureQueriesContext)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le calcul des variables de prédiction projet par projet et en lot "
+        "(analytics/features.py). Les projets générés sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projets', type=int, default=10000)
+        parser.add_argument('--phases', type=int, default=4, help="Phases par projet")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._seed(options['projets'], options['phases'])
+                self._report()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, size, phases_per_project):
+        Projet.objects.all().delete()
+        today = date.today()
+        Projet.objects.bulk_create(
+            [
+                Projet(
+                    nom=f"bench-{i}",
+                    date_debut=today - timedelta(days=i % 400),
+                    date_fin_prevue=today + timedelta(days=180 - i % 365),
+                    budget_prevue=Decimal(1000000 + i),
+                    budget_reel=Decimal(500000 + 37 * i),
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        statuts = ('TERMINEE', 'EN_COURS', 'EN_ATTENTE')
+        phases = [
+            Phase(
+                projet_id=projet_id, nom=f"phase-{ordre}", date_debut=today,
+                date_fin_prevue=today + timedelta(days=30), statut=statuts[(projet_id + ordre) % 3], ordre=ordre,
+            )
+            for projet_id in Projet.objects.values_list('id', flat=True)
+            for ordre in range(phases_per_project)
+        ]
+        Phase.objects.bulk_create(phases, batch_size=2000)
+        ProjectStatsService.rebuild()
+
+    def _report(self):
+        ids = list(Projet.objects.order_by('id').values_list('id', flat=True))
+
+        counter = _QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            legacy = [self._legacy_features(Projet.objects.get(id=projet_id)) for projet_id in ids]
+            legacy_time = time.perf_counter() - start
+        legacy_queries, counter.count = counter.count, 0
+
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            features = portfolio_features()
+            batch_time = time.perf_counter() - start
+        batch_queries = counter.count
+
+        # Le calcul d'origine ne couvre pas les variables des modèles enrichis
+        mismatches = sum(
+            1 for i, expected in enumerate(legacy)
+            if {key: features.row(i)[key] for key in expected} != expected
+        )
+        self.stdout.write(f"{'méthode':<18} {'projets':>8} {'requêtes':>9} {'total (ms)':>11} {'µs/projet':>10}")
+        for label, elapsed, queries in (
+            ('projet par projet', legacy_time, legacy_queries),
+            ('en lot', batch_time, batch_queries),
+        ):
+            self.stdout.write(
+                f"{label:<18} {len(ids):>8} {queries:>9} {elapsed * 1000:>11.1f} {elapsed / len(ids) * 1e6:>10.2f}"
+            )
+        if mismatches:
+            self.stderr.write(f"{mismatches} projet(s) avec des variables différentes")
+
+    @staticmethod
+    def _legacy_features(projet):
+        # Calcul unitaire d'origine (une lecture du projet + une des statistiques)
+        planned_days = (projet.date_fin_prevue - projet.date_debut).days
+        today = date.today()
+        days_elapsed = max(0, (min(today, projet.date_fin_prevue) - projet.date_debut).days)
+        days_left = (projet.date_fin_prevue - today).days
+        stats = ProjectStatsService.get(projet.id)
+        total_phases = stats.total_phases or 1
+        budget_prevu = float(projet.budget_prevue or 0)
+        spent = float(stats.budget_reel_total or 0) or float(projet.budget_reel or 0)
+        return {
+            'planned_days': planned_days,
+            'days_elapsed': days_elapsed,
+            'days_left': days_left,
+            'progress_ratio': stats.phases_terminees / total_phases,
+            'budget_ratio': (spent / budget_prevu) if budget_prevu > 0 else 0,
+            'nb_risques': stats.total_risques,
+            'statut': projet.statut,
+        }
@@ -0,0 +1,121 @@
+import time
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from analytics.prediction_cache import get_prediction_cache, invalidate_features
+from analytics.views import predict_budget_overrun, predict_delay, predict_portfolio, recommendations
+from projects.models import Projet, Risque
+from projects.services import ProjectStatsService
+
+
+class _Rollback(Exception):
+    """Annule les projets générés pour le benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare l'évaluation d'un portefeuille par les trois vues unitaires (predict/delay, "
+        "predict/budget_overrun, recommendations) et par un seul appel à predict/batch. "
+        "Les projets générés sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projets', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Modèles entraînés avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+        self._ids = []
+        try:
+            with transaction.atomic():
+                user = self._seed(options['projets'])
+                self._report(user)
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # Le cache ne suit pas l'annulation: les ids générés seront réutilisés
+            invalidate_features(self._ids)
+
+    def _seed(self, size):
+        user = User.objects.create_superuser(username='bench-predictions', password='bench')
+        today = date.today()
+        Projet.objects.bulk_create(
+            [
+                Projet(
+                    nom=f"bench-{i}",
+                    date_debut=today - timedelta(days=i % 400),
+                    date_fin_prevue=today + timedelta(days=180 - i % 365),
+                    budget_prevue=Decimal(1000000 + i),
+                    budget_reel=Decimal(300000 + 1500 * i),
+                    chef_projet=user,
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        ids = list(Projet.objects.filter(chef_projet=user).values_list('id', flat=True))
+        Risque.objects.bulk_create(
+            [
+                Risque(projet_id=projet_id, nom='risque', description='', niveau='MOYEN', probabilite=50, impact='')
+                for projet_id in ids[::3]
+            ],
+            batch_size=1000,
+        )
+        ProjectStatsService.rebuild(ids)
+        # bulk_create n'émet pas de signaux: entrées éventuellement restées en cache
+        self._ids = ids
+        invalidate_features(ids)
+        return user
+
+    def _report(self, user):
+        factory = APIRequestFactory()
+        ids = list(Projet.objects.filter(chef_projet=user).order_by('id').values_list('id', flat=True))
+
+        start = time.perf_counter()
+        unit = {}
+        for projet_id in ids:
+            results = []
+            for view in (predict_delay, predict_budget_overrun, recommendations):
+                request = factory.get('/', {'projet': projet_id}, HTTP_HOST='localhost')
+                force_authenticate(request, user=user)
+                results.append(view(request).data)
+            unit[projet_id] = results
+        unit_time = time.perf_counter() - start
+
+        # Lot mesuré à froid, sans les entrées mises en cache par les vues unitaires
+        invalidate_features(ids)
+        get_prediction_cache().clear()
+        request = factory.post('/', {'projets': ids}, format='json', HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        start = time.perf_counter()
+        batch = predict_portfolio(request).data
+        batch_time = time.perf_counter() - start
+
+        mismatches = 0
+        for result in batch['results']:
+            delay, budget, recs = unit[result['project_id']]
+            if (
+                result['delay_risk_probability'] != delay['delay_risk_probability']
+                or result['budget_overrun_probability'] != budget['budget_overrun_probability']
+                or set(result['recommendations']) != set(recs['recommendations'])
+            ):
+                mismatches += 1
+
+        self.stdout.write(f"{'méthode':<22} {'projets':>8} {'appels':>7} {'total (ms)':>11} {'µs/projet':>10}")
+        for label, elapsed, calls in (
+            ('3 vues par projet', unit_time, 3 * len(ids)),
+            ('predict/batch', batch_time, 1),
+        ):
+            self.stdout.write(
+                f"{label:<22} {len(ids):>8} {calls:>7} {elapsed * 1000:>11.1f} {elapsed / len(ids) * 1e6:>10.2f}"
+            )
+        self.stdout.write(f"modèle: {batch['modele']}")
+        if mismatches:
+            self.stderr.write(f"{mismatches} projet(s) avec des résultats différents")
@@ -0,0 +1,104 @@
+import time
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from analytics.prediction_cache import cache_stats, get_prediction_cache, invalidate_features
+from projects.models import Projet
+
+
+class _Rollback(Exception):
+    """Annule les projets générés pour le benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence des trois appels du tableau de bord (predict/delay, "
+        "predict/budget_overrun, recommendations) à celle d'un appel à insights pour "
+        "chaque projet, à froid puis cache chaud. Les projets générés sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projets', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # Modèles entraînés avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+        self._ids = []
+        try:
+            with transaction.atomic():
+                user, ids = self._seed(options['projets'])
+                self._report(user, ids)
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # Le cache ne suit pas l'annulation: les ids générés seront réutilisés
+            invalidate_features(self._ids)
+
+    def _seed(self, size):
+        user = User.objects.create_superuser(username='bench-insights', password='bench')
+        today = date.today()
+        Projet.objects.bulk_create(
+            [
+                Projet(
+                    nom=f"bench-{i}",
+                    date_debut=today - timedelta(days=i % 400),
+                    date_fin_prevue=today + timedelta(days=180 - i % 365),
+                    budget_prevue=Decimal(1000000 + i),
+                    budget_reel=Decimal(300000 + 1500 * i),
+                    chef_projet=user,
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        # bulk_create n'émet pas de signaux: entrées éventuellement restées en cache
+        self._ids = list(Projet.objects.filter(chef_projet=user).order_by('id').values_list('id', flat=True))
+        invalidate_features(self._ids)
+        return user, self._ids
+
+    def _report(self, user, ids):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        # Premier appel hors mesure: chargement du modèle et des statistiques
+        client.get('/api/analytics/insights/', {'projet': ids[0]})
+
+        timings = {'3 appels': [], 'insights': [], 'insights (cache)': []}
+        for projet_id in ids:
+            # Mesures à froid: variables et inférence recalculées
+            self._forget(projet_id)
+            start = time.perf_counter()
+            for url in ('/api/analytics/predict/delay/', '/api/analytics/predict/budget_overrun/',
+                        '/api/analytics/recommendations/'):
+                client.get(url, {'projet': projet_id})
+            timings['3 appels'].append(time.perf_counter() - start)
+
+            self._forget(projet_id)
+            start = time.perf_counter()
+            client.get('/api/analytics/insights/', {'projet': projet_id})
+            timings['insights'].append(time.perf_counter() - start)
+
+            # Rechargement du tableau de bord, projet inchangé
+            start = time.perf_counter()
+            client.get('/api/analytics/insights/', {'projet': projet_id})
+            timings['insights (cache)'].append(time.perf_counter() - start)
+
+        self.stdout.write(f"{'méthode':<17} {'projets':>8} {'moyenne (ms)':>13} {'p95 (ms)':>9}")
+        for label, values in timings.items():
+            values = sorted(values)
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            self.stdout.write(
+                f"{label:<17} {len(values):>8} {sum(values) / len(values) * 1000:>13.2f} {p95 * 1000:>9.2f}"
+            )
+        self.stdout.write(f"cache: {cache_stats()}")
+
+    @staticmethod
+    def _forget(projet_id):
+        invalidate_features([projet_id])
+        get_prediction_cache().clear()
@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence des prédictions TensorFlow (ml/tensorflow_models.py): model.predict ligne "
+        "par ligne (anciens predict_dense/predict_lstm), model.predict sur le lot et "
+        "TensorFlowPredictor.predict_batch (tf.function à signature fixe), par taille de lot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,32,1024', help="Tailles de lot, séparées par des virgules")
+        parser.add_argument('--repeats', type=int, default=20, help="Mesures par taille (médiane)")
+        parser.add_argument('--row-sample', type=int, default=32,
+                            help="Lignes mesurées pour model.predict ligne par ligne (extrapolé au lot)")
+        parser.add_argument('--model-path', default=None, help="Dossier des modèles (défaut: ml/artifacts/tensorflow_models)")
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        if min(sizes) < 1:
+            raise CommandError("--sizes: tailles positives attendues")
+
+        # Import du module mesuré ici: TensorFlow n'est chargé qu'au premier modèle
+        start = time.perf_counter()
+        from ml.tensorflow_models import ConstructionDenseNN, ConstructionLSTM, TensorFlowPredictor, _tensorflow
+        imported = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            _tensorflow()
+            tensorflow = time.perf_counter() - start
+        except ImportError:
+            raise CommandError("TensorFlow n'est pas installé (requirements.txt)")
+        self.stdout.write(f"import ml.tensorflow_models: {imported * 1000:.1f} ms; import tensorflow: {tensorflow:.2f} s")
+
+        predictor = TensorFlowPredictor(options['model_path'])
+        predictor.load_models()
+        if predictor.dense_model is None or predictor.lstm_model is None:
+            # La latence ne dépend pas des poids: modèles non entraînés de même architecture
+            self.stdout.write(self.style.WARNING("Modèles absents: architectures non entraînées"))
+            predictor.dense_model = ConstructionDenseNN().build_model()
+            predictor.lstm_model = ConstructionLSTM().build_model()
+
+        rng = np.random.default_rng(options['seed'])
+        self.stdout.write(
+            f"{'modèle':<7} {'lot':>6} {'predict/ligne (ms)':>19} {'predict lot (ms)':>17} "
+            f"{'predict_batch (ms)':>19} {'gain':>8}"
+        )
+        for name, model in (('dense', predictor.dense_model), ('lstm', predictor.lstm_model)):
+            # Premier appel hors mesure: traçage de la tf.function
+            start = time.perf_counter()
+            predictor.predict_batch(rng.random((1,) + tuple(model.input_shape[1:])), model=name)
+            traced = time.perf_counter() - start
+
+            for size in sizes:
+                x = rng.random((size,) + tuple(model.input_shape[1:])).astype(np.float32)
+                expected = model.predict(x, verbose=0)
+                batched = predictor.predict_batch(x, model=name)
+                if not np.allclose(np.column_stack(list(batched.values())), expected, atol=1e-5):
+                    raise CommandError(f"predict_batch différent de model.predict ({name}, lot {size})")
+
+                sample = min(size, options['row_sample'])
+                per_row = self._median(
+                    lambda: [model.predict(x[i:i + 1], verbose=0) for i in range(sample)],
+                    max(1, options['repeats'] // 4),
+                ) * size / sample
+                whole = self._median(lambda: model.predict(x, verbose=0), options['repeats'])
+                served = self._median(lambda: predictor.predict_batch(x, model=name), options['repeats'])
+                self.stdout.write(
+                    f"{name:<7} {size:>6} {per_row * 1000:>19.2f} {whole * 1000:>17.2f} "
+                    f"{served * 1000:>19.2f} {per_row / served:>7.0f}x"
+                )
+
+            tracings = predictor._serving_function(name).experimental_get_tracing_count()
+            self.stdout.write(f"{name}: premier appel {traced * 1000:.0f} ms, {tracings} traçage(s) pour {len(sizes)} tailles")
+
+    @staticmethod
+    def _median(call, repeats):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
@@ -0,0 +1,40 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.training_data import DEFAULT_CHUNK_SIZE, DEFAULT_HORIZON, extract, read_watermark
+
+
+class Command(BaseCommand):
+    help = (
+        "Extrait le jeu d'entraînement des projets terminés (analytics/training_data.py) en "
+        "fichiers colonnes .npz. Seuls les projets modifiés depuis la dernière extraction sont "
+        "relus; entraînement: BUILDFLOW_TRAIN_DATA=<dossier> python ml/train_model.py"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'ml', 'data', 'training'))
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Projets par fichier")
+        parser.add_argument('--horizon', type=float, default=DEFAULT_HORIZON,
+                            help="Instant observé, en fraction de la durée prévue (0 à 1)")
+        parser.add_argument('--full', action='store_true', help="Supprime les fichiers et le filigrane, puis réextrait tout")
+
+    def handle(self, *args, **options):
+        if not 0 <= options['horizon'] <= 1:
+            raise CommandError("--horizon doit être compris entre 0 et 1")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size doit être positif")
+        start = time.perf_counter()
+        result = extract(options['output'], options['chunk_size'], options['horizon'], full=options['full'])
+        watermark = read_watermark(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} projets extraits en {result['parts']} fichiers "
+            f"({time.perf_counter() - start:.2f} s) dans {options['output']}"
+        ))
+        if watermark and 'date_modification' in watermark:
+            self.stdout.write(
+                f"filigrane: {watermark['date_modification']} (projet {watermark['id']}), "
+                f"{watermark['rows']} lignes extraites au total"
+            )
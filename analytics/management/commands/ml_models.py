@@ -0,0 +1,73 @@
+import os
+import pickle
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.registry import ARTIFACTS_DIR, LEGACY_ARTIFACTS, LEGACY_VERSION, get_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Registre des modèles (ml/registry.py): liste des versions, activation d'une version "
+        "(prise en compte par les workers à la requête suivante) et import des artefacts historiques."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='action', required=True)
+        subcommands.add_parser('list', help="Versions publiées et version active de chaque modèle")
+        activate = subcommands.add_parser('activate', help="Active une version publiée")
+        activate.add_argument('name')
+        activate.add_argument('version')
+        legacy = subcommands.add_parser(
+            'import_legacy', help="Publie les artefacts de ml/artifacts comme première version du registre",
+        )
+        legacy.add_argument('--no-activate', action='store_true')
+        flatten = subcommands.add_parser(
+            'flatten', help="Ajoute les forêts aplaties (partagées entre workers) aux versions publiées sans elles",
+        )
+        flatten.add_argument('name', nargs='?', help="Modèle (tous par défaut)")
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        if options['action'] == 'list':
+            self._list(registry)
+        elif options['action'] == 'activate':
+            try:
+                registry.activate(options['name'], options['version'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f"{options['name']}: version {options['version']} active"))
+        elif options['action'] == 'flatten':
+            self._flatten(registry, [options['name']] if options['name'] else registry.names())
+        else:
+            self._import_legacy(registry, activate=not options['no_activate'])
+
+    def _list(self, registry):
+        self.stdout.write(f"registre: {registry.root}")
+        for name in registry.names():
+            active = registry.active_version(name) or LEGACY_VERSION
+            self.stdout.write(f"{name} (active: {active})")
+            for version in registry.versions(name):
+                metadata = registry.metadata(name, version)
+                marker = '*' if version == active else ' '
+                self.stdout.write(f"  {marker} {version:<6} {metadata.get('created_at', ''):<33} {metadata.get('metrics', {})}")
+
+    def _flatten(self, registry, names):
+        for name in names:
+            for version in registry.versions(name):
+                parts = registry.flatten(name, version)
+                self.stdout.write(f"{name} {version}: {', '.join(parts) or 'aucune forêt'}")
+
+    def _import_legacy(self, registry, activate):
+        for name, (filename, metadata) in LEGACY_ARTIFACTS.items():
+            path = os.path.join(ARTIFACTS_DIR, filename)
+            if not os.path.exists(path):
+                self.stderr.write(f"{name}: {path} absent, ignoré")
+                continue
+            with open(path, 'rb') as handle:
+                model = pickle.load(handle)
+            extra = {'metrics': model.get('metrics', {})} if isinstance(model, dict) else {}
+            version = registry.publish(
+                name, model, {**metadata, **extra, 'imported_from': filename}, activate=activate,
+            )
+            self.stdout.write(self.style.SUCCESS(f"{name}: {filename} publié en {version}"))
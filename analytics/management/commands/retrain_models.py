@@ -0,0 +1,80 @@
+import os
+import time
+import warnings
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.incremental import (
+    DEFAULT_HOLDOUT, DEFAULT_MAX_TREES, DEFAULT_MIN_ROWS, DEFAULT_TOLERANCE, DEFAULT_TREES, MODELS, retrain,
+)
+from ml.registry import DELAY_MODEL, ENHANCED_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Réentraînement incrémental (ml/incremental.py): ajoute aux modèles actifs des arbres appris "
+        "sur les seuls fichiers extraits depuis leur point de reprise (manage.py extract_training_data), "
+        "valide sur les projets terminés les plus récents et publie une nouvelle version du registre."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=os.path.join(settings.BASE_DIR, 'ml', 'data', 'training'),
+                            help="Dossier de extract_training_data")
+        parser.add_argument('--model', action='append', choices=sorted(MODELS),
+                            help=f"Modèle à mettre à jour (répétable; par défaut {DELAY_MODEL} et {ENHANCED_MODELS})")
+        parser.add_argument('--trees', type=int, default=DEFAULT_TREES, help="Arbres ajoutés par forêt")
+        parser.add_argument('--max-trees', type=int, default=DEFAULT_MAX_TREES,
+                            help="Arbres conservés par forêt (les plus anciens sont retirés)")
+        parser.add_argument('--holdout', type=float, default=DEFAULT_HOLDOUT,
+                            help="Fraction la plus récente réservée à la validation")
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help="Dégradation relative admise sur la fenêtre de validation")
+        parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS, help="Lignes d'entraînement minimales")
+        parser.add_argument('--dry-run', action='store_true', help="Valide sans publier")
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['data']):
+            raise CommandError(f"Dossier introuvable: {options['data']} (manage.py extract_training_data)")
+        if not 0 < options['holdout'] < 1:
+            raise CommandError("--holdout doit être compris entre 0 et 1")
+        if options['trees'] < 1 or options['max_trees'] < options['trees']:
+            raise CommandError("--trees doit être positif et au plus égal à --max-trees")
+        # Modèles entraînés avec une autre version de scikit-learn: avertissements sans intérêt ici
+        warnings.filterwarnings('ignore', module='sklearn')
+
+        for name in options['model'] or [DELAY_MODEL, ENHANCED_MODELS]:
+            start = time.perf_counter()
+            result = retrain(
+                name, options['data'], trees=options['trees'], max_trees=options['max_trees'],
+                holdout=options['holdout'], tolerance=options['tolerance'], min_rows=options['min_rows'],
+                publish=not options['dry_run'],
+            )
+            elapsed = time.perf_counter() - start
+            self._report(result, elapsed)
+
+    def _report(self, result, elapsed):
+        name, status = result['name'], result['status']
+        head = f"{name} ({result['base_version']}, reprise après le fichier {result['checkpoint']})"
+        if result['reset']:
+            head += " [point de reprise absent du dossier: tout est relu]"
+        if status == 'up-to-date':
+            self.stdout.write(f"{head}: aucun nouveau fichier")
+            return
+        rows = (f"{result['new_rows']} nouvelles lignes, {result['train_rows']} apprises, "
+                f"{result['holdout_rows']} en validation")
+        if status == 'insufficient':
+            self.stdout.write(self.style.WARNING(
+                f"{head}: {rows}; lignes insuffisantes (ou une seule issue), reprises au prochain passage"
+            ))
+            return
+        errors = f"{result['metric']} {result['error_before']:.4f} -> {result['error_after']:.4f}"
+        trees = f"+{result['trees_added']} arbres, -{result['trees_dropped']}"
+        if status == 'rejected':
+            self.stdout.write(self.style.WARNING(f"{head}: {rows}; {errors}: refusé, version active conservée"))
+        elif status == 'validated':
+            self.stdout.write(f"{head}: {rows}; {trees}; {errors} ({elapsed:.2f} s), non publié (--dry-run)")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{head}: {rows}; {trees}; {errors} ({elapsed:.2f} s): {name} {result['version']} publiée"
+            ))
@@ -0,0 +1,110 @@
+"""
+Cache des prédictions du module analytics.
+
+Deux niveaux:
+
+- variables par projet, dans le cache Django (clé ``analytics:features:{id}``),
+  valables pour la journée (les durées dépendent de la date) et au plus
+  ``ML_PREDICTION_CACHE_TTL`` secondes. Les signaux d'analytics/signals.py
+  (post_save / post_delete de Projet, Phase, Budget et Risque) les invalident;
+- inférence, dans un ``ml.inference.PredictionCache`` propre au processus
+  (LRU de ``ML_PREDICTION_CACHE_SIZE`` entrées, même durée de vie), indexé par
+  la version du modèle et le vecteur d'entrée.
+
+Un tableau de bord rechargé sans modification des projets ne recalcule donc ni
+les variables ni l'inférence. Les compteurs sont exposés par ``cache_stats``.
+
+Avec plusieurs workers, configurer un backend CACHES partagé (Redis, Memcached)
+pour que l'invalidation des variables soit vue par tous; avec le cache mémoire
+local par défaut, seul le worker qui a traité la modification l'oublie et les
+autres servent les anciennes variables (donc les anciens scores) au plus tard
+pendant ML_PREDICTION_CACHE_TTL. Le cache d'inférence, lui, n'a pas besoin
+d'être partagé: indexé par le vecteur d'entrée, il ne sert jamais un score
+calculé sur d'autres variables.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from ml.inference import PredictionCache
+
+from .features import FEATURE_COLUMNS, PortfolioFeatures, portfolio_features
+
+FEATURES_KEY = 'analytics:features:{projet_id}'
+
+_prediction_cache = None
+_lock = threading.Lock()
+_feature_counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _ttl():
+    return getattr(settings, 'ML_PREDICTION_CACHE_TTL', 900)
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Cache d'inférence du processus (créé au premier appel)"""
+    global _prediction_cache
+    if _prediction_cache is None:
+        with _lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache(
+                    maxsize=getattr(settings, 'ML_PREDICTION_CACHE_SIZE', 10000), ttl=_ttl(),
+                )
+    return _prediction_cache
+
+
+def _count(name, amount=1):
+    with _lock:
+        _feature_counters[name] += amount
+
+
+def cached_features(ids, today=None) -> PortfolioFeatures:
+    """Variables des projets ``ids`` (ordonnées par id), lues dans le cache si possible"""
+    today = today or date.today()
+    ids = sorted(set(ids))
+    keys = {FEATURES_KEY.format(projet_id=projet_id): projet_id for projet_id in ids}
+    rows = {}
+    for key, entry in cache.get_many(keys).items():
+        day, values, statut = entry
+        # Entrée d'une version antérieure des variables: recalculée
+        if day == today.toordinal() and len(values) == len(FEATURE_COLUMNS):
+            rows[keys[key]] = (values, statut)
+
+    missing = [projet_id for projet_id in ids if projet_id not in rows]
+    _count('hits', len(rows))
+    _count('misses', len(missing))
+    if missing:
+        computed = portfolio_features(missing, today=today)
+        fresh = {}
+        for i, projet_id in enumerate(computed.ids.tolist()):
+            rows[projet_id] = (computed.matrix[i].tolist(), computed.statuts[i])
+            fresh[FEATURES_KEY.format(projet_id=projet_id)] = (today.toordinal(), *rows[projet_id])
+        cache.set_many(fresh, _ttl())
+
+    # Les ids inexistants restent absents du résultat
+    found = [projet_id for projet_id in ids if projet_id in rows]
+    matrix = np.array([rows[projet_id][0] for projet_id in found], dtype=np.float64)
+    return PortfolioFeatures(
+        np.array(found, dtype=np.int64),
+        matrix.reshape(len(found), len(FEATURE_COLUMNS)),
+        [rows[projet_id][1] for projet_id in found],
+    )
+
+
+def invalidate_features(projet_ids):
+    """Oublie les variables mises en cache des projets donnés"""
+    keys = [FEATURES_KEY.format(projet_id=projet_id) for projet_id in set(projet_ids) if projet_id is not None]
+    if keys:
+        cache.delete_many(keys)
+        _count('invalidations', len(keys))
+
+
+def cache_stats():
+    with _lock:
+        features = dict(_feature_counters)
+    lookups = features['hits'] + features['misses']
+    features['hit_ratio'] = round(features['hits'] / lookups, 3) if lookups else None
+    return {'features': features, 'predictions': get_prediction_cache().stats()}
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from projects.models import Projet
+
+from .prediction_cache import invalidate_features
+
+# Modèles dont dépendent les variables de prédiction (analytics/features.py)
+FEATURE_SOURCES = ('projects.Projet', 'projects.Phase', 'projects.Budget', 'projects.Risque')
+
+
+def _projet_id(sender, instance):
+    return instance.pk if sender._meta.label == 'projects.Projet' else instance.projet_id
+
+
+def invalidate_project_features(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    projet_ids = [_projet_id(sender, instance)]
+    invalidate_features(projet_ids)
+    # Une lecture concurrente a pu remettre l'ancien état en cache avant le commit
+    transaction.on_commit(lambda: invalidate_features(projet_ids))
+
+
+for _label in FEATURE_SOURCES:
+    post_save.connect(invalidate_project_features, sender=_label, dispatch_uid=f'analytics_features_post_save_{_label}')
+    post_delete.connect(invalidate_project_features, sender=_label, dispatch_uid=f'analytics_features_post_delete_{_label}')
+
+
+@receiver(m2m_changed, sender=Projet.membres.through)
+def invalidate_team_features(sender, instance, action, reverse, pk_set, **kwargs):
+    # team_size compte les membres du projet
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_features([instance.pk])
+        return
+
+    # user.projets_participes.add/remove/clear: pk_set contient des projets
+    if action == 'pre_clear':
+        instance._cleared_projet_ids = list(instance.projets_participes.values_list('id', flat=True))
+    elif action == 'post_clear':
+        invalidate_features(getattr(instance, '_cleared_projet_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_features(pk_set or [])
@@ -0,0 +1,55 @@
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from projects import audit_archive
+from projects.models import AuditTrail, Phase, Projet
+
+from .training_data import _FIELDS, build_rows, completed_projects
+
+
+class TrainingDataArchiveTests(TransactionTestCase):
+    """Extraction: fins de phase tracées lues aussi dans les archives"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        today = timezone.localdate()
+        debut = today - timedelta(days=900)
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=debut, date_fin_prevue=debut + timedelta(days=200),
+            date_fin_reelle=debut + timedelta(days=220), statut='TERMINE', region='DAKAR',
+        )
+        # Phase terminée sans date réelle: seule la traçabilité date sa fin (avant mi-parcours)
+        phase = Phase.objects.create(
+            projet=self.projet, nom='Terrassement', date_debut=debut, date_fin_prevue=debut + timedelta(days=50),
+            statut='TERMINEE', ordre=1,
+        )
+        Phase.objects.create(
+            projet=self.projet, nom='Gros oeuvre', date_debut=debut, date_fin_prevue=debut + timedelta(days=200),
+            date_fin_reelle=debut + timedelta(days=210), statut='TERMINEE', ordre=2,
+        )
+        AuditTrail.objects.all().delete()
+        AuditTrail.objects.create(
+            action='STATUS_CHANGE', content_type=ContentType.objects.get_for_model(Phase), object_id=phase.id,
+            resource_type='Phase', resource_name=phase.nom, resource_id=phase.id, projet=self.projet,
+            data_before={'statut': 'EN_COURS'}, data_after={'statut': 'TERMINEE'},
+            timestamp=timezone.make_aware(datetime.combine(debut + timedelta(days=40), time(12))),
+        )
+
+    def progress(self):
+        rows = list(completed_projects().filter(id=self.projet.id).values_list(*_FIELDS))
+        return build_rows(rows)['progress_percent'].tolist()
+
+    def test_archived_phase_completion_is_read(self):
+        self.assertEqual(self.progress(), [50.0])
+        self.assertTrue(audit_archive.apply_retention(months=12))
+        self.assertEqual(AuditTrail.objects.count(), 0)
+        self.assertEqual(self.progress(), [50.0])
@@ -0,0 +1,285 @@
+"""
+Jeu d'entraînement tiré de l'historique des projets terminés.
+
+Chaque projet terminé (statut TERMINE, ``date_fin_reelle`` renseignée) donne
+une ligne: les variables des modèles observées à l'instant ``horizon`` de sa
+durée prévue (par défaut à mi-parcours, pour ne pas apprendre sur un projet
+déjà fini) et ses issues réelles:
+
+- ``delay``: fin réelle après la fin prévue (``delay_days`` en jours);
+- ``budget_overrun``: total des lignes REEL supérieur à celui des lignes PREVU
+  (à défaut, budgets saisis sur le projet); NaN si l'un des deux manque.
+
+À l'instant observé: avancement = phases terminées (``date_fin_reelle`` ou, à
+défaut, passage à TERMINEE dans AuditTrail, archives comprises) / phases;
+budget dépensé = lignes REEL datées / budget prévu, borné à 0-100 comme en
+production; incidents = risques identifiés, ``open_risks`` = risques non
+encore résolus, signaux administratifs et d'approvisionnement comme dans
+analytics/features.py. La météo reste constante (1) et l'équipe est la
+composition actuelle: aucune des deux n'est historisée.
+
+Les projets sont parcourus par paquets dans l'ordre (date_modification, id);
+chaque paquet devient un fichier colonnes ``part-*.npz`` et la position du
+dernier projet écrit (le filigrane) est enregistrée aussitôt. Une extraction
+suivante ne relit que les projets modifiés depuis: un projet corrigé après
+coup est réextrait et ``ml.train_model.load_extracted`` garde sa dernière ligne.
+"""
+import glob
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ml.train_model import PART_PATTERN
+from projects.audit_archive import iter_audit_trail
+from projects.models import Budget, Phase, Projet, Risque
+
+from .features import PERMIT_KEYWORDS, SUPPLY_KEYWORDS
+
+FEATURE_COLUMNS = (
+    'progress_percent', 'budget_spent', 'weather', 'incidents',
+    'team_size', 'open_risks', 'permit_delays', 'supply_chain_issues',
+)
+LABEL_COLUMNS = ('delay', 'delay_days', 'budget_overrun', 'budget_overrun_ratio')
+# projet_id, fin réelle (ordinal) et instant observé (ordinal)
+KEY_COLUMNS = ('projet_id', 'completed_on', 'observed_on')
+
+WATERMARK_FILE = 'watermark.json'
+DEFAULT_HORIZON = 0.5
+DEFAULT_CHUNK_SIZE = 2000
+
+_FIELDS = ('id', 'date_debut', 'date_fin_prevue', 'date_fin_reelle', 'budget_prevue', 'budget_reel',
+           'chef_projet_id', 'date_modification')
+
+
+def completed_projects():
+    return Projet.objects.filter(statut='TERMINE', date_fin_reelle__isnull=False)
+
+
+# --- Filigrane ---
+
+def read_watermark(directory: str) -> Optional[Dict[str, object]]:
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE), encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(directory, filename, write):
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            write(handle)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(directory, filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_watermark(directory, document):
+    _write_atomic(directory, WATERMARK_FILE, lambda handle: handle.write(json.dumps(document, indent=2).encode()))
+
+
+def _save_watermark(directory, modified, projet_id, rows, sequence):
+    _write_watermark(directory, {
+        'date_modification': modified.isoformat(),
+        'id': projet_id,
+        'rows': rows,
+        'sequence': sequence,
+        'updated_at': timezone.now().isoformat(),
+    })
+
+
+def _after(queryset, watermark):
+    if not watermark or 'date_modification' not in watermark:
+        return queryset
+    modified = datetime.fromisoformat(watermark['date_modification'])
+    return queryset.filter(
+        Q(date_modification__gt=modified) | Q(date_modification=modified, id__gt=watermark['id'])
+    )
+
+
+def iter_chunks(queryset, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Projets du queryset par paquets, pagination par clé (date_modification, id)"""
+    queryset = queryset.order_by('date_modification', 'id')
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(date_modification__gt=last[0]) | Q(date_modification=last[0], id__gt=last[1]))
+        rows = list(page.values_list(*_FIELDS)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1][-1], rows[-1][0])
+
+
+# --- Variables et issues d'un paquet ---
+
+def _day(value):
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.toordinal()
+
+
+def _mentions(text, keywords):
+    text = text.lower()
+    return any(keyword in text for keyword in keywords)
+
+
+def build_rows(rows: List[tuple], horizon: float = DEFAULT_HORIZON) -> Dict[str, np.ndarray]:
+    """Colonnes (KEY_COLUMNS, FEATURE_COLUMNS, LABEL_COLUMNS) des projets d'un paquet"""
+    n = len(rows)
+    at = {name: i for i, name in enumerate(_FIELDS)}
+    columns = list(zip(*rows))
+    ids = np.fromiter(columns[at['id']], dtype=np.int64, count=n)
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+
+    def index(projet_ids):
+        # Position de chaque projet_id dans le paquet (ordre d'origine)
+        return order[np.searchsorted(sorted_ids, np.asarray(projet_ids, dtype=np.int64))]
+
+    def numeric(name):
+        return np.array([float(v) if v is not None else np.nan for v in columns[at[name]]], dtype=np.float64)
+
+    debut = np.array([_day(d) for d in columns[at['date_debut']]], dtype=np.int64)
+    fin_prevue = np.array([_day(d) for d in columns[at['date_fin_prevue']]], dtype=np.int64)
+    fin_reelle = np.array([_day(d) for d in columns[at['date_fin_reelle']]], dtype=np.int64)
+    observed = debut + np.rint(horizon * (fin_prevue - debut)).astype(np.int64)
+    id_list = ids.tolist()
+
+    # Phases terminées à l'instant observé (date réelle, à défaut passage à TERMINEE tracé,
+    # en base ou dans les archives de la traçabilité)
+    phases = list(Phase.objects.filter(projet_id__in=id_list).values_list('id', 'projet_id', 'date_fin_reelle'))
+    traced = {}
+    undated = {projet_id for _, projet_id, end in phases if end is None}
+    if undated:
+        for audit in iter_audit_trail(projet_ids=undated, action='STATUS_CHANGE', resource_type='Phase'):
+            if (audit.data_after or {}).get('statut') == 'TERMINEE':
+                traced[audit.resource_id] = min(traced.get(audit.resource_id, audit.timestamp), audit.timestamp)
+    total_phases = np.zeros(n)
+    done_phases = np.zeros(n)
+    if phases:
+        where = index([p[1] for p in phases])
+        ended = np.array([
+            _day(end) if end is not None else (_day(traced[pid]) if pid in traced else np.iinfo(np.int64).max)
+            for pid, _, end in phases
+        ], dtype=np.int64)
+        total_phases = np.bincount(where, minlength=n).astype(np.float64)
+        done_phases = np.bincount(where, weights=ended <= observed[where], minlength=n)
+    progress = np.divide(done_phases, total_phases, out=np.zeros(n), where=total_phases > 0) * 100
+
+    # Budgets
+    budgets = list(Budget.objects.filter(projet_id__in=id_list, type__in=('PREVU', 'REEL'))
+                   .values_list('projet_id', 'type', 'montant', 'date'))
+    prevu_lines = np.zeros(n)
+    reel_lines = np.zeros(n)
+    reel_observed = np.zeros(n)
+    if budgets:
+        where = index([b[0] for b in budgets])
+        amount = np.array([float(b[2]) for b in budgets])
+        is_reel = np.array([b[1] == 'REEL' for b in budgets])
+        dated = np.array([_day(b[3]) for b in budgets], dtype=np.int64)
+        prevu_lines = np.bincount(where, weights=np.where(is_reel, 0.0, amount), minlength=n)
+        reel_lines = np.bincount(where, weights=np.where(is_reel, amount, 0.0), minlength=n)
+        reel_observed = np.bincount(where, weights=np.where(is_reel & (dated <= observed[where]), amount, 0.0),
+                                    minlength=n)
+    budget_prevue = numeric('budget_prevue')
+    # Même définition qu'en production: dépenses REEL / budget prévu du projet
+    budget_spent = np.clip(
+        np.divide(reel_observed, budget_prevue, out=np.zeros(n), where=np.nan_to_num(budget_prevue) > 0) * 100,
+        0.0, 100.0,
+    )
+    planned_total = np.where(prevu_lines > 0, prevu_lines, budget_prevue)
+    actual_total = np.where(reel_lines > 0, reel_lines, numeric('budget_reel'))
+    known = (np.nan_to_num(planned_total) > 0) & ~np.isnan(actual_total)
+    overrun_ratio = np.full(n, np.nan)
+    overrun_ratio[known] = actual_total[known] / planned_total[known]
+    budget_overrun = np.where(known, (overrun_ratio > 1.0).astype(np.float64), np.nan)
+
+    # Risques identifiés / encore ouverts à l'instant observé
+    risks = list(Risque.objects.filter(projet_id__in=id_list)
+                 .values_list('projet_id', 'date_identification', 'date_resolution', 'nom', 'description'))
+    incidents = open_risks = permit = supply = np.zeros(n)
+    if risks:
+        where = index([r[0] for r in risks])
+        identified = np.array([_day(r[1]) for r in risks], dtype=np.int64) <= observed[where]
+        still_open = identified & np.array([
+            r[2] is None or _day(r[2]) > observed[i] for r, i in zip(risks, where.tolist())
+        ])
+        text = [f'{r[3]} {r[4]}' for r in risks]
+        is_permit = np.array([_mentions(t, PERMIT_KEYWORDS) for t in text])
+        is_supply = np.array([_mentions(t, SUPPLY_KEYWORDS) for t in text])
+        incidents = np.bincount(where, weights=identified, minlength=n)
+        open_risks = np.bincount(where, weights=still_open, minlength=n)
+        permit = np.bincount(where, weights=still_open & is_permit, minlength=n)
+        supply = np.bincount(where, weights=still_open & is_supply, minlength=n)
+
+    # Équipe actuelle: chef de projet + membres
+    members = dict(
+        Projet.membres.through.objects.filter(projet_id__in=id_list)
+        .values('projet_id').annotate(n=Count('user_id')).values_list('projet_id', 'n')
+    )
+    team_size = np.array([members.get(i, 0) for i in id_list], dtype=np.float64)
+    team_size += np.array([chef is not None for chef in columns[at['chef_projet_id']]], dtype=np.float64)
+
+    delay_days = fin_reelle - fin_prevue
+    return {
+        'projet_id': ids,
+        'completed_on': fin_reelle,
+        'observed_on': observed,
+        'progress_percent': progress,
+        'budget_spent': budget_spent,
+        'weather': np.ones(n),
+        'incidents': incidents,
+        'team_size': team_size,
+        'open_risks': open_risks,
+        'permit_delays': np.minimum(permit, 2.0),
+        'supply_chain_issues': np.minimum(supply, 2.0),
+        'delay': (delay_days > 0).astype(np.int8),
+        'delay_days': delay_days,
+        'budget_overrun': budget_overrun,
+        'budget_overrun_ratio': overrun_ratio,
+    }
+
+
+# --- Extraction ---
+
+def extract(directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE, horizon: float = DEFAULT_HORIZON,
+            full: bool = False) -> Dict[str, int]:
+    """Écrit les projets terminés depuis le filigrane; renvoie {'parts', 'rows'} de ce passage"""
+    os.makedirs(directory, exist_ok=True)
+    watermark = read_watermark(directory)
+    # Numérotation continue et jamais réutilisée, même après --full: le point de
+    # reprise de ml/incremental.py (dernier numéro appris) reste valable
+    existing = [os.path.basename(path)[5:-4] for path in glob.glob(os.path.join(directory, PART_PATTERN))]
+    sequence = max([int(number) for number in existing if number.isdigit()]
+                   + [watermark.get('sequence', 0) if watermark else 0])
+    if full:
+        for path in glob.glob(os.path.join(directory, PART_PATTERN)):
+            os.unlink(path)
+        # Position remise à zéro, numéro conservé
+        watermark = {'sequence': sequence}
+        _write_watermark(directory, watermark)
+    total = watermark.get('rows', 0) if watermark else 0
+
+    parts = rows_written = 0
+    for rows in iter_chunks(_after(completed_projects(), watermark), chunk_size):
+        data = build_rows(rows, horizon)
+        sequence += 1
+        _write_atomic(directory, f'part-{sequence:06d}.npz', lambda handle: np.savez(handle, **data))
+        parts += 1
+        rows_written += len(rows)
+        total += len(rows)
+        # Filigrane après chaque fichier: une extraction interrompue reprend au paquet suivant
+        _save_watermark(directory, rows[-1][-1], rows[-1][0], total, sequence)
+    return {'parts': parts, 'rows': rows_written}
@@ -1,6 +1,9 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from .views import AnalyticsDataViewSet, predict_delay, predict_budget_overrun, recommendations
+from .views import (
+    AnalyticsDataViewSet, predict_delay, predict_budget_overrun, recommendations, predict_portfolio, project_insights,
+    prediction_cache_stats,
+)
 
 router = DefaultRouter()
 router.register(r'analytics', AnalyticsDataViewSet, basename='analyticsdata')
@@ -9,5 +12,8 @@ urlpatterns = [
     *router.urls,
     path('predict/delay/', predict_delay, name='predict_delay'),
     path('predict/budget_overrun/', predict_budget_overrun, name='predict_budget_overrun'),
+    path('predict/batch/', predict_portfolio, name='predict_portfolio'),
+    path('predict/cache/', prediction_cache_stats, name='prediction_cache_stats'),
+    path('insights/', project_insights, name='project_insights'),
     path('recommendations/', recommendations, name='recommendations'),
 ]
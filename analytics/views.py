@@ -5,7 +5,9 @@ from rest_framework.response import Response
 from django.db.models import Sum, Count, Q
 from datetime import date
 import math
-from ml.inference import predict_from_input
+import numpy as np
+from django.conf import settings
+from ml.registry import DELAY_MODEL, ENHANCED_MODELS
 try:
     import pandas as pd  # type: ignore
     from sklearn.linear_model import LogisticRegression, LinearRegression  # type: ignore
@@ -14,7 +16,12 @@ except Exception:  # pragma: no cover
     LogisticRegression = None
     LinearRegression = None
 
-from projects.models import Projet, Phase, Budget, Risque
+from projects.access import visible_projects
+from projects.models import Projet
+from users.models import ProfilUtilisateur
+from users.permissions import get_compiled_permissions
+from .inference import executor_stats, score
+from .prediction_cache import cache_stats, cached_features
 from .models import AnalyticsData
 from .serializers import AnalyticsDataSerializer
 
@@ -24,156 +31,248 @@ class AnalyticsDataViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-def _aggregate_project_features(projet: Projet) -> dict:
-    # Durées
-    planned_days = (projet.date_fin_prevue - projet.date_debut).days
-    today = date.today()
-    days_elapsed = max(0, (min(today, projet.date_fin_prevue) - projet.date_debut).days)
-    days_left = (projet.date_fin_prevue - today).days
+# Heuristiques de repli (sans modèle ML): une valeur par ligne de PortfolioFeatures
 
-    # Phases
-    phases = Phase.objects.filter(projet=projet)
-    total_phases = phases.count() or 1
-    done_phases = phases.filter(statut='TERMINEE').count()
-    progress_ratio = done_phases / total_phases
+def _rule_based_delay_probabilities(features) -> np.ndarray:
+    # Plus on a de jours écoulés vs prévu et peu de progrès, plus le risque augmente
+    planned = features.column('planned_days')
+    time_pressure = np.where(planned > 0, features.column('days_elapsed') / np.maximum(1, planned), 0.0)
+    low_progress_penalty = 1 - features.column('progress_ratio')
+    risk = np.minimum(
+        1.0, 0.5 * time_pressure + 0.4 * low_progress_penalty + 0.1 * (features.column('nb_risques') > 0)
+    )
+    return np.round(risk, 3)
 
-    # Budgets
-    budget_prevu = float(projet.budget_prevue or 0)
-    budget_reel_projet = float(projet.budget_reel or 0)
-    budget_reel_lignes = float(Budget.objects.filter(projet=projet, type='REEL').aggregate(s=Sum('montant'))['s'] or 0)
-    spent = budget_reel_lignes or budget_reel_projet
-    budget_ratio = (spent / budget_prevu) if budget_prevu > 0 else 0
 
-    # Risques
-    nb_risques = Risque.objects.filter(projet=projet).count()
+def _rule_based_budget_overrun_probabilities(features) -> np.ndarray:
+    # Si ratio budget > progression, risque augmente
+    gap = np.maximum(0.0, features.column('budget_ratio') - np.maximum(0.01, features.column('progress_ratio')))
+    risk = np.minimum(
+        1.0, 0.6 * gap + 0.2 * (features.column('nb_risques') > 0) + 0.2 * (features.column('days_left') < 0)
+    )
+    return np.round(risk, 3)
 
+
+RULE_RECOMMENDATIONS = (
+    "Accélérer les phases critiques et réallouer des ressources.",
+    "Mettre en place un gel des dépenses non essentielles et renégocier les contrats.",
+    "Revoir le registre des risques et définir des plans de mitigation immédiats.",
+)
+RULE_DEFAULT_RECOMMENDATION = "Poursuivre selon le plan actuel tout en surveillant les jalons clés."
+
+
+def _rule_based_recommendations(features) -> list:
+    """Recommandations métier de chaque projet (mêmes règles que la vue recommendations)"""
+    rules = np.column_stack([
+        (features.column('progress_ratio') < 0.5)
+        & (features.column('days_left') <= features.column('planned_days') * 0.5),
+        features.column('budget_ratio') > 1.0,
+        features.column('nb_risques') > 0,
+    ])
+    return [
+        [text for text, hit in zip(RULE_RECOMMENDATIONS, row) if hit] or [RULE_DEFAULT_RECOMMENDATION]
+        for row in rules.tolist()
+    ]
+
+
+def _ml_inputs(features) -> dict:
+    """Entrées du modèle ML pour toutes les lignes (mêmes bornes que les vues unitaires)"""
     return {
-        'planned_days': planned_days,
-        'days_elapsed': days_elapsed,
-        'days_left': days_left,
-        'progress_ratio': progress_ratio,
-        'budget_ratio': budget_ratio,
-        'nb_risques': nb_risques,
-        'statut': projet.statut,
+        'progress_percent': np.clip(features.column('progress_ratio') * 100, 0.0, 100.0),
+        'budget_spent': np.clip(features.column('budget_ratio') * 100, 0.0, 100.0),
+        'weather': np.ones(len(features.ids)),  # TODO: brancher une vraie source météo
+        'incidents': features.column('nb_risques'),
     }
 
 
-def _rule_based_delay_probability(f: dict) -> float:
-    # Heuristique simple: plus on a de jours écoulés vs prévu et peu de progrès, plus le risque augmente
-    time_pressure = 0.0
-    if f['planned_days'] > 0:
-        time_pressure = f['days_elapsed'] / max(1, f['planned_days'])
-    low_progress_penalty = 1 - f['progress_ratio']
-    risk_factor = min(1.0, 0.5 * time_pressure + 0.4 * low_progress_penalty + 0.1 * (f['nb_risques'] > 0))
-    return round(risk_factor, 3)
+def _enhanced_inputs(features) -> dict:
+    """Entrées des modèles enrichis: celles du modèle ML, l'équipe et les risques ouverts.
 
+    ``team_experience`` n'a pas de source en base: predict_enhanced_batch la
+    fixe à la moyenne d'entraînement. Les retards administratifs et
+    d'approvisionnement sont bornés à l'échelle d'entraînement (0 à 2).
+    """
+    inputs = _ml_inputs(features)
+    inputs.update({
+        'incidents': features.column('open_risks'),
+        'team_size': features.column('team_size'),
+        'permit_delays': np.minimum(features.column('permit_signals'), 2.0),
+        'supply_chain_issues': np.minimum(features.column('supply_signals'), 2.0),
+    })
+    return inputs
 
-def _rule_based_budget_overrun_probability(f: dict) -> float:
-    # Heuristique: si ratio budget > progression, risque augmente
-    gap = max(0.0, f['budget_ratio'] - max(0.01, f['progress_ratio']))
-    risk = min(1.0, 0.6 * gap + 0.2 * (f['nb_risques'] > 0) + 0.2 * (f['days_left'] < 0))
-    return round(risk, 3)
 
+def _ml_predictions(features):
+    """(modele, prédictions): modèles enrichis si ML_ENHANCED_MODELS, sinon classifieur de retard"""
+    if getattr(settings, 'ML_ENHANCED_MODELS', False):
+        return 'ml-enhanced', score(ENHANCED_MODELS, _enhanced_inputs(features))
+    return 'ml', score(DELAY_MODEL, _ml_inputs(features))
+
+
+def _scored_projects(user):
+    """Projets que l'utilisateur peut faire évaluer (même périmètre que ProjetViewSet)"""
+    compiled = get_compiled_permissions(user, create_missing=False)
+    if compiled is None:
+        return Projet.objects.none()
+    if compiled.role == 'ADMINISTRATEUR' or ProfilUtilisateur.mask_allows(compiled.mask, 'peut_gerer_utilisateurs'):
+        return Projet.objects.all()
+    return visible_projects(user)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def predict_delay(request):
-    projet_id = request.query_params.get('projet')
-    if not projet_id:
-        return Response({'detail': 'Paramètre "projet" requis'}, status=status.HTTP_400_BAD_REQUEST)
-    try:
-        projet = Projet.objects.get(id=projet_id)
-    except Projet.DoesNotExist:
-        return Response({'detail': 'Projet introuvable'}, status=status.HTTP_404_NOT_FOUND)
 
-    features = _aggregate_project_features(projet)
-    # Utiliser modèle ML si disponible; fallback heuristique
+def _insights(features) -> list:
+    """Délai, budget et recommandations de chaque ligne: une inférence pour toutes.
+
+    Chaque résultat porte ``modele`` ('ml', 'ml-enhanced' ou 'heuristique') et,
+    avec un modèle ML, ses recommandations propres dans ``ml_recommendations`` (reprises telles
+    quelles par predict_delay / predict_budget_overrun).
+    """
+    rule_recs = _rule_based_recommendations(features)
     try:
-        ml = predict_from_input(
-            progress_percent=max(0.0, min(100.0, features['progress_ratio'] * 100)),
-            budget_spent=max(0.0, min(100.0, features['budget_ratio'] * 100)),
-            weather=1,  # TODO: brancher une vraie source météo
-            incidents=int(features['nb_risques'] or 0),
-        )
-        return Response({
-            'project_id': projet.id,
-            'delay_risk_probability': round((ml['delay_probability'] or 0)/100.0, 3),
-            'budget_overrun_probability': round((ml['budget_overrun_estimate'] or 0)/100.0, 3),
-            'recommendations': ml['recommendations'],
-            'features': features,
-        })
+        modele, ml = _ml_predictions(features)
     except Exception:
-        prob = _rule_based_delay_probability(features)
-        return Response({
-            'project_id': projet.id,
-            'delay_risk_probability': prob,
-            'features': features,
-        })
+        ml = None
 
+    if ml is not None:
+        # Arrondis identiques à predict_from_input (pourcentage à 0,1 près)
+        delay = [round(round(p * 100, 1) / 100.0, 3) for p in ml['delay_probability'].tolist()]
+        budget = [round(round(p * 100, 1) / 100.0, 3) for p in ml['budget_overrun_estimate'].tolist()]
+        ml_recs = ml['recommendations']
+        # Fusion sans doublons: règles métier puis recommandations du modèle
+        recs = [list(dict.fromkeys(rules + extra)) for rules, extra in zip(rule_recs, ml_recs)]
+    else:
+        modele = 'heuristique'
+        delay = _rule_based_delay_probabilities(features).tolist()
+        budget = _rule_based_budget_overrun_probabilities(features).tolist()
+        ml_recs = [None] * len(rule_recs)
+        recs = rule_recs
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def predict_budget_overrun(request):
+    return [
+        {
+            'project_id': projet_id,
+            'modele': modele,
+            'delay_risk_probability': delay[i],
+            'budget_overrun_probability': budget[i],
+            'recommendations': recs[i],
+            'ml_recommendations': ml_recs[i],
+            'features': features.row(i),
+        }
+        for i, projet_id in enumerate(features.ids.tolist())
+    ]
+
+
+def _project_insights(request):
+    """(résultat, None) pour le projet du paramètre ``projet``, ou (None, réponse d'erreur)"""
     projet_id = request.query_params.get('projet')
     if not projet_id:
-        return Response({'detail': 'Paramètre "projet" requis'}, status=status.HTTP_400_BAD_REQUEST)
+        return None, Response({'detail': 'Paramètre "projet" requis'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        projet = Projet.objects.get(id=projet_id)
-    except Projet.DoesNotExist:
-        return Response({'detail': 'Projet introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        projet_id = int(projet_id)
+    except ValueError:
+        return None, Response({'detail': 'Projet introuvable'}, status=status.HTTP_404_NOT_FOUND)
 
-    features = _aggregate_project_features(projet)
-    try:
-        ml = predict_from_input(
-            progress_percent=max(0.0, min(100.0, features['progress_ratio'] * 100)),
-            budget_spent=max(0.0, min(100.0, features['budget_ratio'] * 100)),
-            weather=1,
-            incidents=int(features['nb_risques'] or 0),
-        )
-        return Response({
-            'project_id': projet.id,
-            'budget_overrun_probability': round((ml['budget_overrun_estimate'] or 0)/100.0, 3),
-            'recommendations': ml['recommendations'],
-            'features': features,
-        })
-    except Exception:
-        prob = _rule_based_budget_overrun_probability(features)
-        return Response({
-            'project_id': projet.id,
-            'budget_overrun_probability': prob,
-            'features': features,
-        })
+    results = _insights(cached_features([projet_id]))
+    if not results:
+        return None, Response({'detail': 'Projet introuvable'}, status=status.HTTP_404_NOT_FOUND)
+    return results[0], None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def predict_portfolio(request):
+    """Évalue un lot de projets: un seul predict_proba sur la matrice complète.
+
+    Corps: ``{"projets": [1, 2, ...]}`` ou ``{"projets": "all"}`` (défaut: tous
+    les projets accessibles). Les ids hors périmètre ou inexistants sont
+    rendus dans ``introuvables``.
+    """
+    requested = request.data.get('projets', 'all') if hasattr(request.data, 'get') else None
+    scope = _scored_projects(request.user)
+    ids = None
+    if requested != 'all':
+        if not isinstance(requested, list):
+            return Response(
+                {'detail': 'Paramètre "projets" attendu: liste d\'ids ou "all"'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ids = {int(projet_id) for projet_id in requested}
+        except (TypeError, ValueError):
+            return Response({'detail': 'Ids de projets invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        scope = scope.filter(id__in=ids)
+
+    results = _insights(cached_features(scope.values_list('id', flat=True)))
+    found = {result['project_id'] for result in results}
+    return Response({
+        'count': len(results),
+        'modele': results[0]['modele'] if results else None,
+        'introuvables': sorted(ids - found) if ids is not None else [],
+        'results': [
+            {key: value for key, value in result.items() if key not in ('modele', 'ml_recommendations')}
+            for result in results
+        ],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def project_insights(request):
+    """Délai, budget et recommandations d'un projet en une passe (variables et inférence calculées une fois)"""
+    insights, error = _project_insights(request)
+    if error is not None:
+        return error
+    return Response({key: value for key, value in insights.items() if key != 'ml_recommendations'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def prediction_cache_stats(request):
+    """Compteurs du cache des prédictions (succès, échecs, évictions) et du pool d'inférence du processus courant"""
+    return Response({**cache_stats(), 'executor': executor_stats()})
+
+
+# Vues historiques: réponses inchangées, calculées à partir de _project_insights
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def predict_delay(request):
+    insights, error = _project_insights(request)
+    if error is not None:
+        return error
+    response = {
+        'project_id': insights['project_id'],
+        'delay_risk_probability': insights['delay_risk_probability'],
+    }
+    if insights['modele'] != 'heuristique':
+        response['budget_overrun_probability'] = insights['budget_overrun_probability']
+        response['recommendations'] = insights['ml_recommendations']
+    response['features'] = insights['features']
+    return Response(response)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def predict_budget_overrun(request):
+    insights, error = _project_insights(request)
+    if error is not None:
+        return error
+    response = {
+        'project_id': insights['project_id'],
+        'budget_overrun_probability': insights['budget_overrun_probability'],
+    }
+    if insights['modele'] != 'heuristique':
+        response['recommendations'] = insights['ml_recommendations']
+    response['features'] = insights['features']
+    return Response(response)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def recommendations(request):
-    projet_id = request.query_params.get('projet')
-    if not projet_id:
-        return Response({'detail': 'Paramètre "projet" requis'}, status=status.HTTP_400_BAD_REQUEST)
-    try:
-        projet = Projet.objects.get(id=projet_id)
-    except Projet.DoesNotExist:
-        return Response({'detail': 'Projet introuvable'}, status=status.HTTP_404_NOT_FOUND)
-
-    f = _aggregate_project_features(projet)
-    recs = []
-    if f['progress_ratio'] < 0.5 and f['days_left'] <= (f['planned_days'] * 0.5):
-        recs.append("Accélérer les phases critiques et réallouer des ressources.")
-    if f['budget_ratio'] > 1.0:
-        recs.append("Mettre en place un gel des dépenses non essentielles et renégocier les contrats.")
-    if f['nb_risques'] > 0:
-        recs.append("Revoir le registre des risques et définir des plans de mitigation immédiats.")
-    if not recs:
-        recs.append("Poursuivre selon le plan actuel tout en surveillant les jalons clés.")
-    try:
-        ml = predict_from_input(
-            progress_percent=max(0.0, min(100.0, f['progress_ratio'] * 100)),
-            budget_spent=max(0.0, min(100.0, f['budget_ratio'] * 100)),
-            weather=1,
-            incidents=int(f['nb_risques'] or 0),
-        )
-        recs = list({*recs, *ml['recommendations']})  # fusionner sans doublons
-    except Exception:
-        pass
-    return Response({'project_id': projet.id, 'recommendations': recs, 'features': f})
+    insights, error = _project_insights(request)
+    if error is not None:
+        return error
+    return Response({
+        'project_id': insights['project_id'],
+        'recommendations': insights['recommendations'],
+        'features': insights['features'],
+    })
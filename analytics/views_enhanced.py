@@ -13,6 +13,7 @@ warnings.filterwarnings('ignore')
 
 from ml.inference import predict_from_input
 from projects.models import Projet, Phase, Budget, Risque
+from .features import project_features
 from .models import AnalyticsData
 from .serializers import AnalyticsDataSerializer
 
@@ -22,38 +23,9 @@ class AnalyticsDataViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 def _aggregate_project_features(projet: Projet) -> dict:
-    """Aggregate project features for ML prediction"""
-    # Durées
-    planned_days = (projet.date_fin_prevue - projet.date_debut).days
-    today = date.today()
-    days_elapsed = max(0, (min(today, projet.date_fin_prevue) - projet.date_debut).days)
-    days_left = (projet.date_fin_prevue - today).days
+    """Aggregate project features for ML prediction (shared portfolio builder)"""
+    return project_features(projet.id)
 
-    # Phases
-    phases = Phase.objects.filter(projet=projet)
-    total_phases = phases.count() or 1
-    done_phases = phases.filter(statut='TERMINEE').count()
-    progress_ratio = done_phases / total_phases
-
-    # Budgets
-    budget_prevu = float(projet.budget_prevue or 0)
-    budget_reel_projet = float(projet.budget_reel or 0)
-    budget_reel_lignes = float(Budget.objects.filter(projet=projet, type='REEL').aggregate(s=Sum('montant'))['s'] or 0)
-    spent = budget_reel_lignes or budget_reel_projet
-    budget_ratio = (spent / budget_prevu) if budget_prevu > 0 else 0
-
-    # Risques
-    nb_risques = Risque.objects.filter(projet=projet).count()
-
-    return {
-        'planned_days': planned_days,
-        'days_elapsed': days_elapsed,
-        'days_left': days_left,
-        'progress_ratio': progress_ratio,
-        'budget_ratio': budget_ratio,
-        'nb_risques': nb_risques,
-        'statut': projet.statut,
-    }
 
 def _rule_based_delay_probability(f: dict) -> float:
     """Heuristic rule-based delay probability calculation"""
@@ -140,6 +140,49 @@ REST_FRAMEWORK = {
     ],
 }
 
+# === CACHES DES PERMISSIONS ET DES ACCÈS ===
+# Durée (secondes) des permissions compilées dans le cache Django (voir users/permissions.py)
+PERMISSION_CACHE_TIMEOUT = config('PERMISSION_CACHE_TIMEOUT', default=300, cast=int)
+# Index des projets accessibles par utilisateur (voir projects/access.py)
+PROJECT_ACCESS_CACHE_TIMEOUT = config('PROJECT_ACCESS_CACHE_TIMEOUT', default=300, cast=int)
+
+# === TRAÇABILITÉ (écriture groupée, voir projects/audit_buffer.py) ===
+AUDIT_BUFFER_ENABLED = config('AUDIT_BUFFER_ENABLED', default=True, cast=bool)
+# Vidage dès que le tampon atteint cette taille...
+AUDIT_BUFFER_MAX_SIZE = config('AUDIT_BUFFER_MAX_SIZE', default=500, cast=int)
+# ... ou que l'événement le plus ancien a cet âge (secondes)
+AUDIT_BUFFER_MAX_AGE = config('AUDIT_BUFFER_MAX_AGE', default=2.0, cast=float)
+# Écriture par un thread dédié plutôt qu'en fin de requête
+AUDIT_BUFFER_BACKGROUND = config('AUDIT_BUFFER_BACKGROUND', default=False, cast=bool)
+# Échecs d'écriture d'un événement avant abandon (journalisé), et événements en attente au plus
+AUDIT_BUFFER_MAX_RETRIES = config('AUDIT_BUFFER_MAX_RETRIES', default=5, cast=int)
+AUDIT_BUFFER_MAX_PENDING = config('AUDIT_BUFFER_MAX_PENDING', default=10000, cast=int)
+# État complet écrit toutes les N modifications d'un projet ou d'une phase (voir projects/audit_history.py)
+AUDIT_CHECKPOINT_INTERVAL = config('AUDIT_CHECKPOINT_INTERVAL', default=20, cast=int)
+# Mois conservés en base; les plus anciens sont archivés (NDJSON gzip) par `archive_audit`
+AUDIT_RETENTION_MONTHS = config('AUDIT_RETENTION_MONTHS', default=12, cast=int)
+AUDIT_ARCHIVE_DIR = 'audit_archives'  # sous MEDIA_ROOT
+
+# === CACHE DES PRÉDICTIONS (voir analytics/prediction_cache.py) ===
+# Entrées du cache d'inférence (LRU, par processus)
+ML_PREDICTION_CACHE_SIZE = config('ML_PREDICTION_CACHE_SIZE', default=10000, cast=int)
+# Durée de vie (secondes) des inférences et des variables de projet en cache. Les variables
+# sont dans le cache Django: avec plusieurs workers, un backend CACHES partagé (Redis,
+# Memcached) est nécessaire pour que leur invalidation atteigne tous les workers
+ML_PREDICTION_CACHE_TTL = config('ML_PREDICTION_CACHE_TTL', default=900, cast=int)
+# Chargement des modèles actifs du registre au démarrage (voir ml/registry.py;
+# racine du registre: variable d'environnement BUILDFLOW_MODEL_REGISTRY)
+ML_PRELOAD_MODELS = config('ML_PRELOAD_MODELS', default=False, cast=bool)
+# Modèles enrichis (8 variables: équipe, risques ouverts) au lieu du classifieur de retard
+ML_ENHANCED_MODELS = config('ML_ENHANCED_MODELS', default=False, cast=bool)
+# Inférence dans un pool de processus (ml/executor.py) plutôt que dans le worker WSGI;
+# au-delà du délai (secondes), réponse des heuristiques
+ML_INFERENCE_EXECUTOR = config('ML_INFERENCE_EXECUTOR', default=False, cast=bool)
+ML_INFERENCE_WORKERS = config('ML_INFERENCE_WORKERS', default=2, cast=int)
+ML_INFERENCE_TIMEOUT = config('ML_INFERENCE_TIMEOUT', default=2.0, cast=float)
+# Moteur d'inférence du classifieur: variable d'environnement BUILDFLOW_INFERENCE_ENGINE
+# ('sklearn', 'flat' ou 'auto', voir ml/inference.py et ml/flat_forest.py)
+
 # === JWT ===
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
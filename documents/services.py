@@ -6,6 +6,7 @@ from datetime import datetime
 from django.http import HttpResponse
 from django.db.models import Q
 from projects.models import Projet, Phase, Action, Risque, Budget, Commentaire
+from projects.services import ProjectStatsService
 from documents.models import Document
 from users.models import ProfilUtilisateur
 
@@ -149,17 +150,18 @@ class ProjectExportService:
                 'auteur': document.auteur.username if document.auteur else None,
             })
         
-        # Statistiques du projet
+        # Statistiques du projet (lues dans ProjectStats)
+        stats = ProjectStatsService.get(self.projet.id)
         self.export_data['statistiques'] = {
-            'total_phases': len(self.export_data['phases']),
-            'phases_terminees': len([p for p in self.export_data['phases'] if p['statut'] == 'TERMINEE']),
-            'phases_en_cours': len([p for p in self.export_data['phases'] if p['statut'] == 'EN_COURS']),
-            'phases_en_attente': len([p for p in self.export_data['phases'] if p['statut'] == 'EN_ATTENTE']),
-            'total_actions': len(self.export_data['actions']),
-            'actions_terminees': len([a for a in self.export_data['actions'] if a['statut'] == 'TERMINEE']),
-            'total_risques': len(self.export_data['risques']),
-            'risques_critiques': len([r for r in self.export_data['risques'] if r['niveau'] == 'CRITIQUE']),
-            'total_documents': len(self.export_data['documents']),
+            'total_phases': stats.total_phases,
+            'phases_terminees': stats.phases_terminees,
+            'phases_en_cours': stats.phases_en_cours,
+            'phases_en_attente': stats.phases_en_attente,
+            'total_actions': stats.total_actions,
+            'actions_terminees': stats.actions_terminees,
+            'total_risques': stats.total_risques,
+            'risques_critiques': stats.risques_critique,
+            'total_documents': stats.nombre_documents,
             'total_commentaires': len(self.export_data['commentaires']),
         }
     
@@ -8,6 +8,7 @@ from .models import Document
 from .serializers import DocumentSerializer
 from .services import ProjectExportService
 from projects.models import Projet
+from projects.access import can_access_project
 
 class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.all()
@@ -27,7 +28,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
             
             # Vérifier les permissions (l'utilisateur doit être membre du projet)
             user = request.user
-            if not (projet.chef_projet == user or projet.membres.filter(id=user.id).exists()):
+            if not can_access_project(user, projet):
                 return Response(
                     {"detail": "Vous n'avez pas les permissions pour exporter ce projet."},
                     status=status.HTTP_403_FORBIDDEN
@@ -56,7 +57,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
             
             # Vérifier les permissions
             user = request.user
-            if not (projet.chef_projet == user or projet.membres.filter(id=user.id).exists()):
+            if not can_access_project(user, projet):
                 return Response(
                     {"detail": "Vous n'avez pas les permissions pour accéder aux documents de ce projet."},
                     status=status.HTTP_403_FORBIDDEN
@@ -0,0 +1,35 @@
+"""
+Configuration gunicorn: ``gunicorn -c gunicorn.conf.py``
+
+L'application est chargée dans le maître (``preload_app``) et ``when_ready``
+y charge les modèles actifs avant le fork: les workers partagent, par
+copie-sur-écriture, les modèles dépicklés et, par projection en mémoire, les
+forêts aplaties du registre (voir ml/registry.py). Mesure de l'effet:
+``python manage.py bench_model_memory``.
+
+Une activation (``manage.py ml_models activate``) reste prise en compte à
+chaud: chaque worker recharge alors sa propre copie de la nouvelle version.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'buildflow.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = True
+
+
+def when_ready(server):
+    # Maître, avant le premier fork
+    from ml.inference import preload_models
+    try:
+        keys = preload_models()
+    except Exception:
+        server.log.exception("Préchargement des modèles impossible: chargement au premier appel dans chaque worker")
+        return
+    server.log.info("Modèles préchargés: %s", ', '.join(keys))
+    # Objets existants exclus du ramasse-miettes: ses passages dans les workers
+    # ne réécrivent plus leurs en-têtes (pages partagées non recopiées)
+    gc.freeze()
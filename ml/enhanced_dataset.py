@@ -1,10 +1,50 @@
 """
 Enhanced dataset generation for construction project analysis
+
+``generate_construction_dataset`` is the original row-by-row generator (kept for
+reproducibility of past runs). ``generate_construction_arrays`` draws the same
+columns with the same distributions, vectorized with ``np.random.Generator``;
+``iter_construction_chunks`` and ``write_construction_dataset`` stream any
+number of rows to CSV or NPZ in fixed-size blocks with bounded memory.
+Output is deterministic for a given (seed, chunk_size).
+
+    python ml/enhanced_dataset.py --rows 5000000 --output data/stress.npz
+    python ml/enhanced_dataset.py --check      # statistical equivalence with the legacy generator
+    python ml/enhanced_dataset.py --benchmark  # rows/second
 """
+import argparse
 import os
+import shutil
+import tempfile
+import time
+import zipfile
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+PROJECT_TYPES = np.array(['RESIDENTIAL', 'COMMERCIAL', 'INFRASTRUCTURE', 'INDUSTRIAL'])
+WEATHER_P = [0.6, 0.3, 0.1]
+PERMIT_DELAYS_P = [0.7, 0.2, 0.1]
+SUPPLY_CHAIN_P = [0.8, 0.15, 0.05]
+
+# Column order and dtypes of generate_construction_dataset's DataFrame
+COLUMNS = {
+    'project_type': PROJECT_TYPES.dtype,
+    'initial_budget': np.float64,
+    'planned_duration': np.int64,
+    'progress_percent': np.float64,
+    'budget_spent': np.float64,
+    'weather': np.int64,
+    'incidents': np.int64,
+    'team_size': np.int64,
+    'team_experience': np.float64,
+    'permit_delays': np.int64,
+    'supply_chain_issues': np.int64,
+    'delay_probability': np.float64,
+    'budget_overrun_probability': np.float64,
+}
+CATEGORICAL_COLUMNS = ('project_type', 'weather', 'incidents', 'permit_delays', 'supply_chain_issues')
+DEFAULT_CHUNK_SIZE = 100_000
 
 def generate_construction_dataset(n_samples: int = 1000) -> pd.DataFrame:
     """Generate realistic construction project dataset"""
@@ -73,6 +113,180 @@ def generate_construction_dataset(n_samples: int = 1000) -> pd.DataFrame:
     
     return pd.DataFrame(data)
 
+def generate_construction_arrays(n_samples: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Vectorized equivalent of generate_construction_dataset: one array per column"""
+    project_type = PROJECT_TYPES[rng.integers(0, len(PROJECT_TYPES), n_samples)]
+    initial_budget = rng.uniform(100000, 10000000, n_samples)
+    planned_duration = rng.integers(30, 730, n_samples)
+
+    actual_progress = rng.uniform(0, 100, n_samples)
+    budget_efficiency = rng.beta(2, 2, n_samples)
+    budget_spent = actual_progress * budget_efficiency * rng.uniform(0.8, 1.2, n_samples)
+
+    weather = rng.choice(3, size=n_samples, p=WEATHER_P)
+    incidents = rng.poisson(np.where(weather == 2, 1.0, 0.5))
+
+    team_size = rng.integers(5, 50, n_samples)
+    team_experience = rng.uniform(1, 10, n_samples)
+
+    permit_delays = rng.choice(3, size=n_samples, p=PERMIT_DELAYS_P)
+    supply_chain_issues = rng.choice(3, size=n_samples, p=SUPPLY_CHAIN_P)
+
+    delay_risk = (
+        (budget_spent > actual_progress + 15) * 0.4 +
+        (weather == 2) * 0.3 +
+        (incidents > 2) * 0.2 +
+        (permit_delays > 0) * 0.1
+    )
+    budget_overrun_risk = (
+        (budget_spent > actual_progress) * 0.5 +
+        (supply_chain_issues > 0) * 0.3 +
+        (weather == 2) * 0.2
+    )
+
+    columns = {
+        'project_type': project_type,
+        'initial_budget': initial_budget,
+        'planned_duration': planned_duration,
+        'progress_percent': actual_progress,
+        'budget_spent': budget_spent,
+        'weather': weather,
+        'incidents': incidents,
+        'team_size': team_size,
+        'team_experience': team_experience,
+        'permit_delays': permit_delays,
+        'supply_chain_issues': supply_chain_issues,
+        'delay_probability': np.minimum(1.0, delay_risk),
+        'budget_overrun_probability': np.minimum(1.0, budget_overrun_risk),
+    }
+    return {name: columns[name].astype(dtype, copy=False) for name, dtype in COLUMNS.items()}
+
+
+def iter_construction_chunks(n_samples: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             seed: int = 42) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield the dataset as blocks of at most ``chunk_size`` rows"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_size):
+        yield generate_construction_arrays(min(chunk_size, n_samples - start), rng)
+
+
+def generate_construction_dataset_vectorized(n_samples: int = 1000, seed: int = 42,
+                                             chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """Same DataFrame as generate_construction_dataset, without the per-row loop"""
+    chunks = list(iter_construction_chunks(n_samples, chunk_size, seed))
+    if not chunks:
+        return pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()})
+    return pd.DataFrame({name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS})
+
+
+def _write_csv(path, chunks):
+    with open(path, 'w', newline='') as handle:
+        for i, chunk in enumerate(chunks):
+            pd.DataFrame(chunk).to_csv(handle, index=False, header=(i == 0))
+
+
+def _write_npz(path, n_samples, chunks):
+    # Each column is appended block by block to its own .npy file, then copied
+    # into the archive: np.savez would need every column in memory at once
+    workdir = tempfile.mkdtemp(prefix='construction-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        dtypes = {
+            name: np.dtype('<U%d' % max(len(t) for t in PROJECT_TYPES)) if name == 'project_type' else np.dtype(dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        handles = {name: open(os.path.join(workdir, f'{name}.npy'), 'wb') for name in COLUMNS}
+        try:
+            for name, handle in handles.items():
+                np.lib.format.write_array_header_1_0(handle, {
+                    'descr': np.lib.format.dtype_to_descr(dtypes[name]),
+                    'fortran_order': False,
+                    'shape': (n_samples,),
+                })
+            for chunk in chunks:
+                for name, handle in handles.items():
+                    handle.write(np.ascontiguousarray(chunk[name], dtype=dtypes[name]).tobytes())
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in COLUMNS:
+                with open(os.path.join(workdir, f'{name}.npy'), 'rb') as source, \
+                        archive.open(f'{name}.npy', 'w', force_zip64=True) as target:
+                    shutil.copyfileobj(source, target, 1 << 20)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def write_construction_dataset(path: str, n_samples: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               seed: int = 42) -> str:
+    """Stream ``n_samples`` rows to ``path`` (.csv or .npz, readable with np.load) in bounded memory"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    chunks = iter_construction_chunks(n_samples, chunk_size, seed)
+    if path.endswith('.npz'):
+        _write_npz(path, n_samples, chunks)
+    elif path.endswith('.csv'):
+        _write_csv(path, chunks)
+    else:
+        raise ValueError(f"Unsupported dataset format: {path} (expected .csv or .npz)")
+    return path
+
+
+def compare_with_legacy(n_samples: int = 20000, seed: int = 42, alpha: float = 0.001) -> List[Tuple[str, str, float, bool]]:
+    """Statistical equivalence of the vectorized generator with generate_construction_dataset.
+
+    Kolmogorov-Smirnov test for continuous columns, chi-square test of
+    homogeneity for discrete ones. Returns (column, test, p-value, passed)
+    rows; a column passes when its p-value is above ``alpha``.
+    """
+    from scipy import stats
+
+    legacy = generate_construction_dataset(n_samples)
+    vectorized = generate_construction_dataset_vectorized(n_samples, seed=seed)
+    results = []
+    for name in COLUMNS:
+        if name in CATEGORICAL_COLUMNS or name in ('planned_duration', 'team_size') or name.endswith('_probability'):
+            # Discrete values (durations and team sizes binned by decile)
+            a, b = legacy[name], vectorized[name]
+            if name in ('planned_duration', 'team_size'):
+                edges = np.unique(np.quantile(np.concatenate([a, b]), np.linspace(0, 1, 11)))
+                a, b = np.digitize(a, edges[1:-1]), np.digitize(b, edges[1:-1])
+            table = pd.crosstab(
+                np.concatenate([np.zeros(len(a)), np.ones(len(b))]),
+                np.concatenate([np.asarray(a), np.asarray(b)]),
+            )
+            p_value = stats.chi2_contingency(table)[1]
+            test = 'chi2'
+        else:
+            p_value = stats.ks_2samp(legacy[name], vectorized[name]).pvalue
+            test = 'ks'
+        results.append((name, test, float(p_value), bool(p_value > alpha)))
+    return results
+
+
+def _benchmark(legacy_rows: int, rows: int, chunk_size: int):
+    start = time.perf_counter()
+    generate_construction_dataset(legacy_rows)
+    legacy = legacy_rows / (time.perf_counter() - start)
+    print(f"{'generator':<22} {'rows':>10} {'rows/s':>14}")
+    print(f"{'legacy (loop)':<22} {legacy_rows:>10} {legacy:>14,.0f}")
+
+    start = time.perf_counter()
+    generate_construction_dataset_vectorized(rows, chunk_size=chunk_size)
+    print(f"{'vectorized (memory)':<22} {rows:>10} {rows / (time.perf_counter() - start):>14,.0f}")
+
+    workdir = tempfile.mkdtemp(prefix='construction-bench-')
+    try:
+        for ext in ('npz', 'csv'):
+            start = time.perf_counter()
+            path = write_construction_dataset(os.path.join(workdir, f'bench.{ext}'), rows, chunk_size)
+            elapsed = time.perf_counter() - start
+            print(f"{'streamed ' + ext.upper():<22} {rows:>10} {rows / elapsed:>14,.0f}"
+                  f"   ({os.path.getsize(path) / 1e6:.0f} MB)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
 def save_dataset(df: pd.DataFrame, filename: str = 'construction_dataset.csv'):
     """Save dataset to file"""
     dataset_path = os.path.join(os.path.dirname(__file__), 'data', filename)
@@ -81,6 +295,26 @@ def save_dataset(df: pd.DataFrame, filename: str = 'construction_dataset.csv'):
     return dataset_path
 
 if __name__ == "__main__":
-    df = generate_construction_dataset(1000)
-    path = save_dataset(df)
-    print(f"Dataset generated with {len(df)} samples saved to: {path}")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--output', help="Stream the vectorized dataset to this .csv or .npz file")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--check', action='store_true', help="Compare with the legacy generator")
+    parser.add_argument('--benchmark', action='store_true', help="Rows/second of each generator")
+    args = parser.parse_args()
+
+    if args.check:
+        results = compare_with_legacy(seed=args.seed)
+        for name, test, p_value, passed in results:
+            print(f"{name:<28} {test:<5} p={p_value:.4f} {'ok' if passed else 'DIFFERENT'}")
+        raise SystemExit(0 if all(passed for *_, passed in results) else 1)
+    if args.benchmark:
+        _benchmark(legacy_rows=20000, rows=max(args.rows, 1000000), chunk_size=args.chunk_size)
+    elif args.output:
+        path = write_construction_dataset(args.output, args.rows, args.chunk_size, args.seed)
+        print(f"Dataset generated with {args.rows} samples saved to: {path}")
+    else:
+        df = generate_construction_dataset(args.rows)
+        path = save_dataset(df)
+        print(f"Dataset generated with {len(df)} samples saved to: {path}")
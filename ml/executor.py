@@ -0,0 +1,196 @@
+"""
+Inférence hors du worker WSGI: pool de processus et regroupement des demandes.
+
+``InferenceExecutor.submit(modele, colonnes)`` renvoie un ``Future``; le thread
+de répartition attend ``window`` secondes, réunit les demandes arrivées pour un
+même modèle, retire les lignes en double et envoie un seul lot au pool. Une
+demande identique à une demande en cours (mêmes projets, mêmes variables)
+reçoit le même ``Future`` sans nouveau calcul.
+
+Chaque processus du pool précharge les modèles actifs (``preload_models``) et
+garde son propre ``PredictionCache``. ``predict(..., timeout=...)`` lève
+``TimeoutError`` si le résultat n'arrive pas à temps: l'appelant répond alors
+avec ses heuristiques, le calcul se termine en arrière-plan.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+import numpy as np
+
+from .inference import PredictionCache, predict_batch, predict_enhanced_batch, preload_models
+from .registry import DELAY_MODEL, ENHANCED_MODELS
+
+logger = logging.getLogger(__name__)
+
+_worker_cache = None
+
+
+def _init_worker(cache_size, cache_ttl, warning_filters):
+    global _worker_cache
+    # Processus neufs (forkserver): mêmes filtres d'avertissements que le parent
+    warnings.filters[:] = warning_filters
+    _worker_cache = PredictionCache(maxsize=cache_size, ttl=cache_ttl) if cache_size else None
+    try:
+        preload_models()
+    except Exception:
+        logger.exception("Préchargement des modèles impossible dans le pool d'inférence")
+
+
+def _score(name, columns):
+    """Exécuté dans le pool: une inférence en lot du modèle ``name``"""
+    if name == DELAY_MODEL:
+        return predict_batch(**columns, cache=_worker_cache)
+    if name == ENHANCED_MODELS:
+        return predict_enhanced_batch(columns, cache=_worker_cache)
+    raise ValueError(f"Modèle inconnu: {name}")
+
+
+class InferenceExecutor:
+    """Pool de processus d'inférence avec regroupement des demandes concurrentes"""
+
+    def __init__(self, workers: int = 2, window: float = 0.002, cache_size: int = 10000, cache_ttl: float = 900.0):
+        self.workers = workers
+        self.window = window
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._pool = None
+        self._queue = []  # (modèle, colonnes, matrice, future) en attente de répartition
+        self._inflight: Dict[tuple, Future] = {}
+        self._condition = threading.Condition()
+        self._dispatcher = None
+        self._closed = False
+        self._counters = {'requests': 0, 'coalesced': 0, 'batches': 0, 'rows_requested': 0, 'rows_scored': 0}
+
+    # --- API ---
+
+    def submit(self, name: str, columns: Dict[str, object]) -> Future:
+        """Inférence de ``name`` sur les colonnes données (tableaux de N valeurs ou scalaires)"""
+        names = tuple(sorted(columns))
+        arrays = [np.atleast_1d(np.asarray(columns[column], dtype=np.float64)) for column in names]
+        n = max(len(array) for array in arrays)
+        matrix = np.column_stack([np.broadcast_to(array, (n,)) for array in arrays])
+        key = (name, names, matrix.tobytes())
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("InferenceExecutor fermé")
+            self._counters['requests'] += 1
+            self._counters['rows_requested'] += n
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters['coalesced'] += 1
+                return future
+            future = self._inflight[key] = Future()
+            self._queue.append((name, names, matrix, future))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True)
+                self._dispatcher.start()
+            self._condition.notify()
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def predict(self, name: str, columns: Dict[str, object], timeout: Optional[float] = None) -> Dict[str, object]:
+        """Résultat de ``submit``; ``TimeoutError`` au-delà de ``timeout`` secondes"""
+        return self.submit(name, columns).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, object]:
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update(workers=self.workers, pending=len(self._queue), inflight=len(self._inflight))
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    # --- Répartition ---
+
+    def _forget(self, key):
+        with self._condition:
+            self._inflight.pop(key, None)
+
+    def _get_pool(self):
+        if self._pool is None:
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            )
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_init_worker, initargs=(self.cache_size, self.cache_ttl, list(warnings.filters)),
+            )
+        return self._pool
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            # Fenêtre de regroupement: les demandes concurrentes partent dans le même lot
+            time.sleep(self.window)
+            with self._condition:
+                queue, self._queue = self._queue, []
+            groups = {}
+            for name, names, matrix, future in queue:
+                groups.setdefault((name, names), []).append((matrix, future))
+            for (name, names), requests in groups.items():
+                self._send(name, names, requests)
+
+    def _send(self, name, names, requests):
+        try:
+            stacked = np.concatenate([matrix for matrix, _ in requests])
+            unique, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            with self._condition:
+                self._counters['batches'] += 1
+                self._counters['rows_scored'] += len(unique)
+            result = self._get_pool().submit(_score, name, dict(zip(names, unique.T)))
+        except Exception as exc:
+            self._fail(requests, exc)
+            return
+        result.add_done_callback(lambda done: self._resolve(done, requests, inverse))
+
+    def _fail(self, requests, exc):
+        if isinstance(exc, BrokenProcessPool):
+            # Processus du pool tué: pool recréé à la prochaine demande
+            self._pool = None
+        for _, future in requests:
+            if not future.cancelled():
+                future.set_exception(exc)
+
+    def _resolve(self, done, requests, inverse):
+        try:
+            scored = done.result()
+        except BaseException as exc:
+            self._fail(requests, exc)
+            return
+        start = 0
+        for matrix, future in requests:
+            rows = inverse[start:start + len(matrix)]
+            start += len(matrix)
+            if future.cancelled():
+                continue
+            future.set_result({
+                'delay_probability': scored['delay_probability'][rows],
+                'budget_overrun_estimate': scored['budget_overrun_estimate'][rows],
+                'recommendations': [scored['recommendations'][i] for i in rows.tolist()],
+            })
+
+
+def create_executor(**options) -> InferenceExecutor:
+    """Nouvel exécuteur, arrêté à la sortie du processus"""
+    executor = InferenceExecutor(**options)
+    atexit.register(executor.shutdown, wait=False)
+    return executor
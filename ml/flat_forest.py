@@ -0,0 +1,187 @@
+"""
+Évaluation NumPy d'une forêt scikit-learn aplatie.
+
+``flatten_forest`` concatène les arbres d'un RandomForestClassifier (ou
+Regressor) en tableaux contigus: variable, seuil, enfants (indices globaux) et
+valeurs des nœuds. Une feuille pointe vers elle-même, si bien que
+le parcours est un nombre fixe (la profondeur maximale) d'indexations
+vectorisées sur toutes les lignes et tous les arbres à la fois, sans la
+validation ni la répartition joblib de scikit-learn à chaque appel. Le gain
+porte sur les petits lots; sur des milliers de lignes, le parcours Cython de
+scikit-learn reste plus rapide (voir ``ml.inference.FLAT_FOREST_MAX_ROWS``).
+
+``save_flat`` écrit les tableaux en fichiers ``.npy`` que ``load_flat`` projette
+en mémoire (``mmap_mode='r'``): les workers qui servent la même version
+partagent alors une seule copie physique des arbres (cache de pages du noyau).
+
+Les résultats sont identiques bit à bit à ceux de scikit-learn exécuté
+séquentiellement (``n_jobs=1``): X est converti en float32 comme dans
+``tree_.apply``, les probabilités d'une feuille sont normalisées de la même
+façon et les arbres sont cumulés dans leur ordre (``np.cumsum``) avant la
+division par leur nombre. Avec ``n_jobs > 1``, scikit-learn cumule les arbres
+dans l'ordre d'exécution des threads et peut différer au dernier bit près.
+"""
+import json
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Lignes évaluées par paquet (borne la mémoire des tableaux lignes × arbres)
+CHUNK_ROWS = 4096
+
+# Tableaux écrits par save_flat, un fichier .npy chacun
+ARRAY_FIELDS = ('feature', 'threshold', 'children', 'value', 'roots')
+SCALARS_FILE = 'forest.json'
+
+
+class FlatForest(NamedTuple):
+    feature: np.ndarray    # intp (nœuds,), 0 pour une feuille
+    threshold: np.ndarray  # float64 (nœuds,)
+    children: np.ndarray   # intp (2 × nœuds,): [droit, gauche] de chaque nœud; une feuille pointe sur elle-même
+    value: np.ndarray      # float64 (nœuds, K): probabilités par classe ou sorties
+    roots: np.ndarray      # intp (arbres,)
+    depth: int
+    kind: str              # 'classifier' ou 'regressor'
+    classes: Optional[np.ndarray]
+    n_features: int
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _check(self, X):
+        # Même conversion que scikit-learn avant le parcours des arbres
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"{X.shape[1]} variables fournies, {self.n_features} attendues")
+        return X
+
+    def _apply(self, X):
+        """Feuille atteinte dans chaque arbre: tableau (arbres, lignes) d'indices globaux"""
+        n = X.shape[0]
+        # X colonne par colonne: la valeur (ligne, variable) est columns[variable * n + ligne]
+        columns = np.ascontiguousarray(X.T).ravel()
+        rows = np.tile(np.arange(n, dtype=np.intp), self.n_trees)
+        nodes = np.repeat(self.roots, n)
+        for _ in range(self.depth):
+            values = columns[self.feature[nodes] * n + rows]
+            # children[2k + 1] est le fils gauche: même test (<=) que scikit-learn
+            nodes = self.children[2 * nodes + (values <= self.threshold[nodes])]
+        return nodes.reshape(self.n_trees, n)
+
+    def _mean(self, X):
+        X = self._check(X)
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            leaves = self._apply(X[start:start + CHUNK_ROWS])
+            # Somme arbre par arbre, dans l'ordre, comme l'accumulation de scikit-learn
+            out[start:start + CHUNK_ROWS] = np.cumsum(self.value[leaves], axis=0)[-1]
+        out /= self.n_trees
+        return out
+
+    def apply(self, X) -> np.ndarray:
+        """Feuille atteinte dans chaque arbre: tableau (lignes, arbres), comme RandomForest.apply"""
+        return (self._apply(self._check(X)) - self.roots[:, np.newaxis]).T
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.kind != 'classifier':
+            raise AttributeError("predict_proba n'existe que pour une forêt de classification")
+        return self._mean(X)
+
+    def predict(self, X) -> np.ndarray:
+        mean = self._mean(X)
+        if self.kind == 'classifier':
+            return self.classes[np.argmax(mean, axis=1)]
+        return mean[:, 0] if mean.shape[1] == 1 else mean
+
+
+def _leaf_values(estimator, kind):
+    tree = estimator.tree_
+    if kind == 'regressor':
+        return tree.value[:, :, 0].astype(np.float64)
+    # Normalisation de DecisionTreeClassifier.predict_proba, appliquée aux nœuds
+    values = tree.value[:, 0, :estimator.n_classes_].astype(np.float64)
+    normalizer = values.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    return values / normalizer
+
+
+def flatten_forest(model) -> FlatForest:
+    """Aplatit une forêt entraînée (RandomForest / ExtraTrees, classification mono-sortie ou régression)"""
+    if hasattr(model, 'predict_proba'):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Forêt de classification multi-sorties non supportée")
+        kind = 'classifier'
+    else:
+        kind = 'regressor'
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        index = np.arange(tree.node_count) + offset
+        leaf = tree.children_left == -1
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold))
+        pairs = np.empty((tree.node_count, 2), dtype=np.intp)
+        pairs[:, 0] = np.where(leaf, index, tree.children_right + offset)
+        pairs[:, 1] = np.where(leaf, index, tree.children_left + offset)
+        children.append(pairs.ravel())
+        values.append(_leaf_values(estimator, kind))
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    # Indices en intp: NumPy n'a pas à les convertir à chaque indexation
+    return FlatForest(
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.intp),
+        depth=int(depth),
+        kind=kind,
+        classes=np.asarray(model.classes_) if kind == 'classifier' else None,
+        n_features=int(model.n_features_in_),
+    )
+
+
+def save_flat(flat: FlatForest, directory: str) -> None:
+    """Écrit la forêt aplatie dans ``directory`` (un .npy par tableau, le reste en JSON).
+
+    Pas de .npz: ``np.load`` ne projette pas en mémoire les membres d'une archive.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for field in ARRAY_FIELDS:
+        np.save(os.path.join(directory, f'{field}.npy'), getattr(flat, field), allow_pickle=False)
+    scalars = {
+        'depth': flat.depth,
+        'kind': flat.kind,
+        'classes': flat.classes.tolist() if flat.classes is not None else None,
+        'n_features': flat.n_features,
+    }
+    with open(os.path.join(directory, SCALARS_FILE), 'w', encoding='utf-8') as handle:
+        json.dump(scalars, handle)
+
+
+def load_flat(directory: str, mmap_mode: Optional[str] = 'r') -> FlatForest:
+    """Relit une forêt écrite par save_flat, tableaux projetés en lecture seule par défaut"""
+    with open(os.path.join(directory, SCALARS_FILE), encoding='utf-8') as handle:
+        scalars = json.load(handle)
+    # np.asarray: vue ndarray sur la projection (l'indexation d'un np.memmap est plus lente)
+    arrays = {
+        field: np.asarray(np.load(os.path.join(directory, f'{field}.npy'), mmap_mode=mmap_mode, allow_pickle=False))
+        for field in ARRAY_FIELDS
+    }
+    classes = scalars['classes']
+    return FlatForest(
+        **arrays,
+        depth=int(scalars['depth']),
+        kind=scalars['kind'],
+        classes=np.asarray(classes) if classes is not None else None,
+        n_features=int(scalars['n_features']),
+    )
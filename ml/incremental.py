@@ -0,0 +1,232 @@
+"""
+Réentraînement incrémental des forêts à partir des fichiers extraits.
+
+Le réentraînement complet (ml/train_model.py, ml/train_enhanced_model.py)
+relit tout l'historique: sa durée croît avec lui. ``retrain`` ne lit que les
+fichiers ``part-*.npz`` de numéro supérieur au point de reprise de la version
+active (``last_part`` dans ses métadonnées; l'extraction ne réutilise jamais
+un numéro, même avec ``--full``, et si le dossier ne contient que des numéros
+inférieurs, il est relu en entier) et ajoute ``trees`` arbres
+entraînés sur ces seules lignes (``warm_start`` de scikit-learn); les arbres
+existants ne changent pas. Au-delà de ``max_trees``, les plus anciens sont
+retirés: la forêt oublie progressivement les données les plus anciennes.
+
+Validation sur une fenêtre glissante: parmi les lignes à traiter (nouvelles
+lignes et fenêtre de validation précédente), la fraction ``holdout`` la plus
+récente (par date de fin réelle) n'est pas apprise. Le modèle actif et le
+modèle mis à jour y sont comparés; la nouvelle version n'est publiée que si
+l'erreur ne dépasse pas celle du modèle actif de plus de ``tolerance``. Ces
+lignes réservées sont conservées (``incremental-<nom>.npz`` dans le dossier
+des données) et apprises au passage suivant.
+
+Sans lignes suffisantes (ou, pour le classifieur, sans les deux issues), ou
+si la validation échoue, rien n'est écrit: le point de reprise n'avance pas
+et les mêmes lignes sont reprises au passage suivant avec les nouvelles.
+"""
+import copy
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .inference import MULTI_OUTPUT_MODEL, _enhanced_parts
+from .registry import DELAY_MODEL, ENHANCED_MODELS, ModelRegistry, get_registry
+from .train_model import extracted_parts, load_extracted
+
+STATE_FILE = 'incremental-{name}.npz'
+DEFAULT_TREES = 50
+DEFAULT_MAX_TREES = 600
+DEFAULT_HOLDOUT = 0.2
+DEFAULT_TOLERANCE = 0.02
+DEFAULT_MIN_ROWS = 50
+
+DELAY_FEATURES = ['progress_percent', 'budget_spent', 'weather', 'incidents']
+
+
+# --- Jeux de lignes par modèle: (variables, cibles, date de fin réelle) ---
+
+def _delay_rows(df, bundle):
+    """Classifieur de retard: variables de ml/train_model.py, cible ``delay``"""
+    return (df[DELAY_FEATURES].to_numpy(dtype=np.float64), df[['delay']].to_numpy(dtype=np.float64),
+            df['completed_on'].to_numpy(dtype=np.int64))
+
+
+def _enhanced_rows(df, bundle):
+    """Modèles enrichis: mêmes entrées qu'en production (analytics/views.py), cibles en pourcentage.
+
+    ``incidents`` est le nombre de risques ouverts et ``team_experience``, sans
+    source en base, prend la moyenne d'entraînement du scaler. Les projets sans
+    budget connu sont écartés.
+    """
+    df = df[df['budget_overrun'].notna()]
+    scaler = bundle['scaler']
+    columns = {**{name: df[name] for name in df.columns}, 'incidents': df['open_risks']}
+    x = np.column_stack([
+        columns[name].to_numpy(dtype=np.float64) if name in columns else np.full(len(df), scaler.mean_[i])
+        for i, name in enumerate(bundle['feature_cols'])
+    ])
+    return x, df[['delay', 'budget_overrun']].to_numpy(dtype=np.float64) * 100, df['completed_on'].to_numpy(dtype=np.int64)
+
+
+# --- Croissance des forêts ---
+
+def _grow(forest, x, y, trees, max_trees, seed):
+    """Copie de ``forest`` avec ``trees`` arbres appris sur (x, y); les plus anciens au-delà de ``max_trees`` retirés"""
+    grown = copy.deepcopy(forest)
+    grown.set_params(warm_start=True, n_estimators=len(grown.estimators_) + trees, random_state=seed)
+    if hasattr(forest, 'feature_names_in_'):
+        x = pd.DataFrame(x, columns=forest.feature_names_in_)
+    grown.fit(x, y)
+    dropped = max(0, len(grown.estimators_) - max_trees)
+    if dropped:
+        grown.estimators_ = grown.estimators_[dropped:]
+    grown.set_params(warm_start=False, n_estimators=len(grown.estimators_))
+    return grown, dropped
+
+
+def _grow_delay(model, x, y, trees, max_trees, seed):
+    target = y[:, 0].astype(int)
+    # warm_start recalcule les classes sur les nouvelles lignes: elles doivent toutes y figurer
+    if not np.array_equal(np.unique(target), model.classes_):
+        return None, 0
+    return _grow(model, x, target, trees, max_trees, seed)
+
+
+def _grow_enhanced(bundle, x, y, trees, max_trees, seed):
+    scaled = bundle['scaler'].transform(x)  # scaler figé: les nouveaux arbres voient la même échelle
+    grown, dropped = dict(bundle), 0
+    for part in _enhanced_parts(bundle):
+        if part == MULTI_OUTPUT_MODEL:
+            target = y
+        else:
+            target = y[:, 0] if part == 'delay_model' else y[:, 1]
+        grown[part], dropped = _grow(bundle[part], scaled, target, trees, max_trees, seed)
+    return grown, dropped
+
+
+def _delay_error(model, x, y):
+    """Score de Brier (défini même si la fenêtre ne contient qu'une issue)"""
+    if hasattr(model, 'feature_names_in_'):
+        x = pd.DataFrame(x, columns=model.feature_names_in_)
+    proba = model.predict_proba(x)[:, list(model.classes_).index(1)]
+    return float(np.mean((proba - y[:, 0]) ** 2))
+
+
+def _enhanced_error(bundle, x, y):
+    """Erreur absolue moyenne (points de pourcentage) sur le retard et le budget"""
+    scaled = bundle['scaler'].transform(x)
+    if MULTI_OUTPUT_MODEL in bundle:
+        predicted = bundle[MULTI_OUTPUT_MODEL].predict(scaled)
+    else:
+        predicted = np.column_stack([bundle['delay_model'].predict(scaled), bundle['budget_model'].predict(scaled)])
+    return float(np.mean(np.abs(np.clip(predicted, 0, 100) - y)))
+
+
+# nom -> (lignes, croissance, erreur, métrique)
+MODELS = {
+    DELAY_MODEL: (_delay_rows, _grow_delay, _delay_error, 'holdout_brier'),
+    ENHANCED_MODELS: (_enhanced_rows, _grow_enhanced, _enhanced_error, 'holdout_mae'),
+}
+
+
+# --- Fenêtre de validation conservée ---
+
+def _state_path(directory, name):
+    return os.path.join(directory, STATE_FILE.format(name=name))
+
+
+def _read_state(directory, name, version):
+    """Fenêtre de validation laissée par ``version`` (vide si elle vient d'une autre version)"""
+    try:
+        with np.load(_state_path(directory, name)) as archive:
+            if str(archive['version']) == version:
+                return archive['x'], archive['y'], archive['completed_on']
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _save_state(directory, name, version, x, y, completed_on):
+    fd, tmp_path = tempfile.mkstemp(prefix='.incremental-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            np.savez(handle, version=np.array(version), x=x, y=y, completed_on=completed_on)
+        os.replace(tmp_path, _state_path(directory, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# --- Réentraînement ---
+
+def retrain(name: str, directory: str, trees: int = DEFAULT_TREES, max_trees: int = DEFAULT_MAX_TREES,
+            holdout: float = DEFAULT_HOLDOUT, tolerance: float = DEFAULT_TOLERANCE,
+            min_rows: int = DEFAULT_MIN_ROWS, publish: bool = True,
+            registry: Optional[ModelRegistry] = None) -> Dict[str, Any]:
+    """Ajoute au modèle actif ``name`` des arbres appris sur les lignes extraites depuis son point de reprise.
+
+    Renvoie un résumé: ``status`` ('published', 'validated' sans publication,
+    'rejected', 'insufficient' ou 'up-to-date'), lignes traitées, erreurs sur
+    la fenêtre de validation et version publiée.
+    """
+    rows, grow, error, metric = MODELS[name]
+    registry = registry or get_registry()
+    loaded = registry.get(name)
+    checkpoint = int(loaded.metadata.get('last_part', 0))
+    parts = extracted_parts(directory)
+    # Point de reprise au-delà du dernier fichier: dossier recréé ou renuméroté, tout est relu
+    reset = bool(parts) and parts[-1][0] < checkpoint
+    if reset:
+        checkpoint = 0
+    summary = {'name': name, 'base_version': loaded.version, 'checkpoint': checkpoint, 'reset': reset, 'new_rows': 0}
+
+    df = load_extracted(directory, after=checkpoint)
+    if df.empty:
+        return {**summary, 'status': 'up-to-date'}
+    x, y, completed_on = rows(df, loaded.model)
+    summary.update(new_rows=len(x), last_part=df.attrs['last_part'])
+
+    # Fenêtre précédente (lignes plus anciennes que le point de reprise) et nouvelles lignes
+    previous = None if reset else _read_state(directory, name, loaded.version)
+    if previous is not None:
+        x, y, completed_on = (np.concatenate([old, new]) for old, new in zip(previous, (x, y, completed_on)))
+    order = np.argsort(completed_on, kind='stable')
+    x, y, completed_on = x[order], y[order], completed_on[order]
+    held = int(np.ceil(len(x) * holdout))
+    train = len(x) - held
+    summary.update(train_rows=train, holdout_rows=held)
+    if train < min_rows or held == 0:
+        return {**summary, 'status': 'insufficient'}
+
+    seed = 1000 + summary['last_part']
+    model, dropped = grow(loaded.model, x[:train], y[:train], trees, max_trees, seed)
+    if model is None:
+        return {**summary, 'status': 'insufficient'}
+    before = error(loaded.model, x[train:], y[train:])
+    after = error(model, x[train:], y[train:])
+    summary.update(trees_added=trees, trees_dropped=dropped, error_before=before, error_after=after, metric=metric)
+    if after > before * (1 + tolerance):
+        return {**summary, 'status': 'rejected'}
+    if not publish:
+        return {**summary, 'status': 'validated'}
+
+    if isinstance(model, dict):
+        model['metrics'] = {metric: after}
+    metadata = {
+        key: value for key, value in loaded.metadata.items()
+        if key in ('feature_columns', 'params')
+    }
+    version = registry.publish(name, model, {
+        **metadata,
+        'metrics': {metric: after, f'{metric}_base': before},
+        'source': 'ml/incremental.py',
+        'last_part': summary['last_part'],
+        'incremental': {key: summary[key] for key in (
+            'base_version', 'checkpoint', 'new_rows', 'train_rows', 'holdout_rows', 'trees_added', 'trees_dropped',
+        )},
+    })
+    # Fenêtre réservée: apprise au prochain passage (à partir de la version publiée)
+    _save_state(directory, name, version, x[train:], y[train:], completed_on[train:])
+    return {**summary, 'status': 'published', 'version': version}
@@ -1,54 +1,284 @@
 import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict
 
 import numpy as np
 
+from .flat_forest import flatten_forest
+from .registry import DELAY_MODEL, ENHANCED_MODELS, get_registry
+
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'artifacts', 'buildflow_rf.pkl')
 
-_MODEL = None
+# Moteur d'inférence: 'sklearn', 'flat' (ml/flat_forest.py) ou 'auto' (flat
+# jusqu'à FLAT_FOREST_MAX_ROWS lignes, au-delà le parcours Cython est plus rapide)
+INFERENCE_ENGINE = os.environ.get('BUILDFLOW_INFERENCE_ENGINE', 'sklearn')
+FLAT_FOREST_MAX_ROWS = 1000
+
+# Clé d'un régresseur multi-sorties (colonnes: retard, budget) dans les modèles
+# enrichis, à la place de delay_model et budget_model (ml/tune_enhanced_model.py)
+MULTI_OUTPUT_MODEL = 'multi_model'
+
+_FLAT_FORESTS = {}  # (nom du modèle, composant) -> (clé de version, FlatForest)
 
 
-def load_model(path: str = MODEL_PATH):
-    global _MODEL
-    if _MODEL is None:
+def load_model(path: str = None):
+    """Classifieur de retard actif du registre (ou, avec ``path``, un artefact donné)"""
+    if path is not None:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Modèle introuvable: {path}. Entraînez-le avec ml/train_model.py")
         with open(path, 'rb') as f:
-            _MODEL = pickle.load(f)
-    return _MODEL
+            return pickle.load(f)
+    return get_registry().get(DELAY_MODEL).model
+
+
+def model_version() -> str:
+    """Identifiant de la version active du classifieur (nom:version)"""
+    return get_registry().get(DELAY_MODEL).key
+
+
+def _flat_forest(loaded, part=None):
+    """Forêt aplatie du modèle chargé (ou de son composant ``part``), renouvelée après un changement de version.
+
+    Celle publiée dans le registre est projetée en mémoire (partagée entre
+    processus); à défaut (artefact historique), elle est aplatie ici.
+    """
+    slot = (loaded.name, part)
+    entry = _FLAT_FORESTS.get(slot)
+    if entry is None or entry[0] != loaded.key:
+        flat = get_registry().flat_forest(loaded, part)
+        if flat is None:
+            flat = flatten_forest(loaded.model if part is None else loaded.model[part])
+        entry = _FLAT_FORESTS[slot] = (loaded.key, flat)
+    return entry[1]
+
+
+def preload_models(engine: str = None) -> list:
+    """Charge les modèles actifs et, hors moteur scikit-learn, leurs forêts aplaties.
+
+    Appelé dans le maître gunicorn avant le fork (gunicorn.conf.py): les workers
+    héritent des objets chargés au lieu de dépickler chacun leur copie.
+    """
+    loaded = get_registry().preload([DELAY_MODEL, ENHANCED_MODELS])
+    if (engine or INFERENCE_ENGINE) != 'sklearn':
+        _flat_forest(loaded[0])
+        for part in _enhanced_parts(loaded[1].model):
+            _flat_forest(loaded[1], part)
+    return [model.key for model in loaded]
+
+
+def _enhanced_parts(bundle):
+    """Régresseurs des modèles enrichis: un multi-sorties (retard, budget) ou deux modèles"""
+    return (MULTI_OUTPUT_MODEL,) if MULTI_OUTPUT_MODEL in bundle else ('delay_model', 'budget_model')
+
+
+def _use_flat(engine, rows):
+    engine = engine or INFERENCE_ENGINE
+    return engine == 'flat' or (engine == 'auto' and rows <= FLAT_FOREST_MAX_ROWS)
+
+
+def _predict_proba(loaded, x, engine=None):
+    if _use_flat(engine, len(x)):
+        try:
+            return _flat_forest(loaded).predict_proba(x)
+        except (AttributeError, ValueError):
+            pass  # modèle actif qui n'est pas une forêt: scikit-learn
+    return loaded.model.predict_proba(x)
+
+
+def _regress(loaded, part, x, engine=None):
+    if _use_flat(engine, len(x)):
+        try:
+            return _flat_forest(loaded, part).predict(x)
+        except (AttributeError, ValueError):
+            pass
+    return loaded.model[part].predict(x)
+
+
+class PredictionCache:
+    """Cache LRU à durée de vie limitée, partagé par les threads d'un processus.
 
+    Les clés de predict_batch sont (version du modèle, vecteur d'entrée): un
+    nouvel artefact ou une variable modifiée donnent une autre clé, sans
+    invalidation explicite. Les compteurs servent à dimensionner le cache.
+    """
 
-def predict_from_input(progress_percent: float, budget_spent: float, weather: int, incidents: int) -> Dict[str, object]:
-    model = load_model()
-    x = np.array([[progress_percent, budget_spent, weather, incidents]], dtype=float)
-    delay_prob = float(model.predict_proba(x)[0, 1])  # 0..1
+    def __init__(self, maxsize: int = 10000, ttl: float = 900.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clé -> (expiration, valeur)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+RECO_DELAY = "Accélérer les phases critiques et renforcer l'équipe sur le chemin critique."
+RECO_BUDGET = "Réviser le plan d'achats et négocier des économies immédiates."
+RECO_WEATHER = "Adapter le planning aux conditions météo défavorables et protéger le chantier."
+RECO_INCIDENTS = "Mettre en place un plan de prévention des incidents et audits sécurité."
+RECO_DEFAULT = "Poursuivre selon le plan, surveiller jalons et coûts hebdomadaires."
+
+
+def _cached(cache, loaded, x, compute):
+    """``compute(x)`` ligne à ligne; avec ``cache``, seules les lignes absentes sont calculées"""
+    if cache is None:
+        return np.asarray(compute(x), dtype=np.float64)
+    keys = [(loaded.key, row.tobytes()) for row in x]
+    values = [cache.get(key) for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        computed = np.asarray(compute(x[missing]), dtype=np.float64)
+        for i, value in zip(missing, computed.tolist()):
+            cache.set(keys[i], value)
+            values[i] = value
+    return np.array(values, dtype=np.float64)
+
+
+def _recommendations(delay_prob, budget_overrun, weather, incidents):
+    rules = np.column_stack([delay_prob > 0.6, budget_overrun > 0.5, weather == 2, incidents > 2])
+    texts = (RECO_DELAY, RECO_BUDGET, RECO_WEATHER, RECO_INCIDENTS)
+    return [
+        [text for text, hit in zip(texts, row) if hit] or [RECO_DEFAULT]
+        for row in rules.tolist()
+    ]
+
+
+def predict_batch(progress_percent, budget_spent, weather, incidents, cache: PredictionCache = None,
+                  engine: str = None) -> Dict[str, object]:
+    """Prédictions de N projets en un seul appel ``predict_proba``.
+
+    Les arguments sont des tableaux (ou scalaires diffusés) de même longueur N.
+    Avec ``cache``, seules les lignes absentes du cache passent par le modèle.
+    ``engine`` remplace ``INFERENCE_ENGINE`` pour cet appel.
+    Retourne ``delay_probability`` et ``budget_overrun_estimate`` (tableaux
+    float64 dans 0..1) et ``recommendations`` (liste de N listes).
+    """
+    progress_percent, budget_spent, weather, incidents = np.broadcast_arrays(*(
+        np.atleast_1d(np.asarray(values, dtype=float))
+        for values in (progress_percent, budget_spent, weather, incidents)
+    ))
+    n = progress_percent.shape[0]
+    if n == 0:
+        return {'delay_probability': np.empty(0), 'budget_overrun_estimate': np.empty(0), 'recommendations': []}
+
+    loaded = get_registry().get(DELAY_MODEL)
+    x = np.column_stack([progress_percent, budget_spent, weather, incidents])
+    delay_prob = _cached(cache, loaded, x, lambda rows: _predict_proba(loaded, rows, engine)[:, 1])
 
     # Estimation heuristique de dépassement budgétaire basée sur l'écart dépense/avancement
-    gap = max(0.0, (budget_spent - max(progress_percent, 1e-3)) / 100.0)
-    budget_overrun = min(1.0, 0.6 * gap + 0.3 * (weather == 2) + 0.1 * min(1.0, incidents / 5.0))
-
-    recs = []
-    if delay_prob > 0.6:
-        recs.append("Accélérer les phases critiques et renforcer l'équipe sur le chemin critique.")
-    if budget_overrun > 0.5:
-        recs.append("Réviser le plan d'achats et négocier des économies immédiates.")
-    if weather == 2:
-        recs.append("Adapter le planning aux conditions météo défavorables et protéger le chantier.")
-    if incidents > 2:
-        recs.append("Mettre en place un plan de prévention des incidents et audits sécurité.")
-    if not recs:
-        recs.append("Poursuivre selon le plan, surveiller jalons et coûts hebdomadaires.")
+    gap = np.maximum(0.0, (budget_spent - np.maximum(progress_percent, 1e-3)) / 100.0)
+    budget_overrun = np.minimum(
+        1.0, 0.6 * gap + 0.3 * (weather == 2) + 0.1 * np.minimum(1.0, incidents / 5.0)
+    )
 
     return {
-        'delay_probability': round(delay_prob * 100, 1),
-        'budget_overrun_estimate': round(budget_overrun * 100, 1),
-        'recommendations': recs,
+        'delay_probability': delay_prob,
+        'budget_overrun_estimate': budget_overrun,
+        'recommendations': _recommendations(delay_prob, budget_overrun, weather, incidents),
     }
 
 
+def enhanced_feature_columns():
+    """Colonnes attendues par les modèles enrichis actifs, dans l'ordre"""
+    return list(get_registry().get(ENHANCED_MODELS).model['feature_cols'])
+
+
+def predict_enhanced_batch(inputs: Dict[str, object], cache: PredictionCache = None,
+                           engine: str = None) -> Dict[str, object]:
+    """Prédictions des modèles enrichis (retard et budget) pour N projets en un appel.
 
+    ``inputs``: {colonne: tableau de N valeurs} pour les colonnes de
+    ``enhanced_feature_columns()``. Une colonne absente prend la moyenne
+    d'entraînement du scaler, soit 0 une fois normalisée (variable neutre).
+    Les deux régresseurs (ou le régresseur multi-sorties) évaluent la même
+    matrice normalisée. Même format de retour que ``predict_batch``.
+    """
+    loaded = get_registry().get(ENHANCED_MODELS)
+    bundle = loaded.model
+    scaler = bundle['scaler']
+    columns = list(bundle['feature_cols'])
 
+    provided = {name: np.atleast_1d(np.asarray(values, dtype=float)) for name, values in inputs.items()}
+    n = max((len(values) for values in provided.values()), default=0)
+    if n == 0:
+        return {'delay_probability': np.empty(0), 'budget_overrun_estimate': np.empty(0), 'recommendations': []}
+    x = np.column_stack([
+        np.broadcast_to(provided[name], (n,)) if name in provided else np.full(n, scaler.mean_[i])
+        for i, name in enumerate(columns)
+    ])
 
+    def compute(rows):
+        # StandardScaler.transform sans la validation scikit-learn (mêmes opérations)
+        scaled = rows.copy()
+        if scaler.with_mean:
+            scaled -= scaler.mean_
+        if scaler.with_std:
+            scaled /= scaler.scale_
+        if MULTI_OUTPUT_MODEL in bundle:
+            return _regress(loaded, MULTI_OUTPUT_MODEL, scaled, engine)
+        return np.column_stack([
+            _regress(loaded, 'delay_model', scaled, engine),
+            _regress(loaded, 'budget_model', scaled, engine),
+        ])
+
+    # Régresseurs entraînés sur des pourcentages
+    predicted = _cached(cache, loaded, x, compute)
+    delay_prob = np.clip(predicted[:, 0] / 100.0, 0.0, 1.0)
+    budget_overrun = np.clip(predicted[:, 1] / 100.0, 0.0, 1.0)
+    return {
+        'delay_probability': delay_prob,
+        'budget_overrun_estimate': budget_overrun,
+        'recommendations': _recommendations(
+            delay_prob, budget_overrun, x[:, columns.index('weather')], x[:, columns.index('incidents')],
+        ),
+    }
 
 
+def predict_from_input(progress_percent: float, budget_spent: float, weather: int, incidents: int,
+                       engine: str = None) -> Dict[str, object]:
+    result = predict_batch([progress_percent], [budget_spent], [weather], [incidents], engine=engine)
+    return {
+        'delay_probability': round(float(result['delay_probability'][0]) * 100, 1),
+        'budget_overrun_estimate': round(float(result['budget_overrun_estimate'][0]) * 100, 1),
+        'recommendations': result['recommendations'][0],
+    }
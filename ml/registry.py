@@ -0,0 +1,287 @@
+"""
+Registre des modèles: artefacts versionnés, version active et rechargement à chaud.
+
+Arborescence (racine ``BUILDFLOW_MODEL_REGISTRY``, par défaut ``ml/artifacts/registry``)::
+
+    <nom>/
+        ACTIVE              # version servie (une ligne)
+        v1/model.pkl
+        v1/metadata.json    # colonnes, métriques, date, source
+        v1/flat/<composant>/  # forêts aplaties (.npy projetables en mémoire)
+        v2/...
+
+Une version est écrite dans un répertoire temporaire puis renommée: elle
+n'apparaît que complète. Le pointeur ACTIVE est remplacé par ``os.replace``
+(atomique). Chaque processus charge le modèle au premier usage et vérifie le
+pointeur à chaque appel de ``get`` (un ``stat``): une activation est prise en
+compte à la requête suivante, sans redémarrage. Si la nouvelle version ne se
+charge pas, l'ancienne reste servie.
+
+Les forêts d'une version (le modèle, ou chaque composant d'un dictionnaire de
+modèles) sont aussi écrites aplaties (``ml/flat_forest.py``). ``flat_forest``
+les projette en mémoire: tous les workers d'une machine partagent une seule
+copie physique des arbres au lieu d'une copie dépicklée chacun.
+
+Sans pointeur ACTIVE, les artefacts historiques de ``ml/artifacts``
+(``LEGACY_ARTIFACTS``) sont servis sous la version ``legacy``.
+"""
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+try:
+    from .flat_forest import FlatForest, flatten_forest, load_flat, save_flat
+except ImportError:  # import depuis ml/ (scripts d'entraînement)
+    from flat_forest import FlatForest, flatten_forest, load_flat, save_flat
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), 'artifacts')
+REGISTRY_DIR = os.environ.get('BUILDFLOW_MODEL_REGISTRY') or os.path.join(ARTIFACTS_DIR, 'registry')
+
+DELAY_MODEL = 'delay_rf'
+ENHANCED_MODELS = 'enhanced'
+
+# Artefacts antérieurs au registre: nom -> (fichier, métadonnées)
+LEGACY_ARTIFACTS = {
+    DELAY_MODEL: ('buildflow_rf.pkl', {
+        'feature_columns': ['progress_percent', 'budget_spent', 'weather', 'incidents'],
+        'source': 'ml/train_model.py',
+    }),
+    ENHANCED_MODELS: ('enhanced_models.pkl', {
+        'feature_columns': [
+            'progress_percent', 'budget_spent', 'weather', 'incidents',
+            'team_size', 'team_experience', 'permit_delays', 'supply_chain_issues',
+        ],
+        'source': 'ml/train_enhanced_model.py',
+    }),
+}
+
+ARTIFACT_FILE = 'model.pkl'
+METADATA_FILE = 'metadata.json'
+ACTIVE_FILE = 'ACTIVE'
+FLAT_DIR = 'flat'
+MODEL_PART = 'model'  # répertoire de la forêt d'un modèle simple (composant None)
+LEGACY_VERSION = 'legacy'
+
+
+def _forest_parts(model) -> Dict[Optional[str], Any]:
+    """Forêts d'un artefact: {None: modèle} ou {clé: composant} pour un dictionnaire de modèles"""
+    if hasattr(model, 'estimators_'):
+        return {None: model}
+    if isinstance(model, dict):
+        return {key: value for key, value in model.items() if hasattr(value, 'estimators_')}
+    return {}
+
+
+def _write_flat(model, directory) -> List[str]:
+    """Écrit les forêts aplaties de ``model`` sous ``directory``; renvoie les composants écrits"""
+    written = []
+    for part, forest in _forest_parts(model).items():
+        try:
+            flat = flatten_forest(forest)
+        except ValueError as exc:
+            logger.warning("Forêt %s non aplatie: %s", part or MODEL_PART, exc)
+            continue
+        save_flat(flat, os.path.join(directory, part or MODEL_PART))
+        written.append(part or MODEL_PART)
+    return written
+
+
+class LoadedModel(NamedTuple):
+    name: str
+    version: str
+    model: Any
+    metadata: Dict[str, Any]
+
+    @property
+    def key(self) -> str:
+        """Identifiant stable (nom:version), utilisable comme clé de cache"""
+        return f'{self.name}:{self.version}'
+
+
+class ModelRegistry:
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        self._loaded: Dict[str, LoadedModel] = {}
+        self._pointers: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    # --- Lecture du registre ---
+
+    def _dir(self, name, version=None):
+        return os.path.join(self.root, name, version) if version else os.path.join(self.root, name)
+
+    def versions(self, name: str) -> List[str]:
+        """Versions publiées, de la plus ancienne à la plus récente"""
+        path = self._dir(name)
+        if not os.path.isdir(path):
+            return []
+        found = [
+            entry for entry in os.listdir(path)
+            if entry.startswith('v') and entry[1:].isdigit() and os.path.isdir(os.path.join(path, entry))
+        ]
+        return sorted(found, key=lambda version: int(version[1:]))
+
+    def names(self) -> List[str]:
+        names = set(LEGACY_ARTIFACTS)
+        if os.path.isdir(self.root):
+            names.update(entry for entry in os.listdir(self.root) if os.path.isdir(self._dir(entry)))
+        return sorted(names)
+
+    def active_version(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._dir(name), ACTIVE_FILE), encoding='utf-8') as handle:
+                return handle.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, name: str, version: Optional[str] = None) -> Dict[str, Any]:
+        version = version or self.active_version(name) or LEGACY_VERSION
+        if version == LEGACY_VERSION:
+            filename, metadata = LEGACY_ARTIFACTS[name]
+            return {'name': name, 'version': LEGACY_VERSION, 'artifact': os.path.join(ARTIFACTS_DIR, filename), **metadata}
+        with open(os.path.join(self._dir(name, version), METADATA_FILE), encoding='utf-8') as handle:
+            return json.load(handle)
+
+    # --- Publication ---
+
+    def publish(self, name: str, model: Any, metadata: Optional[Dict[str, Any]] = None, activate: bool = True) -> str:
+        """Écrit une nouvelle version (répertoire complet ou rien) et l'active au besoin"""
+        os.makedirs(self._dir(name), exist_ok=True)
+        existing = self.versions(name)
+        version = f'v{int(existing[-1][1:]) + 1 if existing else 1}'
+
+        staging = tempfile.mkdtemp(prefix=f'.{version}-', dir=self._dir(name))
+        try:
+            # mkdtemp crée en 0700: les workers peuvent tourner sous un autre utilisateur
+            os.chmod(staging, 0o755)
+            with open(os.path.join(staging, ARTIFACT_FILE), 'wb') as handle:
+                pickle.dump(model, handle)
+            document = {
+                **(metadata or {}),
+                'name': name,
+                'version': version,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'artifact': ARTIFACT_FILE,
+                'flat_forests': _write_flat(model, os.path.join(staging, FLAT_DIR)),
+            }
+            with open(os.path.join(staging, METADATA_FILE), 'w', encoding='utf-8') as handle:
+                json.dump(document, handle, indent=2, ensure_ascii=False, default=float)
+            os.rename(staging, self._dir(name, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def activate(self, name: str, version: str) -> None:
+        """Remplace atomiquement le pointeur de version active"""
+        if version not in self.versions(name):
+            raise ValueError(f"Version inconnue pour {name}: {version}")
+        fd, tmp_path = tempfile.mkstemp(prefix='.ACTIVE-', dir=self._dir(name))
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(version + '\n')
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(self._dir(name), ACTIVE_FILE))
+
+    def flatten(self, name: str, version: str) -> List[str]:
+        """Ajoute les forêts aplaties à une version publiée avant leur introduction"""
+        if version not in self.versions(name):
+            raise ValueError(f"Version inconnue pour {name}: {version}")
+        metadata = self.metadata(name, version)
+        path = self._dir(name, version)
+        if os.path.isdir(os.path.join(path, FLAT_DIR)):
+            return metadata.get('flat_forests', [])
+
+        with open(os.path.join(path, metadata.get('artifact', ARTIFACT_FILE)), 'rb') as handle:
+            model = pickle.load(handle)
+        staging = tempfile.mkdtemp(prefix=f'.{FLAT_DIR}-', dir=path)
+        try:
+            os.chmod(staging, 0o755)
+            parts = _write_flat(model, staging)
+            os.rename(staging, os.path.join(path, FLAT_DIR))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{METADATA_FILE}-', dir=path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            json.dump({**metadata, 'flat_forests': parts}, handle, indent=2, ensure_ascii=False, default=float)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(path, METADATA_FILE))
+        return parts
+
+    # --- Chargement ---
+
+    def _pointer(self, name):
+        try:
+            stat = os.stat(os.path.join(self._dir(name), ACTIVE_FILE))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, name, version):
+        metadata = self.metadata(name, version)
+        if version == LEGACY_VERSION:
+            path = metadata['artifact']
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Modèle introuvable: {path}. Entraînez-le avec {metadata['source']}")
+        else:
+            path = os.path.join(self._dir(name, version), metadata.get('artifact', ARTIFACT_FILE))
+        with open(path, 'rb') as handle:
+            return LoadedModel(name, version, pickle.load(handle), metadata)
+
+    def get(self, name: str) -> LoadedModel:
+        """Modèle actif, chargé au premier usage et rechargé si le pointeur a changé"""
+        pointer = self._pointer(name)
+        loaded = self._loaded.get(name)
+        if loaded is not None and self._pointers.get(name) == pointer:
+            return loaded
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and self._pointers.get(name) == pointer:
+                return loaded
+            version = self.active_version(name) or LEGACY_VERSION
+            if loaded is None or loaded.version != version:
+                try:
+                    loaded = self._load(name, version)
+                except Exception:
+                    if loaded is None:
+                        raise
+                    logger.exception("Chargement de %s:%s impossible, %s reste servie", name, version, loaded.version)
+            self._loaded[name] = loaded
+            self._pointers[name] = pointer
+            return loaded
+
+    def flat_forest(self, loaded: LoadedModel, part: Optional[str] = None) -> Optional[FlatForest]:
+        """Forêt aplatie publiée avec ``loaded``, projetée en mémoire (None si absente)"""
+        if loaded.version == LEGACY_VERSION:
+            return None
+        path = os.path.join(self._dir(loaded.name, loaded.version), FLAT_DIR, part or MODEL_PART)
+        if not os.path.isdir(path):
+            return None
+        return load_flat(path)
+
+    def preload(self, names: Optional[List[str]] = None) -> List[LoadedModel]:
+        """Charge les modèles actifs d'avance (supprime la latence de la première requête)"""
+        return [self.get(name) for name in (names or list(LEGACY_ARTIFACTS))]
+
+
+_REGISTRY = None
+
+
+def get_registry() -> ModelRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = ModelRegistry()
+    return _REGISTRY
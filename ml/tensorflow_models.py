@@ -1,15 +1,32 @@
 """
 Modèles TensorFlow avancés pour la prédiction du suivi de chantier
+
+TensorFlow n'est importé qu'au premier usage (construction, chargement ou
+prédiction d'un modèle): importer ce module ne coûte pas les secondes de
+démarrage de TensorFlow.
 """
+from __future__ import annotations
+
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
-from typing import Dict, Tuple, List
+from typing import TYPE_CHECKING, Dict, Tuple, List
 import os
 
+if TYPE_CHECKING:
+    import tensorflow as tf
+    from tensorflow import keras
+
+OUTPUTS = ('delay_probability', 'budget_overrun_probability')
+
+
+def _tensorflow():
+    """Module TensorFlow, importé au premier appel"""
+    import tensorflow
+    return tensorflow
+
+
 class ConstructionLSTM:
     """Modèle LSTM pour la prédiction temporelle des chantiers"""
     
@@ -21,6 +38,8 @@ class ConstructionLSTM:
         
     def build_model(self) -> keras.Model:
         """Construit le modèle LSTM"""
+        keras = _tensorflow().keras
+        layers = keras.layers
         model = keras.Sequential([
             layers.LSTM(128, return_sequences=True, input_shape=(self.sequence_length, self.features)),
             layers.Dropout(0.2),
@@ -38,23 +57,82 @@ class ConstructionLSTM:
         )
         return model
     
+    def fit_scaler(self, features: np.ndarray, chunk_size: int = 100_000) -> MinMaxScaler:
+        """Ajuste le scaler une fois, par paquets (tableaux projetés en mémoire compris)"""
+        self.scaler = MinMaxScaler()
+        for start in range(0, len(features), chunk_size):
+            self.scaler.partial_fit(np.asarray(features[start:start + chunk_size], dtype=np.float64))
+        return self.scaler
+
+    def _scaler_fitted(self) -> bool:
+        return hasattr(self.scaler, 'scale_')
+
+    def windows(self, features: np.ndarray) -> np.ndarray:
+        """Fenêtres (N - L + 1, L, variables) sur ``features``: une vue, sans copie des données"""
+        return sliding_window_view(features, self.sequence_length, axis=0).transpose(0, 2, 1)
+
     def prepare_sequences(self, data: pd.DataFrame, target_cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
-        """Prépare les séquences temporelles"""
-        sequences = []
-        targets = []
-        
-        # Normaliser les données
-        scaled_data = self.scaler.fit_transform(data.drop(columns=target_cols))
+        """Prépare les séquences temporelles.
+
+        Les séquences sont une vue en lecture seule sur les données normalisées
+        (une seule copie de ``data``, non ``sequence_length`` copies). Le scaler
+        n'est ajusté qu'au premier appel: les appels suivants (validation,
+        inférence) utilisent la même échelle.
+        """
+        features = data.drop(columns=target_cols).to_numpy(dtype=np.float64)
         target_data = data[target_cols].values
-        
-        for i in range(len(data) - self.sequence_length):
-            seq = scaled_data[i:i + self.sequence_length]
-            target = target_data[i + self.sequence_length - 1]
-            sequences.append(seq)
-            targets.append(target)
-            
-        return np.array(sequences), np.array(targets)
-    
+        count = len(data) - self.sequence_length
+        if count <= 0:
+            return np.empty((0, self.sequence_length, features.shape[1])), np.empty((0, len(target_cols)))
+
+        if not self._scaler_fitted():
+            self.fit_scaler(features)
+        scaled_data = self.scaler.transform(features)
+        # Cible: dernier pas de chaque fenêtre
+        return self.windows(scaled_data)[:count], target_data[self.sequence_length - 1:len(data) - 1]
+
+    def make_dataset(self, features, targets, batch_size: int = 32, shuffle: bool = False,
+                     start: int = 0, stop: int = None, seed: int = None) -> tf.data.Dataset:
+        """Pipeline tf.data des fenêtres ``start`` à ``stop`` de séries brutes (non normalisées).
+
+        ``features`` (N, variables) et ``targets`` (N, sorties) peuvent être des
+        tableaux projetés en mémoire (``np.load(..., mmap_mode='r')`` ou chemins
+        de fichiers .npy): seules les fenêtres d'un lot sont lues et normalisées,
+        au moment où le lot est demandé; les lots suivants sont préparés pendant
+        l'entraînement (prefetch). Mêmes fenêtres et cibles que ``prepare_sequences``.
+        """
+        tf = _tensorflow()
+        if isinstance(features, str):
+            features = np.load(features, mmap_mode='r')
+        if isinstance(targets, str):
+            targets = np.load(targets, mmap_mode='r')
+        if not self._scaler_fitted():
+            self.fit_scaler(features)
+        windows = self.windows(features)
+        stop = len(features) - self.sequence_length if stop is None else stop
+        scale, offset = self.scaler.scale_, self.scaler.min_
+
+        def load(indices):
+            # Indices triés: lectures séquentielles dans un fichier projeté
+            indices = np.sort(indices)
+            x = windows[indices] * scale + offset  # copie du seul lot (B, L, variables)
+            y = np.asarray(targets[indices + self.sequence_length - 1])
+            return x.astype(np.float32), y.astype(np.float32)
+
+        def shaped(x, y):
+            x.set_shape((None, self.sequence_length, self.features))
+            y.set_shape((None, targets.shape[1]))
+            return x, y
+
+        dataset = tf.data.Dataset.range(start, stop)
+        if shuffle:
+            dataset = dataset.shuffle(stop - start, seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.batch(batch_size).map(
+            lambda indices: tf.numpy_function(load, [indices], (tf.float32, tf.float32)),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        return dataset.map(shaped).prefetch(tf.data.AUTOTUNE)
+
     def train(self, X: np.ndarray, y: np.ndarray, epochs: int = 50, batch_size: int = 32) -> Dict:
         """Entraîne le modèle LSTM"""
         self.model = self.build_model()
@@ -74,6 +152,35 @@ class ConstructionLSTM:
             'val_mae': history.history['val_mae'][-1]
         }
 
+    def train_on_series(self, features, targets, epochs: int = 50, batch_size: int = 32,
+                        validation_split: float = 0.2, seed: int = None) -> Dict:
+        """Entraîne le modèle LSTM sur des séries brutes via ``make_dataset``.
+
+        Les fenêtres ne sont jamais toutes matérialisées: la mémoire utilisée est
+        celle de quelques lots, et les séries peuvent dépasser la RAM (fichiers
+        .npy projetés en mémoire). Comme ``train``, les dernières fenêtres
+        (``validation_split``) servent à la validation.
+        """
+        if isinstance(features, str):
+            features = np.load(features, mmap_mode='r')
+        if isinstance(targets, str):
+            targets = np.load(targets, mmap_mode='r')
+        count = len(features) - self.sequence_length
+        split = int(count * (1 - validation_split))
+        self.fit_scaler(features)
+        train_data = self.make_dataset(features, targets, batch_size, shuffle=True, stop=split, seed=seed)
+        validation_data = self.make_dataset(features, targets, batch_size, start=split, stop=count)
+
+        self.model = self.build_model()
+        history = self.model.fit(train_data, validation_data=validation_data, epochs=epochs, verbose=1)
+
+        return {
+            'loss': history.history['loss'][-1],
+            'val_loss': history.history['val_loss'][-1],
+            'mae': history.history['mae'][-1],
+            'val_mae': history.history['val_mae'][-1]
+        }
+
 class ConstructionDenseNN:
     """Réseau de neurones dense pour la prédiction statique"""
     
@@ -83,6 +190,8 @@ class ConstructionDenseNN:
         
     def build_model(self) -> keras.Model:
         """Construit le réseau dense"""
+        keras = _tensorflow().keras
+        layers = keras.layers
         model = keras.Sequential([
             layers.Dense(64, activation='relu', input_shape=(self.input_dim,)),
             layers.Dropout(0.3),
@@ -119,15 +228,26 @@ class ConstructionDenseNN:
         }
 
 class TensorFlowPredictor:
-    """Prédicteur TensorFlow unifié"""
-    
-    def __init__(self, model_path: str = None):
+    """Prédicteur TensorFlow unifié.
+
+    ``predict_batch`` évalue N projets en un appel via une ``tf.function``
+    par modèle, tracée une seule fois: la signature d'entrée fixe (dimension
+    de lot libre) évite tout retraçage d'une taille de lot à l'autre, et
+    l'appel direct du modèle évite le coût fixe de ``model.predict``
+    (création d'un itérateur de données et d'une boucle à chaque appel).
+    """
+
+    def __init__(self, model_path: str = None, max_batch_size: int = 4096):
         self.model_path = model_path or os.path.join(os.path.dirname(__file__), 'artifacts', 'tensorflow_models')
+        self.max_batch_size = max_batch_size
         self.lstm_model = None
         self.dense_model = None
-        
+        self._serving = {}  # nom du modèle -> (modèle, tf.function)
+
     def load_models(self):
         """Charge les modèles TensorFlow"""
+        keras = _tensorflow().keras
+        self._serving = {}
         try:
             self.lstm_model = keras.models.load_model(os.path.join(self.model_path, 'lstm_model'))
             self.dense_model = keras.models.load_model(os.path.join(self.model_path, 'dense_model'))
@@ -136,25 +256,40 @@ class TensorFlowPredictor:
             print(f"Erreur chargement modèles TensorFlow: {e}")
             self.lstm_model = None
             self.dense_model = None
-    
+
+    def _serving_function(self, name: str):
+        """``tf.function`` du modèle ``name`` ('lstm' ou 'dense'), tracée au premier appel"""
+        model = self.lstm_model if name == 'lstm' else self.dense_model
+        if model is None:
+            raise ValueError(f"Modèle {'LSTM' if name == 'lstm' else 'dense'} non chargé")
+        entry = self._serving.get(name)
+        if entry is None or entry[0] is not model:
+            tf = _tensorflow()
+            signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32)]
+            entry = self._serving[name] = (model, tf.function(lambda x: model(x, training=False),
+                                                              input_signature=signature))
+        return entry[1]
+
+    def predict_batch(self, inputs: np.ndarray, model: str = 'dense') -> Dict[str, np.ndarray]:
+        """Prédictions pour N projets: ``inputs`` (N, variables) pour 'dense', (N, pas, variables) pour 'lstm'.
+
+        Renvoie {sortie: tableau de N valeurs}; les lots de plus de
+        ``max_batch_size`` lignes sont évalués par tranches.
+        """
+        serve = self._serving_function(model)
+        inputs = np.asarray(inputs, dtype=np.float32)
+        predictions = np.concatenate([
+            serve(inputs[start:start + self.max_batch_size]).numpy()
+            for start in range(0, len(inputs), self.max_batch_size)
+        ]) if len(inputs) else np.empty((0, len(OUTPUTS)), dtype=np.float32)
+        return {name: predictions[:, i] for i, name in enumerate(OUTPUTS)}
+
     def predict_lstm(self, sequence: np.ndarray) -> Dict[str, float]:
         """Prédiction avec LSTM"""
-        if self.lstm_model is None:
-            raise ValueError("Modèle LSTM non chargé")
-        
-        prediction = self.lstm_model.predict(sequence.reshape(1, -1, 8))
-        return {
-            'delay_probability': float(prediction[0][0]),
-            'budget_overrun_probability': float(prediction[0][1])
-        }
-    
+        prediction = self.predict_batch(sequence.reshape(1, -1, 8), model='lstm')
+        return {name: float(values[0]) for name, values in prediction.items()}
+
     def predict_dense(self, features: np.ndarray) -> Dict[str, float]:
         """Prédiction avec réseau dense"""
-        if self.dense_model is None:
-            raise ValueError("Modèle dense non chargé")
-        
-        prediction = self.dense_model.predict(features.reshape(1, -1))
-        return {
-            'delay_probability': float(prediction[0][0]),
-            'budget_overrun_probability': float(prediction[0][1])
-        }
+        prediction = self.predict_batch(features.reshape(1, -1), model='dense')
+        return {name: float(values[0]) for name, values in prediction.items()}
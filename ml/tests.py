@@ -0,0 +1,172 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import TestCase, mock
+
+import numpy as np
+from django.core.management import call_command
+from sklearn.datasets import make_classification, make_regression
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from . import incremental
+from .enhanced_dataset import COLUMNS, compare_with_legacy
+from .flat_forest import CHUNK_ROWS, flatten_forest, load_flat, save_flat
+from .registry import DELAY_MODEL, ModelRegistry
+
+
+class EnhancedDatasetTests(TestCase):
+    """Générateur vectorisé: mêmes distributions que generate_construction_dataset"""
+
+    def test_every_column_matches_legacy(self):
+        results = compare_with_legacy(n_samples=5000, seed=42)
+        self.assertEqual([name for name, *_ in results], list(COLUMNS))
+        failed = [(name, test, p_value) for name, test, p_value, passed in results if not passed]
+        self.assertEqual(failed, [])
+
+
+class FlatForestTests(TestCase):
+    """Forêt aplatie: résultats identiques à scikit-learn, en mémoire comme projetée (.npy)"""
+
+    ROWS = CHUNK_ROWS + 500  # plusieurs paquets
+
+    def flattened(self, model):
+        flat = flatten_forest(model)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        save_flat(flat, directory.name)
+        return {'mémoire': flat, 'mmap': load_flat(directory.name)}
+
+    def test_classifier_matches_sklearn(self):
+        X, y = make_classification(n_samples=2000 + self.ROWS, n_features=8, n_informative=5, n_classes=3,
+                                   random_state=0)
+        model = RandomForestClassifier(n_estimators=25, random_state=0, n_jobs=1).fit(X[:2000], y[:2000])
+        X_test = X[2000:]
+        for path, flat in self.flattened(model).items():
+            with self.subTest(path=path):
+                self.assertTrue(np.array_equal(flat.predict_proba(X_test), model.predict_proba(X_test)))
+                self.assertTrue(np.array_equal(flat.predict(X_test), model.predict(X_test)))
+                self.assertTrue(np.array_equal(flat.apply(X_test), model.apply(X_test)))
+
+    def test_regressor_matches_sklearn(self):
+        for n_targets in (1, 2):
+            X, y = make_regression(n_samples=2000 + self.ROWS, n_features=8, n_targets=n_targets, random_state=0)
+            model = RandomForestRegressor(n_estimators=25, random_state=0, n_jobs=1).fit(X[:2000], y[:2000])
+            X_test = X[2000:]
+            for path, flat in self.flattened(model).items():
+                with self.subTest(path=path, n_targets=n_targets):
+                    self.assertTrue(np.array_equal(flat.predict(X_test), model.predict(X_test)))
+
+
+class IncrementalRetrainTests(TestCase):
+    """Réentraînement incrémental: point de reprise, fenêtre de validation, taille des forêts"""
+
+    ROWS = 200
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data = os.path.join(directory.name, 'training')
+        os.makedirs(self.data)
+        self.registry = ModelRegistry(os.path.join(directory.name, 'registry'))
+        self.rng = np.random.default_rng(0)
+        x, y, _ = self.rows(0)
+        base = RandomForestClassifier(n_estimators=20, max_depth=4, random_state=0).fit(x, y[:, 0].astype(int))
+        self.registry.publish(DELAY_MODEL, base, {'source': 'ml/tests.py'})
+
+    def rows(self, first):
+        """Lignes numérotées à partir de ``first``: progress_percent croît avec la date de fin"""
+        ids = np.arange(first, first + self.ROWS)
+        x = np.column_stack([
+            ids.astype(np.float64),
+            self.rng.uniform(0, 100, self.ROWS),
+            self.rng.integers(0, 3, self.ROWS),
+            self.rng.integers(0, 6, self.ROWS),
+        ])
+        y = (x[:, 1] > 60).astype(np.float64)[:, np.newaxis]
+        return x, y, 730000 + ids
+
+    def write_part(self, number, first):
+        x, y, completed_on = self.rows(first)
+        columns = dict(zip(incremental.DELAY_FEATURES, x.T))
+        np.savez(os.path.join(self.data, f'part-{number:06d}.npz'), projet_id=completed_on - 730000,
+                 completed_on=completed_on, delay=y[:, 0], **columns)
+
+    def retrain(self, **options):
+        options = {'trees': 10, 'max_trees': 30, 'tolerance': 10.0, 'registry': self.registry, **options}
+        return incremental.retrain(DELAY_MODEL, self.data, **options)
+
+    def active(self):
+        return self.registry.get(DELAY_MODEL)
+
+    def test_checkpoint_advances_only_when_published(self):
+        self.write_part(1, 1000)
+        self.assertEqual(self.retrain(tolerance=-1.0)['status'], 'rejected')
+        self.assertEqual(self.retrain(publish=False)['status'], 'validated')
+        self.assertEqual(self.active().version, 'v1')
+        self.assertNotIn('last_part', self.active().metadata)
+
+        result = self.retrain()
+        self.assertEqual((result['status'], result['checkpoint'], result['new_rows']), ('published', 0, self.ROWS))
+        self.assertEqual(self.active().metadata['last_part'], 1)
+        self.assertEqual(self.retrain()['status'], 'up-to-date')
+
+        self.write_part(2, 2000)
+        result = self.retrain()
+        self.assertEqual((result['status'], result['checkpoint'], result['new_rows']), ('published', 1, self.ROWS))
+        self.assertEqual(self.active().metadata['last_part'], 2)
+
+    def test_holdout_is_newest_rows_and_not_trained_on(self):
+        self.write_part(1, 1000)
+        trained = []
+
+        def spy(model, x, y, *args):
+            trained.append(x[:, 0].copy())
+            return incremental._grow_delay(model, x, y, *args)
+
+        rows, _, error, metric = incremental.MODELS[DELAY_MODEL]
+        with mock.patch.dict(incremental.MODELS, {DELAY_MODEL: (rows, spy, error, metric)}):
+            first = self.retrain()
+            self.write_part(2, 2000)
+            second = self.retrain()
+
+        held = int(np.ceil(self.ROWS * incremental.DEFAULT_HOLDOUT))
+        self.assertEqual((first['train_rows'], first['holdout_rows']), (self.ROWS - held, held))
+        self.assertEqual(trained[0].tolist(), list(range(1000, 1000 + self.ROWS - held)))
+        # Fenêtre précédente apprise au passage suivant, nouvelle fenêtre réservée
+        newest = 2000 + self.ROWS - second['holdout_rows']
+        self.assertEqual(trained[1].tolist(),
+                         list(range(1000 + self.ROWS - held, 1000 + self.ROWS)) + list(range(2000, newest)))
+        with np.load(os.path.join(self.data, incremental.STATE_FILE.format(name=DELAY_MODEL))) as state:
+            self.assertEqual(str(state['version']), second['version'])
+            self.assertEqual(state['x'][:, 0].tolist(), list(range(newest, 2000 + self.ROWS)))
+
+    def test_oldest_trees_are_dropped_above_max_trees(self):
+        for number in range(1, 4):
+            self.write_part(number, 1000 * number)
+            result = self.retrain()
+            self.assertEqual(result['status'], 'published')
+            estimators = self.active().model.estimators_
+            self.assertLessEqual(len(estimators), 30)
+            self.assertEqual(self.active().model.n_estimators, len(estimators))
+        self.assertEqual((result['trees_added'], result['trees_dropped']), (10, 10))
+
+    def test_reset_when_parts_are_renumbered_below_checkpoint(self):
+        for number in (1, 2):
+            self.write_part(number, 1000 * number)
+        self.assertEqual(self.retrain()['last_part'], 2)
+        for number in (1, 2):
+            os.unlink(os.path.join(self.data, f'part-{number:06d}.npz'))
+        self.write_part(1, 5000)
+
+        result = self.retrain()
+        self.assertTrue(result['reset'])
+        self.assertEqual((result['status'], result['checkpoint'], result['new_rows']), ('published', 0, self.ROWS))
+        self.assertEqual(self.active().metadata['last_part'], 1)
+
+    def test_command_reports_without_publishing(self):
+        self.write_part(1, 1000)
+        out = StringIO()
+        with mock.patch.object(incremental, 'get_registry', return_value=self.registry):
+            call_command('retrain_models', '--data', self.data, '--model', DELAY_MODEL, '--dry-run', stdout=out)
+        self.assertIn('non publié (--dry-run)', out.getvalue())
+        self.assertEqual(self.active().version, 'v1')
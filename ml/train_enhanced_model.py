@@ -98,6 +98,15 @@ def train_enhanced_models():
         pickle.dump(model_data, f)
     
     print(f"\nModels saved to: {model_path}")
+
+    # New registry version, picked up by running workers (ml/registry.py)
+    from registry import ENHANCED_MODELS, get_registry
+    version = get_registry().publish(ENHANCED_MODELS, model_data, {
+        'feature_columns': feature_cols,
+        'metrics': metrics,
+        'source': 'ml/train_enhanced_model.py',
+    })
+    print(f"Published to registry: {ENHANCED_MODELS} {version}")
     return model_path, metrics
 
 if __name__ == "__main__":
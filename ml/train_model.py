@@ -1,7 +1,8 @@
+import glob
 import os
 import pickle
 from dataclasses import dataclass
-from typing import Tuple
+from typing import List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -20,11 +21,50 @@ class TrainConfig:
     model_path: str = os.path.join(model_dir, 'buildflow_rf.pkl')
 
 
+# Fichiers écrits par manage.py extract_training_data (analytics/training_data.py)
+PART_PATTERN = 'part-*.npz'
+
+
 def _ensure_dirs(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
-def load_dataset(csv_path: str | None = None) -> pd.DataFrame:
+def extracted_parts(directory: str, after: int = 0) -> List[Tuple[int, str]]:
+    """(numéro, chemin) des fichiers extraits de numéro supérieur à ``after``, dans l'ordre"""
+    parts = []
+    for path in glob.glob(os.path.join(directory, PART_PATTERN)):
+        number = os.path.basename(path)[5:-4]
+        if number.isdigit() and int(number) > after:
+            parts.append((int(number), path))
+    return sorted(parts)
+
+
+def load_extracted(directory: str, after: int = 0) -> pd.DataFrame:
+    """Lignes extraites de l'historique des projets, la plus récente pour chaque projet.
+
+    Avec ``after``, seuls les fichiers plus récents que ce numéro sont lus
+    (réentraînement incrémental, ml/incremental.py). ``df.attrs['last_part']``
+    donne le numéro du dernier fichier lu.
+    """
+    paths = extracted_parts(directory, after)
+    if not paths:
+        return pd.DataFrame()
+    parts = []
+    for _, path in paths:
+        with np.load(path) as archive:
+            parts.append(pd.DataFrame({name: archive[name] for name in archive.files}))
+    # Fichiers triés par date d'extraction: un projet réextrait garde sa dernière ligne
+    df = pd.concat(parts, ignore_index=True).drop_duplicates('projet_id', keep='last').reset_index(drop=True)
+    df.attrs['last_part'] = paths[-1][0]
+    return df
+
+
+def load_dataset(csv_path: str | None = None, data_dir: str | None = None) -> pd.DataFrame:
+    if data_dir and os.path.isdir(data_dir):
+        df = load_extracted(data_dir)
+        # Deux classes nécessaires (échantillonnage stratifié); sinon jeu synthétique
+        if len(df) and df['delay'].nunique() == 2:
+            return df
     if csv_path and os.path.exists(csv_path):
         return pd.read_csv(csv_path)
     # Dataset d'exemple synthétique
@@ -72,11 +112,24 @@ def save_model(model: RandomForestClassifier, cfg: TrainConfig) -> str:
 if __name__ == '__main__':
     cfg = TrainConfig()
     csv_path = os.environ.get('BUILDFLOW_TRAIN_CSV')  # optionnel
-    df = load_dataset(csv_path)
+    data_dir = os.environ.get('BUILDFLOW_TRAIN_DATA')  # optionnel: sortie de extract_training_data
+    df = load_dataset(csv_path, data_dir)
     model, auc = train_model(df, cfg)
     path = save_model(model, cfg)
     print(f"Modèle entraîné. AUC={auc:.3f}. Sauvegardé: {path}")
 
+    # Nouvelle version dans le registre, servie sans redémarrage (ml/registry.py)
+    from registry import DELAY_MODEL, get_registry
+    version = get_registry().publish(DELAY_MODEL, model, {
+        'feature_columns': ['progress_percent', 'budget_spent', 'weather', 'incidents'],
+        'metrics': {'auc': auc},
+        'source': 'ml/train_model.py',
+        'params': {'n_estimators': cfg.n_estimators, 'max_depth': cfg.max_depth, 'random_state': cfg.random_state},
+        # Point de reprise du réentraînement incrémental (manage.py retrain_models)
+        'last_part': df.attrs.get('last_part', 0),
+    })
+    print(f"Publié dans le registre: {DELAY_MODEL} {version}")
+
 
 
 
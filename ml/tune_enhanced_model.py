@@ -0,0 +1,294 @@
+"""
+Hyperparameter search for the enhanced models (delay and budget overrun)
+
+Each configuration is either one multi-output RandomForestRegressor predicting
+both targets, or two single-output forests as in train_enhanced_model.py.
+Configurations are cross-validated across a process pool:
+
+- the K fold splits are scaled once and cached as .npy files that workers
+  memory-map, instead of shipping the data with every task;
+- successive halving: every surviving configuration is scored on one more
+  fold per rung, and only the best ``1 / eta`` (by mean MAE so far) continue;
+- single-row inference latency is measured on the first fold's model.
+
+The report lists every configuration, marks the accuracy / latency Pareto
+frontier and picks the fastest frontier configuration whose MAE is within
+``--tolerance`` of the best one. That configuration is refit on the training
+split, evaluated on the held-out test split and published to the registry.
+
+    python ml/tune_enhanced_model.py --rows 20000 --configs 24 --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from enhanced_dataset import generate_construction_dataset_vectorized
+from flat_forest import flatten_forest
+
+FEATURE_COLS = [
+    'progress_percent', 'budget_spent', 'weather', 'incidents',
+    'team_size', 'team_experience', 'permit_delays', 'supply_chain_issues',
+]
+TARGET_COLS = ['delay_probability', 'budget_overrun_probability']
+# Same key as ml/inference.MULTI_OUTPUT_MODEL
+MULTI_OUTPUT_MODEL = 'multi_model'
+
+SEARCH_SPACE = {
+    'mode': ['multi', 'separate'],
+    'n_estimators': [50, 100, 200, 300],
+    'max_depth': [8, 12, 15, None],
+    'min_samples_leaf': [1, 2, 5],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+REPORT_PATH = os.path.join(os.path.dirname(__file__), 'artifacts', 'tuning_report.json')
+LATENCY_REPEAT = 30
+
+
+def sample_configs(n: int, seed: int) -> List[Dict]:
+    """``n`` distinct random configurations; the current production settings are always included"""
+    rng = np.random.default_rng(seed)
+    baseline = {'mode': 'separate', 'n_estimators': 300, 'max_depth': 15, 'min_samples_leaf': 1, 'max_features': 1.0}
+    configs, seen = [baseline], {json.dumps(baseline, sort_keys=True)}
+    space = 1
+    for values in SEARCH_SPACE.values():
+        space *= len(values)
+    while len(configs) < min(n, space):
+        config = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def _forests(config, random_state):
+    params = {name: value for name, value in config.items() if name != 'mode'}
+    # min_samples_split=5 as in train_enhanced_model.py
+    make = lambda: RandomForestRegressor(min_samples_split=5, random_state=random_state, n_jobs=1, **params)  # noqa: E731
+    return [make()] if config['mode'] == 'multi' else [make(), make()]
+
+
+def fit(config, X, Y, random_state=42):
+    forests = _forests(config, random_state)
+    if len(forests) == 1:
+        forests[0].fit(X, Y)
+    else:
+        for k, forest in enumerate(forests):
+            forest.fit(X, Y[:, k])
+    return forests
+
+
+def predict(forests, X):
+    if len(forests) == 1:
+        return forests[0].predict(X)
+    return np.column_stack([forest.predict(X) for forest in forests])
+
+
+def _median_ms(call):
+    call()
+    timings = []
+    for _ in range(LATENCY_REPEAT):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def latency(forests, row):
+    """Single-row inference time (ms) with scikit-learn and with the flattened forests"""
+    flats = [flatten_forest(forest) for forest in forests]
+    return {
+        'sklearn_ms': _median_ms(lambda: [forest.predict(row) for forest in forests]),
+        'flat_ms': _median_ms(lambda: [flat.predict(row) for flat in flats]),
+        'nodes': int(sum(forest.tree_.node_count for forest_ in forests for forest in forest_.estimators_)),
+    }
+
+
+# --- Cached folds ---
+
+def cache_folds(X, Y, folds, seed, directory):
+    """Scale each fold on its own training part and save the matrices as .npy files"""
+    for k, (train, valid) in enumerate(KFold(folds, shuffle=True, random_state=seed).split(X)):
+        scaler = StandardScaler().fit(X[train])
+        for name, values in (('X_train', scaler.transform(X[train])), ('Y_train', Y[train]),
+                             ('X_valid', scaler.transform(X[valid])), ('Y_valid', Y[valid])):
+            np.save(os.path.join(directory, f'fold{k}_{name}.npy'), values)
+
+
+def _load_fold(directory, k):
+    return [np.load(os.path.join(directory, f'fold{k}_{name}.npy'), mmap_mode='r')
+            for name in ('X_train', 'Y_train', 'X_valid', 'Y_valid')]
+
+
+def evaluate(index, config, fold, directory, measure_latency):
+    """Runs in the pool: fit on one cached fold, score on its validation part"""
+    X_train, Y_train, X_valid, Y_valid = _load_fold(directory, fold)
+    start = time.perf_counter()
+    forests = fit(config, X_train, Y_train)
+    fit_s = time.perf_counter() - start
+    predicted = predict(forests, X_valid)
+    result = {
+        'index': index,
+        'fold': fold,
+        'fit_s': fit_s,
+        'mae': [float(mean_absolute_error(Y_valid[:, k], predicted[:, k])) for k in range(Y_valid.shape[1])],
+        'r2': [float(r2_score(Y_valid[:, k], predicted[:, k])) for k in range(Y_valid.shape[1])],
+    }
+    if measure_latency:
+        result.update(latency(forests, np.asarray(X_valid[:1])))
+    return result
+
+
+# --- Search ---
+
+def search(configs, directory, folds, workers, eta, log=print):
+    """Successive halving over the folds; returns one summary per configuration"""
+    summaries = [{'index': i, 'config': config, 'folds': [], 'pruned_at': None} for i, config in enumerate(configs)]
+    alive = list(range(len(configs)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fold in range(folds):
+            start = time.perf_counter()
+            tasks = [pool.submit(evaluate, i, configs[i], fold, directory, fold == 0) for i in alive]
+            for task in tasks:
+                result = task.result()
+                summary = summaries[result['index']]
+                summary['folds'].append(result)
+                if 'sklearn_ms' in result:
+                    summary.update({key: result[key] for key in ('sklearn_ms', 'flat_ms', 'nodes')})
+            for i in alive:
+                summaries[i]['mae'] = float(np.mean([np.mean(r['mae']) for r in summaries[i]['folds']]))
+                summaries[i]['r2'] = float(np.mean([np.mean(r['r2']) for r in summaries[i]['folds']]))
+            log(f"fold {fold + 1}/{folds}: {len(alive)} configurations in {time.perf_counter() - start:.1f}s")
+            if fold == folds - 1:
+                break
+            # Early pruning: keep the best 1/eta by mean MAE so far (at least two)
+            ranked = sorted(alive, key=lambda i: summaries[i]['mae'])
+            keep = max(2, int(np.ceil(len(ranked) / eta)))
+            for i in ranked[keep:]:
+                summaries[i]['pruned_at'] = fold + 1
+            alive = ranked[:keep]
+    return summaries
+
+
+def frontier(summaries, engine):
+    """Pareto frontier (mean MAE, latency) among configurations evaluated on every fold"""
+    finished = [s for s in summaries if s['pruned_at'] is None]
+    key = f'{engine}_ms'
+    front = [
+        s for s in finished
+        if not any(o[key] <= s[key] and o['mae'] <= s['mae'] and (o[key] < s[key] or o['mae'] < s['mae'])
+                   for o in finished)
+    ]
+    return sorted(front, key=lambda s: s[key])
+
+
+def choose(front, tolerance):
+    """Fastest frontier configuration whose MAE is within ``tolerance`` of the best"""
+    best = min(s['mae'] for s in front)
+    return next(s for s in front if s['mae'] <= best * (1 + tolerance))
+
+
+def describe(config):
+    depth = config['max_depth'] if config['max_depth'] is not None else '-'
+    return (f"{config['mode']:<8} {config['n_estimators']:>5} {depth:>5} "
+            f"{config['min_samples_leaf']:>5} {str(config['max_features']):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--configs', type=int, default=24)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--eta', type=float, default=2.0, help="Pruning factor per fold")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--engine', choices=['sklearn', 'flat'], default=os.environ.get('BUILDFLOW_INFERENCE_ENGINE', 'sklearn'),
+                        help="Inference engine whose latency defines the frontier")
+    parser.add_argument('--tolerance', type=float, default=0.05, help="Accepted MAE loss vs the best configuration")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-publish', action='store_true')
+    args = parser.parse_args()
+    engine = 'sklearn' if args.engine == 'auto' else args.engine
+
+    df = generate_construction_dataset_vectorized(args.rows, seed=args.seed)
+    X = df[FEATURE_COLS].to_numpy(dtype=np.float64)
+    Y = df[TARGET_COLS].to_numpy(dtype=np.float64) * 100  # percentages, as in train_enhanced_model.py
+    # One split for both targets
+    X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=args.seed)
+
+    configs = sample_configs(args.configs, args.seed)
+    directory = tempfile.mkdtemp(prefix='buildflow-folds-')
+    try:
+        cache_folds(X_train, Y_train, args.folds, args.seed, directory)
+        start = time.perf_counter()
+        summaries = search(configs, directory, args.folds, args.workers, args.eta)
+        search_s = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    front = frontier(summaries, engine)
+    chosen = choose(front, args.tolerance)
+    on_front = {s['index'] for s in front}
+    print(f"\n{'mode':<8} {'trees':>5} {'depth':>5} {'leaf':>5} {'feat':>6} {'MAE':>7} {'R²':>6} "
+          f"{'sklearn ms':>10} {'flat ms':>8} {'folds':>5}")
+    for s in sorted(summaries, key=lambda s: (s['pruned_at'] is not None, s['mae'])):
+        marker = '*' if s is chosen else ('+' if s['index'] in on_front else ' ')
+        print(f"{describe(s['config'])} {s['mae']:>7.3f} {s['r2']:>6.3f} {s['sklearn_ms']:>10.2f} "
+              f"{s['flat_ms']:>8.2f} {len(s['folds']):>5} {marker}")
+    print(f"(+ frontier on {engine} latency, * chosen; search took {search_s:.1f}s)")
+
+    # Final model on the whole training split
+    scaler = StandardScaler().fit(X_train)
+    forests = fit(chosen['config'], scaler.transform(X_train), Y_train, random_state=args.seed)
+    predicted = predict(forests, scaler.transform(X_test))
+    metrics = {
+        'delay_mae': mean_absolute_error(Y_test[:, 0], predicted[:, 0]),
+        'delay_r2': r2_score(Y_test[:, 0], predicted[:, 0]),
+        'budget_mae': mean_absolute_error(Y_test[:, 1], predicted[:, 1]),
+        'budget_r2': r2_score(Y_test[:, 1], predicted[:, 1]),
+    }
+    print(f"\nChosen: {describe(chosen['config'])}")
+    print(f"Delay Prediction - MAE: {metrics['delay_mae']:.2f}%, R²: {metrics['delay_r2']:.3f}")
+    print(f"Budget Prediction - MAE: {metrics['budget_mae']:.2f}%, R²: {metrics['budget_r2']:.3f}")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'engine': engine, 'tolerance': args.tolerance, 'rows': args.rows, 'folds': args.folds,
+            'chosen': chosen['index'], 'frontier': sorted(on_front), 'test_metrics': metrics,
+            'configurations': summaries,
+        }, handle, indent=2, default=float)
+    print(f"Report saved to: {REPORT_PATH}")
+
+    if args.no_publish:
+        return
+    model_data = {'scaler': scaler, 'feature_cols': FEATURE_COLS, 'metrics': metrics, 'params': chosen['config']}
+    if len(forests) == 1:
+        model_data[MULTI_OUTPUT_MODEL] = forests[0]
+    else:
+        model_data['delay_model'], model_data['budget_model'] = forests
+    # Serving uses every core of its worker; training ran one tree builder per pool process
+    for forest in forests:
+        forest.set_params(n_jobs=-1)
+    from registry import ENHANCED_MODELS, get_registry
+    version = get_registry().publish(ENHANCED_MODELS, model_data, {
+        'feature_columns': FEATURE_COLS,
+        'metrics': metrics,
+        'params': chosen['config'],
+        'source': 'ml/tune_enhanced_model.py',
+    })
+    print(f"Published to registry: {ENHANCED_MODELS} {version}")
+
+
+if __name__ == '__main__':
+    main()
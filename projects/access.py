@@ -0,0 +1,68 @@
+"""
+Index d'accès aux projets: pour chaque utilisateur, l'ensemble des ids de
+projets qu'il peut atteindre comme chef de projet ou comme membre.
+
+L'index est mémorisé sur ``request.user`` (par requête) et dans le cache Django
+(entre requêtes). Les signaux de projects/signals.py (post_save / pre_delete de
+Projet, m2m_changed de Projet.membres) invalident les entrées des utilisateurs
+concernés, si bien que les chemins CRUD ne relancent plus de jointure membres.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Projet
+
+CACHE_KEY = 'projects:access:{user_id}'
+_REQUEST_ATTR = '_accessible_project_ids'
+
+
+def _cache_timeout():
+    return getattr(settings, 'PROJECT_ACCESS_CACHE_TIMEOUT', 300)
+
+
+def _compute(user_id):
+    # Deux lectures indexées, sans jointure ni DISTINCT
+    chef = Projet.objects.filter(chef_projet_id=user_id).values_list('id', flat=True)
+    membre = Projet.membres.through.objects.filter(user_id=user_id).values_list('projet_id', flat=True)
+    return frozenset(chef) | frozenset(membre)
+
+
+def accessible_project_ids(user):
+    """Ids des projets dont l'utilisateur est chef ou membre (frozenset)"""
+    if not getattr(user, 'is_authenticated', False):
+        return frozenset()
+
+    ids = getattr(user, _REQUEST_ATTR, None)
+    if ids is not None:
+        return ids
+
+    key = CACHE_KEY.format(user_id=user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _compute(user.pk)
+        cache.set(key, ids, _cache_timeout())
+
+    setattr(user, _REQUEST_ATTR, ids)
+    return ids
+
+
+def can_access_project(user, projet):
+    """L'utilisateur peut-il toucher ce projet (instance ou id) en tant que chef ou membre ?"""
+    projet_id = getattr(projet, 'pk', projet)
+    try:
+        projet_id = int(projet_id)
+    except (TypeError, ValueError):
+        return False
+    return projet_id in accessible_project_ids(user)
+
+
+def visible_projects(user):
+    """QuerySet des projets de l'utilisateur (chef ou membre)"""
+    return Projet.objects.filter(id__in=accessible_project_ids(user))
+
+
+def invalidate_project_access(user_ids):
+    """Invalide l'index d'accès des utilisateurs donnés"""
+    keys = [CACHE_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
@@ -2,4 +2,10 @@ from django.apps import AppConfig
 
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'projects' 
\ No newline at end of file
+    name = 'projects'
+
+    def ready(self):
+        # Signaux de maintenance des statistiques dénormalisées (ProjectStats)
+        import projects.signals  # noqa: F401
+        # Vidage du tampon d'audit en fin de requête
+        import projects.audit_buffer  # noqa: F401
@@ -0,0 +1,244 @@
+"""
+Rétention de la traçabilité: archivage mensuel à froid et lecture unifiée.
+
+``archive_month`` écrit un mois d'AuditTrail dans un fichier NDJSON gzip sous
+``MEDIA_ROOT/AUDIT_ARCHIVE_DIR`` (ordre -timestamp, -id), l'enregistre dans
+AuditArchive puis supprime les lignes archivées par petits lots: chaque lot est
+une transaction courte, la table n'est jamais verrouillée longtemps. Une purge
+interrompue (statut ECRIT) est reprise au lancement suivant à partir des ids
+du fichier. Les agrégats journaliers (AuditDailyRollup) ne sont pas touchés,
+même par ``AuditRollupService.rebuild``: les tableaux de bord continuent de
+compter l'historique archivé.
+
+``iter_audit_trail`` parcourt les lignes en base puis les archives qui
+recouvrent la période demandée (et, pour un projet donné, celles dont l'index
+``AuditArchive.projets`` le contient), du plus récent au plus ancien, et rend des
+instances AuditTrail (non sauvegardées pour les archives) utilisables par les
+serializers et l'export.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import AuditArchive, AuditTrail, Projet
+
+# Filtres d'égalité acceptés par iter_audit_trail (identiques en base et dans les archives)
+FILTER_FIELDS = ('projet_id', 'user_id', 'action', 'resource_type')
+
+
+def _archive_dir():
+    return getattr(settings, 'AUDIT_ARCHIVE_DIR', 'audit_archives')
+
+
+def month_start(value):
+    """Premier instant du mois de ``value`` (date ou datetime), dans le fuseau courant"""
+    return timezone.make_aware(datetime(value.year, value.month, 1))
+
+
+def next_month(start):
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def parse_bound(value):
+    """Borne de période (date ou date-heure ISO 8601) en datetime aware, ou None"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Date invalide: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _record(audit):
+    """Ligne d'archive: colonnes d'AuditTrail + noms dénormalisés"""
+    record = {field.attname: field.value_from_object(audit) for field in AuditTrail._meta.concrete_fields}
+    # DjangoJSONEncoder tronque à la milliseconde: l'ordre (timestamp, id) exige les microsecondes
+    record['timestamp'] = audit.timestamp.isoformat()
+    record['_username'] = audit.user.username if audit.user else None
+    record['_projet_nom'] = audit.projet.nom if audit.projet else None
+    return record
+
+
+def _purge(archive, batch_size):
+    """Supprime d'AuditTrail les lignes d'une archive écrite, par lots"""
+    ids = [record['id'] for record in _read(archive)]
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            AuditTrail.objects.filter(id__in=ids[start:start + batch_size]).delete()
+    archive.statut = 'PURGE'
+    archive.save(update_fields=['statut'])
+
+
+def archive_month(month, batch_size=2000):
+    """Archive puis purge un mois d'AuditTrail; retourne l'AuditArchive créée ou None"""
+    start = month_start(month)
+    end = next_month(start)
+    rows = AuditTrail.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if not rows.exists():
+        return None
+
+    # Un mois peut avoir plusieurs parties (lignes arrivées après un premier archivage)
+    part = AuditArchive.objects.filter(mois=start.date()).count() + 1
+    relative = os.path.join(_archive_dir(), f'{start:%Y}', f'{start:%Y-%m}.part{part}.ndjson.gz')
+    path = os.path.join(settings.MEDIA_ROOT, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    count = 0
+    projets = set()
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as handle:
+        audits = rows.select_related('user', 'projet').order_by('-timestamp', '-id').iterator(chunk_size=batch_size)
+        for audit in audits:
+            handle.write(json.dumps(_record(audit), cls=DjangoJSONEncoder, ensure_ascii=False))
+            handle.write('\n')
+            count += 1
+            if audit.projet_id is not None:
+                projets.add(audit.projet_id)
+    # Le fichier n'apparaît sous son nom définitif qu'une fois complet
+    os.replace(tmp_path, path)
+
+    archive = AuditArchive.objects.create(
+        mois=start.date(), fichier=relative, nombre_lignes=count, taille=os.path.getsize(path),
+        projets=sorted(projets),
+    )
+    _purge(archive, batch_size)
+    return archive
+
+
+def apply_retention(months=None, batch_size=2000):
+    """Archive tous les mois antérieurs aux ``months`` derniers mois; retourne les archives créées"""
+    if months is None:
+        months = getattr(settings, 'AUDIT_RETENTION_MONTHS', 12)
+
+    # Reprendre d'abord les purges interrompues
+    for archive in AuditArchive.objects.filter(statut='ECRIT'):
+        _purge(archive, batch_size)
+
+    cutoff = month_start(timezone.localdate())
+    for _ in range(months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+
+    created = []
+    oldest = AuditTrail.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return created
+    month = month_start(timezone.localtime(oldest))
+    while month < cutoff:
+        archive = archive_month(month, batch_size=batch_size)
+        if archive is not None:
+            created.append(archive)
+        month = next_month(month)
+    return created
+
+
+def _read(archive):
+    path = os.path.join(settings.MEDIA_ROOT, archive.fichier)
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def _to_audit(record, users):
+    username = record.pop('_username')
+    projet_nom = record.pop('_projet_nom')
+    record['timestamp'] = parse_datetime(record['timestamp'])
+    audit = AuditTrail(**record)
+    if audit.user_id is not None:
+        audit.user = users.get(audit.user_id) or User(id=audit.user_id, username=username or '')
+    if audit.projet_id is not None:
+        audit.projet = Projet(id=audit.projet_id, nom=projet_nom or '')
+    return audit
+
+
+def iter_archived(start=None, end=None, chunk_size=2000, projet_ids=None, **filters):
+    """Instances AuditTrail lues dans les archives (du plus récent au plus ancien)"""
+    archives = AuditArchive.objects.all()
+    if start is not None:
+        archives = archives.filter(mois__gte=month_start(timezone.localtime(start)).date())
+    if end is not None:
+        archives = archives.filter(mois__lte=timezone.localtime(end).date())
+
+    if filters.get('projet_id') is not None:
+        projet_ids = {filters['projet_id']} if projet_ids is None else set(projet_ids) & {filters['projet_id']}
+    elif projet_ids is not None:
+        projet_ids = set(projet_ids)
+    for archive in archives:
+        if projet_ids is not None and archive.projets is not None and projet_ids.isdisjoint(archive.projets):
+            continue
+        # Archive sans index: construit pendant cette lecture (tous les enregistrements sont lus)
+        projets = set() if archive.projets is None else None
+
+        # Purge interrompue: les lignes encore en base sont déjà rendues par la partie chaude
+        still_hot = set()
+        if archive.statut == 'ECRIT':
+            still_hot = set(
+                AuditTrail.objects.filter(
+                    timestamp__gte=month_start(archive.mois), timestamp__lt=next_month(month_start(archive.mois))
+                ).values_list('id', flat=True)
+            )
+
+        chunk = []
+        for record in _read(archive):
+            if projets is not None and record['projet_id'] is not None:
+                projets.add(record['projet_id'])
+            if record['id'] in still_hot:
+                continue
+            if projet_ids is not None and record['projet_id'] not in projet_ids:
+                continue
+            if any(record.get(field) != value for field, value in filters.items()):
+                continue
+            moment = parse_datetime(record['timestamp'])
+            if (start is not None and moment < start) or (end is not None and moment > end):
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield from _resolve(chunk)
+                chunk = []
+        yield from _resolve(chunk)
+        if projets is not None:
+            archive.projets = sorted(projets)
+            archive.save(update_fields=['projets'])
+
+
+def _resolve(records):
+    # Utilisateurs encore existants lus en une requête par paquet
+    users = User.objects.in_bulk({record['user_id'] for record in records if record['user_id']})
+    for record in records:
+        yield _to_audit(record, users)
+
+
+def iter_audit_trail(start=None, end=None, chunk_size=2000, projet_ids=None, **filters):
+    """Traçabilité en base puis archivée, du plus récent au plus ancien.
+
+    ``start`` / ``end``: bornes incluses sur ``timestamp``; ``projet_ids``: projets
+    retenus (plusieurs à la fois); ``filters``: égalités sur ``FILTER_FIELDS``.
+    """
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Filtres non supportés: {', '.join(sorted(unknown))}")
+    filters = {field: value for field, value in filters.items() if value is not None}
+
+    hot = AuditTrail.objects.filter(**filters)
+    if projet_ids is not None:
+        hot = hot.filter(projet_id__in=projet_ids)
+    if start is not None:
+        hot = hot.filter(timestamp__gte=start)
+    if end is not None:
+        hot = hot.filter(timestamp__lte=end)
+    yield from hot.select_related('user', 'projet').order_by('-timestamp', '-id').iterator(chunk_size=chunk_size)
+    yield from iter_archived(start, end, chunk_size=chunk_size, projet_ids=projet_ids, **filters)
@@ -0,0 +1,260 @@
+"""
+Écriture groupée de la traçabilité (AuditTrail).
+
+``AuditTrail.log_action`` ne fait plus d'INSERT synchrone: l'événement est
+construit (horodaté à l'instant de l'action) puis confié au tampon du
+processus, vidé par ``bulk_create``:
+
+- à la fin de chaque requête (signal ``request_finished``, après l'envoi de
+  la réponse) ou, si ``AUDIT_BUFFER_BACKGROUND``, par un thread d'écriture
+  toutes les ``AUDIT_BUFFER_MAX_AGE`` secondes;
+- dès que le tampon atteint ``AUDIT_BUFFER_MAX_SIZE`` événements ou que le
+  plus ancien a plus de ``AUDIT_BUFFER_MAX_AGE`` secondes;
+- à l'arrêt du processus (``atexit``) et sur appel explicite de ``flush()``.
+
+Chaque lot met à jour, dans la même transaction, les agrégats journaliers
+(AuditDailyRollup) lus par les tableaux de bord.
+
+Garanties:
+
+- Transactions: un événement émis dans un bloc ``atomic`` n'entre dans le
+  tampon qu'au commit (``transaction.on_commit``); il est abandonné si la
+  transaction est annulée, comme l'était l'INSERT synchrone.
+- Ordre: dans un processus, les événements d'un lot réussi sont insérés dans
+  l'ordre où ils sont entrés dans le tampon (les ids croissent dans cet
+  ordre) et gardent l'horodatage de l'action. Un événement remis en attente
+  après un échec est inséré après ceux qui ont réussi: seul l'ordre
+  (timestamp, id) fait foi, dans un processus comme entre processus.
+- Au moins une fois: un lot est inséré dans une transaction. S'il échoue,
+  ses événements sont réécrits un par un (une transaction chacun): une
+  ligne invalide (projet ou utilisateur supprimé entre-temps) ne bloque pas
+  les autres. Un événement qui échoue est remis en tête du tampon; après
+  ``AUDIT_BUFFER_MAX_RETRIES`` échecs, il est abandonné et journalisé en
+  entier (niveau ERROR, logger ``projects.audit_buffer.dead_letter``).
+  Base indisponible (erreur de connexion): le reste du lot est remis en
+  attente sans compter d'échec. Le tampon ne dépasse pas
+  ``AUDIT_BUFFER_MAX_PENDING`` événements: au-delà, les plus anciens sont
+  abandonnés et journalisés de même. Une erreur survenant après le commit
+  (perte de connexion) peut produire un doublon. Les événements encore en
+  mémoire lors d'un arrêt brutal du processus (SIGKILL) sont perdus.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import InterfaceError, OperationalError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+dead_letter_logger = logging.getLogger(__name__ + '.dead_letter')
+
+# Champs journalisés pour un événement abandonné (assez pour le réinsérer)
+DEAD_LETTER_FIELDS = (
+    'action', 'timestamp', 'user_id', 'content_type_id', 'object_id', 'resource_type', 'resource_name',
+    'resource_id', 'projet_id', 'description', 'data_before', 'data_after', 'snapshot', 'ip_address',
+    'user_agent', 'session_id', 'context',
+)
+
+
+class AuditBuffer:
+    """Tampon d'événements d'audit partagé par les threads du processus"""
+
+    def __init__(self, max_size=500, max_age=2.0, background=False, max_retries=5, max_pending=10000):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.background = background
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.dead_letters = 0
+        self._entries = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        # Un seul vidage à la fois: préserve l'ordre d'insertion entre les lots
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def pending(self):
+        """Copie des événements en attente, du plus ancien au plus récent"""
+        with self._lock:
+            return list(self._entries)
+
+    def add(self, entry):
+        """Ajoute un événement (instance AuditTrail non sauvegardée)"""
+        with self._lock:
+            if not self._entries:
+                self._oldest = time.monotonic()
+            self._entries.append(entry)
+            dropped = self._trim()
+            due = self._is_due()
+        self._dead_letter(dropped, "tampon plein")
+
+        if self.background:
+            self._ensure_writer()
+            if due:
+                self._wakeup.set()
+        elif due:
+            self.flush()
+
+    def _is_due(self):
+        if not self._entries:
+            return False
+        return (
+            len(self._entries) >= self.max_size
+            or time.monotonic() - self._oldest >= self.max_age
+        )
+
+    def _trim(self):
+        """Retire (sous verrou) les événements les plus anciens au-delà de max_pending"""
+        overflow = len(self._entries) - self.max_pending
+        if overflow <= 0:
+            return []
+        dropped, self._entries = self._entries[:overflow], self._entries[overflow:]
+        return dropped
+
+    def _dead_letter(self, entries, reason):
+        for entry in entries:
+            self.dead_letters += 1
+            dead_letter_logger.error(
+                "Événement d'audit abandonné (%s): %s", reason,
+                {field: getattr(entry, field, None) for field in DEAD_LETTER_FIELDS},
+            )
+
+    def flush(self):
+        """Insère les événements en attente; retourne le nombre d'événements écrits"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._entries, self._oldest = self._entries, [], None
+            if not batch:
+                return 0
+
+            from .models import AuditTrail
+            from .services import AuditRollupService
+
+            try:
+                with transaction.atomic():
+                    AuditTrail.objects.bulk_create(batch, batch_size=self.max_size)
+                    # Agrégats journaliers mis à jour dans la même transaction
+                    AuditRollupService.record(batch)
+                return len(batch)
+            except Exception:
+                logger.warning("Échec de l'écriture groupée de %d événements d'audit, écriture un par un",
+                               len(batch), exc_info=True)
+                for entry in batch:
+                    # Un lot annulé ne doit pas garder de clé primaire partielle
+                    entry.pk = None
+
+            written, retry, failed = self._write_each(batch)
+            with self._lock:
+                self._entries = retry + self._entries
+                dropped = self._trim()
+                if self._entries:
+                    self._oldest = time.monotonic()
+            self._dead_letter(failed, f"{self.max_retries} échecs")
+            self._dead_letter(dropped, "tampon plein")
+            return written
+
+    def _write_each(self, batch):
+        """Écrit les événements un par un: (écrits, à retenter, abandonnés)"""
+        from .services import AuditRollupService
+
+        written, retry, failed = 0, [], []
+        for index, entry in enumerate(batch):
+            try:
+                with transaction.atomic():
+                    entry.save(force_insert=True)
+                    AuditRollupService.record([entry])
+            except (OperationalError, InterfaceError):
+                # Base indisponible: le reste du lot attend le prochain vidage, sans compter d'échec
+                logger.exception("Base indisponible, %d événements d'audit remis en attente", len(batch) - index)
+                entry.pk = None
+                retry.extend(batch[index:])
+                break
+            except Exception:
+                logger.exception("Échec de l'écriture d'un événement d'audit (%s %s %s)",
+                                 entry.action, entry.resource_type, entry.resource_id)
+                entry.pk = None
+                entry._audit_failures = getattr(entry, '_audit_failures', 0) + 1
+                (failed if entry._audit_failures >= self.max_retries else retry).append(entry)
+            else:
+                written += 1
+        return written, retry, failed
+
+    def flush_if_due(self):
+        with self._lock:
+            due = self._is_due()
+        return self.flush() if due else 0
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._run_writer, name='audit-writer', daemon=True)
+            self._writer.start()
+
+    def _run_writer(self):
+        # Réveillé par le seuil de taille, sinon vidage toutes les max_age secondes
+        while True:
+            self._wakeup.wait(self.max_age)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    """Tampon du processus, créé à partir des réglages AUDIT_BUFFER_*"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = AuditBuffer(
+                    max_size=getattr(settings, 'AUDIT_BUFFER_MAX_SIZE', 500),
+                    max_age=getattr(settings, 'AUDIT_BUFFER_MAX_AGE', 2.0),
+                    background=getattr(settings, 'AUDIT_BUFFER_BACKGROUND', False),
+                    max_retries=getattr(settings, 'AUDIT_BUFFER_MAX_RETRIES', 5),
+                    max_pending=getattr(settings, 'AUDIT_BUFFER_MAX_PENDING', 10000),
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def enqueue_audit(entry):
+    """Confie un événement au tampon, au commit de la transaction courante s'il y en a une"""
+    if not getattr(settings, 'AUDIT_BUFFER_ENABLED', True):
+        from .services import AuditRollupService
+
+        with transaction.atomic():
+            entry.save()
+            AuditRollupService.record([entry])
+        return entry
+
+    buffer = get_audit_buffer()
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: buffer.add(entry))
+    else:
+        buffer.add(entry)
+    return entry
+
+
+def flush_audit_buffer(**kwargs):
+    """Vide le tampon en fin de requête (le thread d'écriture s'en charge s'il est actif)"""
+    if _buffer is None or _buffer.background:
+        return 0
+    return _buffer.flush()
+
+
+request_finished.connect(flush_audit_buffer, dispatch_uid='projects.flush_audit_buffer')
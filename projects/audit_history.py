@@ -0,0 +1,167 @@
+"""
+Historique compact des ressources auditées et reconstruction à une date.
+
+Les modifications sont enregistrées en deltas: ``data_before`` / ``data_after``
+(AuditTrail) et ``before`` / ``after`` (AuditLog) ne contiennent plus que les
+champs qui ont changé. Pour les modèles reconstructibles (Projet, Phase), un
+état complet (``snapshot``) est écrit à la création puis toutes les
+``AUDIT_CHECKPOINT_INTERVAL`` modifications d'une même ressource.
+
+``state_as_of`` repart du dernier point de reprise antérieur à la date
+demandée et rejoue les deltas suivants: le nombre de deltas rejoués est borné
+par l'intervalle. Les modifications depuis le dernier point de reprise sont
+comptées en base (requête bornée à l'intervalle), plus celles encore dans le
+tampon d'audit du processus: la borne vaut quel que soit le nombre de
+workers. Seuls les événements d'autres processus pas encore écrits
+(requêtes en cours, au plus ``AUDIT_BUFFER_MAX_AGE`` secondes avec le thread
+d'écriture) peuvent la dépasser; un point de reprise encore en attente
+d'écriture en fait écrire un autre plus tôt, jamais plus tard. L'état reconstruit est
+celui connu de l'audit: une modification non auditée n'y apparaît qu'au point
+de reprise suivant.
+
+Sources: les projets sont audités dans AuditLog (ProjetViewSet), les phases
+dans AuditTrail (PhaseViewSet).
+"""
+import json
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+RECONSTRUCTIBLE_MODELS = ('projects.Projet', 'projects.Phase')
+
+
+def _checkpoint_interval():
+    return getattr(settings, 'AUDIT_CHECKPOINT_INTERVAL', 20)
+
+
+def snapshot(instance):
+    """État complet (champs concrets, clés étrangères en id) sérialisable en JSON"""
+    data = {
+        field.name: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+    }
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def encode_delta(before, after):
+    """Ne garde que les champs modifiés; retourne (before, after)"""
+    if not isinstance(before, dict) or not isinstance(after, dict):
+        return before, after
+
+    changed = [key for key in before.keys() | after.keys() if before.get(key) != after.get(key)]
+    return (
+        {key: before.get(key) for key in changed},
+        {key: after.get(key) for key in changed},
+    )
+
+
+def is_reconstructible(resource):
+    meta = getattr(resource, '_meta', None)
+    return meta is not None and meta.label in RECONSTRUCTIBLE_MODELS
+
+
+def _changes_since_checkpoint(resource, limit):
+    """Modifications de ``resource`` depuis son dernier point de reprise (au plus ``limit``; None sans point de reprise)"""
+    from .audit_buffer import get_audit_buffer
+    from .models import Phase
+
+    model = type(resource)
+    # Événements encore en mémoire (AuditTrail écrit par lots): les plus récents
+    pending = 0
+    if model is Phase:
+        content_type_id = ContentType.objects.get_for_model(Phase).id
+        for entry in reversed(get_audit_buffer().pending()):
+            if entry.content_type_id == content_type_id and entry.object_id == resource.pk:
+                if entry.snapshot is not None or entry.action == 'CREATE':
+                    return pending
+                pending += 1
+
+    events, date_field, _ = _history(model, resource.pk)
+    last = (
+        events.filter(Q(snapshot__isnull=False) | Q(action='CREATE'))
+        .order_by(f'-{date_field}', '-id')
+        .values_list(date_field, 'id')
+        .first()
+    )
+    if last is None:
+        return None
+    since = events.filter(Q(**{f'{date_field}__gt': last[0]}) | Q(**{date_field: last[0], 'id__gt': last[1]}))
+    return pending + since.order_by()[:limit].count()
+
+
+def checkpoint_snapshot(action, resource):
+    """État complet à écrire avec l'événement, ou None si un delta suffit"""
+    if not is_reconstructible(resource) or action == 'DELETE':
+        return None
+
+    if action != 'CREATE':
+        interval = _checkpoint_interval()
+        changes = _changes_since_checkpoint(resource, interval)
+        # Sans point de reprise en base (historique antérieur aux deltas): en écrire un
+        if changes is not None and changes + 1 < interval:
+            return None
+    return snapshot(resource)
+
+
+def _history(model, object_id):
+    """(queryset des événements, champ date, champ after) pour une ressource"""
+    from .models import AuditLog, AuditTrail, Phase, Projet
+
+    if model is Projet:
+        events = AuditLog.objects.filter(resource_type='Projet', resource_id=object_id)
+        return events, 'date_creation', 'after'
+    if model is Phase:
+        events = AuditTrail.objects.filter(
+            content_type=ContentType.objects.get_for_model(Phase), object_id=object_id
+        )
+        return events, 'timestamp', 'data_after'
+    raise ValueError(f"Reconstruction non supportée pour {model.__name__}")
+
+
+def state_as_of(model, object_id, at):
+    """Reconstruit l'état d'un Projet ou d'une Phase à la date ``at``.
+
+    Retourne ``{'state', 'checkpoint_at', 'deltas_replayed', 'deleted'}`` ou None
+    si l'historique ne contient aucun point de reprise antérieur à ``at``.
+    """
+    events, date_field, after_field = _history(model, object_id)
+    events = events.filter(**{f'{date_field}__lte': at})
+
+    checkpoint = (
+        events.filter(Q(snapshot__isnull=False) | Q(action='CREATE'))
+        .order_by(f'-{date_field}', '-id')
+        .only('id', 'action', date_field, after_field, 'snapshot')
+        .first()
+    )
+    if checkpoint is None:
+        return None
+
+    checkpoint_at = getattr(checkpoint, date_field)
+    state = dict(checkpoint.snapshot or getattr(checkpoint, after_field) or {})
+    replay = (
+        events.filter(
+            Q(**{f'{date_field}__gt': checkpoint_at})
+            | Q(**{date_field: checkpoint_at, 'id__gt': checkpoint.id})
+        )
+        .order_by(date_field, 'id')
+        .values_list('action', after_field)
+    )
+
+    replayed = 0
+    deleted = False
+    for action, delta in replay:
+        if action == 'DELETE':
+            deleted = True
+            continue
+        if isinstance(delta, dict):
+            state.update(delta)
+            replayed += 1
+
+    return {
+        'state': None if deleted else state,
+        'checkpoint_at': checkpoint_at,
+        'deltas_replayed': replayed,
+        'deleted': deleted,
+    }
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from projects.audit_archive import apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive la traçabilité plus ancienne que la période de rétention dans des fichiers "
+        "NDJSON gzip sous MEDIA_ROOT puis la supprime de la base par lots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=None,
+                            help=f"Mois conservés en base (défaut: AUDIT_RETENTION_MONTHS = {settings.AUDIT_RETENTION_MONTHS})")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        archives = apply_retention(options['months'], batch_size=options['batch_size'])
+        for archive in archives:
+            self.stdout.write(f"{archive.mois:%Y-%m}: {archive.nombre_lignes} lignes -> {archive.fichier} ({archive.taille} octets)")
+        self.stdout.write(self.style.SUCCESS(f"{len(archives)} archive(s) créée(s)"))
@@ -0,0 +1,153 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from projects.audit_history import snapshot, state_as_of
+from projects.models import AuditLog, AuditTrail, Phase, Projet
+from projects.utils import create_audit_log
+
+
+class _Rollback(Exception):
+    """Annule l'historique généré pour le rapport"""
+
+
+def _size(payload):
+    return 0 if payload is None else len(json.dumps(payload))
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un historique synthétique de projets et de phases, compare le stockage "
+        "des instantanés complets à celui des deltas avec points de reprise et mesure "
+        "la reconstruction à une date. Les données générées sont supprimées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projets', type=int, default=20)
+        parser.add_argument('--phases', type=int, default=5, help="Phases par projet")
+        parser.add_argument('--updates', type=int, default=5000, help="Modifications réparties au hasard")
+        parser.add_argument('--intervals', default='5,20,50', help="Intervalles de points de reprise à comparer")
+        parser.add_argument('--samples', type=int, default=300, help="Reconstructions vérifiées par intervalle")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        intervals = [int(i) for i in options['intervals'].split(',') if i.strip()]
+        self.stdout.write(
+            f"{'intervalle':>10} {'complet (Ko)':>13} {'deltas (Ko)':>12} {'gain':>6} "
+            f"{'deltas rejoués max':>19} {'reconstruction moy/max (ms)':>28} {'erreurs':>8}"
+        )
+        for interval in intervals:
+            try:
+                # Écriture directe: le tampon n'écrit qu'au commit, jamais atteint ici
+                with override_settings(AUDIT_BUFFER_ENABLED=False, AUDIT_CHECKPOINT_INTERVAL=interval):
+                    with transaction.atomic():
+                        self._report(interval, options)
+                        raise _Rollback
+            except _Rollback:
+                pass
+
+    def _report(self, interval, options):
+        rng = random.Random(options['seed'])
+        user = User.objects.create_user(username='bench-audit-history', password='bench')
+        history = {}
+        full_size = 0
+
+        objects = []
+        for p in range(options['projets']):
+            projet = Projet.objects.create(
+                nom=f'projet-{p}', description='Projet de démonstration ' * 4,
+                date_debut='2024-01-01', date_fin_prevue='2024-12-31', chef_projet=user,
+            )
+            create_audit_log(user, 'CREATE', projet)
+            objects.append(projet)
+            for o in range(options['phases']):
+                phase = Phase.objects.create(
+                    projet=projet, nom=f'phase-{o}', description='Phase de démonstration ' * 4,
+                    date_debut='2024-01-01', date_fin_prevue='2024-03-01', ordre=o,
+                )
+                AuditTrail.log_action('CREATE', user, phase, projet=projet)
+                objects.append(phase)
+
+        for obj in objects:
+            state = snapshot(obj)
+            history[(type(obj), obj.pk)] = [state]
+            full_size += _size(state)
+
+        for i in range(options['updates']):
+            obj = rng.choice(objects)
+            before = snapshot(obj)
+            self._mutate(obj, rng, i)
+            obj.save()
+            after = snapshot(obj)
+            # Ancien format: deux instantanés complets par modification
+            full_size += _size(before) + _size(after)
+            if isinstance(obj, Projet):
+                create_audit_log(user, 'UPDATE', obj, before=before)
+            else:
+                AuditTrail.log_action('UPDATE', user, obj, data_before=before, data_after=after, projet=obj.projet)
+            history[(type(obj), obj.pk)].append(after)
+
+        delta_size = sum(
+            _size(before) + _size(after) + _size(snap)
+            for before, after, snap in AuditLog.objects.filter(
+                resource_type='Projet', resource_repr__startswith='projet-'
+            ).values_list('before', 'after', 'snapshot').iterator()
+        ) + sum(
+            _size(before) + _size(after) + _size(snap)
+            for before, after, snap in AuditTrail.objects.filter(
+                projet__chef_projet=user
+            ).values_list('data_before', 'data_after', 'snapshot').iterator()
+        )
+
+        timings, max_replayed, errors = self._check_reconstruction(history, rng, options['samples'])
+        self.stdout.write(
+            f"{interval:>10} {full_size / 1024:>13.1f} {delta_size / 1024:>12.1f} "
+            f"{1 - delta_size / full_size:>6.0%} {max_replayed:>19} "
+            f"{sum(timings) / len(timings) * 1000:>14.2f} / {max(timings) * 1000:<11.2f} {errors:>8}"
+        )
+
+    def _mutate(self, obj, rng, i):
+        fields = ['description', 'date_fin_prevue', 'statut', 'nom']
+        for field in rng.sample(fields, 1 if rng.random() < 0.8 else 2):
+            if field == 'description':
+                obj.description = f'{obj.description[:60]} (révision {i})'
+            elif field == 'date_fin_prevue':
+                obj.date_fin_prevue = Projet._meta.get_field('date_fin_prevue').to_python(
+                    str(obj.date_fin_prevue)
+                ) + timedelta(days=1)
+            elif field == 'statut':
+                choices = [value for value, _ in type(obj).STATUT_CHOICES]
+                obj.statut = rng.choice(choices)
+            else:
+                obj.nom = f'{obj.nom.split(" ")[0]} v{i}'
+
+    def _check_reconstruction(self, history, rng, samples):
+        timings = []
+        max_replayed = 0
+        errors = 0
+        keys = list(history)
+        for _ in range(samples):
+            model, pk = rng.choice(keys)
+            if model is Projet:
+                dates = list(AuditLog.objects.filter(resource_type='Projet', resource_id=pk)
+                             .order_by('date_creation', 'id').values_list('date_creation', flat=True))
+            else:
+                dates = list(AuditTrail.objects.filter(content_type__model='phase', object_id=pk)
+                             .order_by('timestamp', 'id').values_list('timestamp', flat=True))
+            k = rng.randrange(len(dates))
+            if k + 1 < len(dates) and dates[k + 1] == dates[k]:
+                continue  # horodatages identiques: état intermédiaire non adressable
+
+            start = time.perf_counter()
+            result = state_as_of(model, pk, dates[k])
+            timings.append(time.perf_counter() - start)
+            max_replayed = max(max_replayed, result['deltas_replayed'])
+            if result['state'] != history[(model, pk)][k]:
+                errors += 1
+        return timings, max_replayed, errors
@@ -0,0 +1,112 @@
+import time
+from base64 import b64encode
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from projects.models import AuditTrail, Projet
+from projects.views import AuditTrailViewSet
+
+
+class _Rollback(Exception):
+    """Annule les données générées pour le benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le coût de la page 1 et d'une page profonde de la traçabilité "
+        "(pagination par numéro avec/sans COUNT, pagination par curseur). "
+        "Les lignes générées sont supprimées (transaction annulée) à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=250000, help="Nombre de lignes d'audit générées")
+        parser.add_argument('--page', type=int, default=10000, help="Numéro de la page profonde")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5, help="Mesures par cas (la médiane est affichée)")
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        deep_page = options['page']
+        if options['rows'] < deep_page * page_size:
+            raise CommandError("--rows doit couvrir au moins --page × --page-size lignes")
+
+        try:
+            with transaction.atomic():
+                user = self._seed(options['rows'])
+                self._report(user, deep_page, page_size, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, rows):
+        user = User.objects.create_user(username='bench-audit', password='bench', is_staff=True)
+        projet = Projet.objects.create(
+            nom='bench-audit',
+            date_debut='2024-01-01',
+            date_fin_prevue='2024-12-31',
+            chef_projet=user,
+        )
+        content_type = ContentType.objects.get_for_model(Projet)
+        batch = []
+        for i in range(rows):
+            batch.append(AuditTrail(
+                action='UPDATE',
+                user=user,
+                content_type=content_type,
+                object_id=projet.id,
+                resource_type='Projet',
+                resource_name=projet.nom,
+                resource_id=projet.id,
+                projet=projet,
+                description=f"modification {i}",
+            ))
+            if len(batch) >= 5000:
+                AuditTrail.objects.bulk_create(batch)
+                batch = []
+        AuditTrail.objects.bulk_create(batch)
+        return user
+
+    def _report(self, user, deep_page, page_size, repeat):
+        deep_offset = (deep_page - 1) * page_size
+        # Curseur équivalent à la page profonde: position = timestamp de la dernière ligne de la page précédente
+        boundary = (
+            AuditTrail.objects.order_by('-timestamp', '-id')
+            .values_list('timestamp', flat=True)[deep_offset - 1]
+        )
+        deep_cursor = b64encode(urlencode({'p': str(boundary)}).encode('ascii')).decode('ascii')
+
+        cases = [
+            ('numéro + COUNT', {}, {'page': 1}, {'page': deep_page}),
+            ('numéro sans COUNT', {'count': 'false'}, {'page': 1}, {'page': deep_page}),
+            ('curseur', {'pagination': 'cursor'}, {}, {'cursor': deep_cursor}),
+        ]
+
+        self.stdout.write(f"{'mode':<20} {'page':>7} {'requêtes':>9} {'médiane (ms)':>13}")
+        for label, base, first, deep in cases:
+            for page_label, extra in (('1', first), (str(deep_page), deep)):
+                params = {'page_size': page_size, **base, **extra}
+                elapsed, queries, rows = self._measure(user, params, repeat)
+                if rows != page_size:
+                    self.stderr.write(f"{label} page {page_label}: {rows} lignes au lieu de {page_size}")
+                self.stdout.write(f"{label:<20} {page_label:>7} {queries:>9} {elapsed * 1000:>13.2f}")
+
+    def _measure(self, user, params, repeat):
+        factory = APIRequestFactory()
+        view = AuditTrailViewSet.as_view({'get': 'list'})
+        timings = []
+        for _ in range(repeat):
+            request = factory.get('/api/audit-trail/', params, HTTP_HOST='localhost')
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2], len(ctx.captured_queries), len(response.data['results'])
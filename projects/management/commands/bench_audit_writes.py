@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from projects import audit_buffer
+from projects.models import AuditTrail, Phase, Projet
+from projects.services import AuditService
+from projects.views import PhaseViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la part de la traçabilité dans la latence de N modifications de phase, "
+        "écriture synchrone contre écriture groupée. Les données générées sont supprimées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=1000, help="Nombre de modifications de phase")
+
+    def handle(self, *args, **options):
+        # Pas de transaction englobante: les événements groupés ne partent qu'au commit
+        user = User.objects.create_user(username='bench-audit-writes', password='bench', is_staff=True)
+        projet = Projet.objects.create(
+            nom='bench-audit-writes',
+            date_debut='2024-01-01',
+            date_fin_prevue='2024-12-31',
+            chef_projet=user,
+        )
+        phase = Phase.objects.create(
+            projet=projet, nom='phase', date_debut='2024-01-01', date_fin_prevue='2024-02-01', ordre=1,
+        )
+
+        try:
+            self.stdout.write(
+                f"{'mode':<10} {'requête (µs)':>13} {'audit (µs)':>11} {'part audit':>11} "
+                f"{'vidage après réponse (µs)':>26} {'lignes':>7}"
+            )
+            for label, enabled in (('synchrone', False), ('tampon', True)):
+                with override_settings(AUDIT_BUFFER_ENABLED=enabled):
+                    self._run(label, user, phase, options['updates'])
+        finally:
+            projet.delete()
+            user.delete()
+
+    def _run(self, label, user, phase, updates):
+        factory = APIRequestFactory()
+        view = PhaseViewSet.as_view({'patch': 'partial_update'})
+        before = AuditTrail.objects.filter(projet_id=phase.projet_id).count()
+
+        audit_time = 0.0
+        original = AuditService.log_action
+
+        def timed_log_action(*args, **kwargs):
+            nonlocal audit_time
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                audit_time += time.perf_counter() - start
+
+        request_time = 0.0
+        flush_time = 0.0
+        AuditService.log_action = staticmethod(timed_log_action)
+        try:
+            for i in range(updates):
+                request = factory.patch(
+                    f'/api/phases/{phase.id}/', {'description': f'modification {i}'},
+                    format='json', HTTP_HOST='localhost',
+                )
+                force_authenticate(request, user=user)
+                start = time.perf_counter()
+                response = view(request, pk=phase.id)
+                response.render()
+                request_time += time.perf_counter() - start
+
+                # Équivalent du signal request_finished, émis après l'envoi de la réponse
+                start = time.perf_counter()
+                audit_buffer.flush_audit_buffer()
+                flush_time += time.perf_counter() - start
+        finally:
+            AuditService.log_action = original
+
+        written = AuditTrail.objects.filter(projet_id=phase.projet_id).count() - before
+        self.stdout.write(
+            f"{label:<10} {request_time / updates * 1e6:>13.1f} {audit_time / updates * 1e6:>11.1f} "
+            f"{audit_time / request_time:>10.1%} {flush_time / updates * 1e6:>26.1f} {written:>7}"
+        )
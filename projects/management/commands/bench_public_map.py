@@ -0,0 +1,104 @@
+import time
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from projects.models import Phase, Projet
+from projects.services import ProjectStatsService
+from projects.views import PublicProjetViewSet
+
+
+class _Rollback(Exception):
+    """Annule les données générées pour le benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût par projet du flux de la carte publique (?mode=map). "
+        "Les projets générés sont supprimés (transaction annulée) après chaque mesure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000,50000',
+                            help="Nombres de projets à tester, séparés par des virgules")
+        parser.add_argument('--phases', type=int, default=5, help="Phases par projet")
+        parser.add_argument('--page-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        self.stdout.write(f"{'projets':>8} {'requêtes':>9} {'total (ms)':>11} {'µs/projet':>10}")
+
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self._seed(size, options['phases'])
+                    elapsed, queries, rows = self._walk_feed(options['page_size'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+            if rows != size:
+                self.stderr.write(f"Flux incomplet: {rows} lignes pour {size} projets")
+            self.stdout.write(
+                f"{size:>8} {queries:>9} {elapsed * 1000:>11.1f} {elapsed / max(rows, 1) * 1e6:>10.2f}"
+            )
+
+    def _seed(self, size, phases_per_project):
+        # Partir d'une table vide pour que le flux ne contienne que les projets générés
+        Projet.objects.all().delete()
+        today = date.today()
+        Projet.objects.bulk_create(
+            [
+                Projet(
+                    nom=f"bench-{i}",
+                    date_debut=today,
+                    date_fin_prevue=today + timedelta(days=180),
+                    region='DAKAR' if i % 2 else 'THIES',
+                    departement='DAKAR' if i % 2 else 'MBOUR',
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        statuts = ('TERMINEE', 'EN_COURS', 'EN_ATTENTE')
+        phases = []
+        for projet_id in Projet.objects.values_list('id', flat=True).iterator(chunk_size=2000):
+            for ordre in range(phases_per_project):
+                phases.append(Phase(
+                    projet_id=projet_id,
+                    nom=f"phase-{ordre}",
+                    date_debut=today,
+                    date_fin_prevue=today + timedelta(days=30),
+                    statut=statuts[(projet_id + ordre) % 3],
+                    ordre=ordre,
+                ))
+            if len(phases) >= 5000:
+                Phase.objects.bulk_create(phases, batch_size=1000)
+                phases = []
+        Phase.objects.bulk_create(phases, batch_size=1000)
+        # bulk_create ne déclenche pas les signaux: statistiques reconstruites en masse
+        ProjectStatsService.rebuild()
+
+    def _walk_feed(self, page_size):
+        factory = APIRequestFactory()
+        view = PublicProjetViewSet.as_view({'get': 'list'})
+        params = {'mode': 'map', 'page_size': page_size}
+        rows = 0
+
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            while True:
+                response = view(factory.get('/api/projets/public/', params, HTTP_HOST='localhost'))
+                response.render()
+                rows += len(response.data['results'])
+                next_url = response.data['next']
+                if not next_url:
+                    break
+                params['cursor'] = parse_qs(urlparse(next_url).query)['cursor'][0]
+            elapsed = time.perf_counter() - start
+
+        return elapsed, len(ctx.captured_queries), rows
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.services import AuditRollupService
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les agrégats journaliers de la traçabilité (AuditDailyRollup) depuis AuditTrail; "
+        "les mois archivés (archive_audit) gardent leurs agrégats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Ne reconstruire qu'à partir de ce jour (AAAA-MM-JJ)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since attend une date AAAA-MM-JJ")
+
+        count = AuditRollupService.rebuild(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} agrégat(s) journalier(s) reconstruit(s)"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from projects.services import ProjectStatsService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit en masse les statistiques dénormalisées (ProjectStats) ou vérifie leur dérive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Vérifier seulement (aucune écriture); code de sortie 1 en cas d'écart")
+        parser.add_argument('--projet', type=int, action='append', dest='projets',
+                            help="Limiter la reconstruction à ce projet (répétable)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            drift = ProjectStatsService.verify(batch_size=options['batch_size'])
+            for projet_id, field, stored, expected in drift:
+                if field is None:
+                    self.stdout.write(f"Projet {projet_id}: statistiques absentes")
+                else:
+                    self.stdout.write(f"Projet {projet_id}: {field} = {stored} (attendu {expected})")
+            if drift:
+                self.stderr.write(self.style.ERROR(f"{len(drift)} écart(s) détecté(s)"))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("Aucune dérive détectée"))
+            return
+
+        count = ProjectStatsService.rebuild(options['projets'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Statistiques reconstruites pour {count} projet(s)"))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_phase_responsable_telephone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('projet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='projects.projet')),
+                ('phases_en_cours', models.PositiveIntegerField(default=0)),
+                ('phases_terminees', models.PositiveIntegerField(default=0)),
+                ('phases_en_attente', models.PositiveIntegerField(default=0)),
+                ('actions_a_faire', models.PositiveIntegerField(default=0)),
+                ('actions_en_cours', models.PositiveIntegerField(default=0)),
+                ('actions_terminees', models.PositiveIntegerField(default=0)),
+                ('actions_annulees', models.PositiveIntegerField(default=0)),
+                ('risques_faible', models.PositiveIntegerField(default=0)),
+                ('risques_moyen', models.PositiveIntegerField(default=0)),
+                ('risques_eleve', models.PositiveIntegerField(default=0)),
+                ('risques_critique', models.PositiveIntegerField(default=0)),
+                ('budget_prevu_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('budget_reel_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('nombre_documents', models.PositiveIntegerField(default=0)),
+                ('derniere_activite', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques de projet',
+                'verbose_name_plural': 'Statistiques de projets',
+            },
+        ),
+    ]
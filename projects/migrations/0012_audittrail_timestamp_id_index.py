@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_projectstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='audittrail',
+            options={'ordering': ['-timestamp', '-id'], 'verbose_name': 'Traçabilité', 'verbose_name_plural': 'Traçabilités'},
+        ),
+        migrations.AddIndex(
+            model_name='audittrail',
+            index=models.Index(fields=['timestamp', 'id'], name='projects_au_timesta_a3f7b2_idx'),
+        ),
+    ]
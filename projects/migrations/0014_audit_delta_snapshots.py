@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_audittrail_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audittrail',
+            name='snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['resource_type', 'resource_id', 'date_creation'], name='projects_au_resourc_399d64_idx'),
+        ),
+    ]
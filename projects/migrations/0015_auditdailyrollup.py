@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0014_audit_delta_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(choices=[('CREATE', 'Création'), ('UPDATE', 'Modification'), ('DELETE', 'Suppression'), ('LOGIN', 'Connexion'), ('LOGOUT', 'Déconnexion'), ('EXPORT', 'Export'), ('IMPORT', 'Import'), ('UPLOAD', 'Upload de fichier'), ('DOWNLOAD', 'Téléchargement'), ('STATUS_CHANGE', 'Changement de statut'), ('ASSIGNMENT', 'Attribution'), ('COMMENT', 'Commentaire'), ('NOTIFICATION', 'Notification')], max_length=20)),
+                ('resource_type', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': "Agrégat journalier d'audit",
+                'verbose_name_plural': "Agrégats journaliers d'audit",
+            },
+        ),
+        migrations.AddIndex(
+            model_name='audittrail',
+            index=models.Index(fields=['user', 'timestamp'], name='projects_au_user_id_db8aae_idx'),
+        ),
+        migrations.AddField(
+            model_name='auditdailyrollup',
+            name='projet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='audit_rollups', to='projects.projet'),
+        ),
+        migrations.AddField(
+            model_name='auditdailyrollup',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='auditdailyrollup',
+            index=models.Index(fields=['day', 'action', 'resource_type', 'user', 'projet'], name='projects_au_day_5c076a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditdailyrollup',
+            index=models.Index(fields=['user', 'day'], name='projects_au_user_id_6930ac_idx'),
+        ),
+    ]
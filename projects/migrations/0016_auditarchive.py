@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_auditdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('fichier', models.CharField(max_length=255)),
+                ('nombre_lignes', models.PositiveIntegerField(default=0)),
+                ('taille', models.PositiveBigIntegerField(default=0)),
+                ('statut', models.CharField(choices=[('ECRIT', 'Écrit, purge en cours'), ('PURGE', 'Purgé')], default='ECRIT', max_length=10)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': "Archive d'audit",
+                'verbose_name_plural': "Archives d'audit",
+                'ordering': ['-mois', '-id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='audittrail',
+            name='projects_au_timesta_88a931_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='audittrail',
+            name='projects_au_user_id_d39622_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='audittrail',
+            name='projects_au_projet__b2275d_idx',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:44
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Regroupe les lignes de même clé (NULL compris) sur la plus ancienne, compteurs additionnés"""
+    AuditDailyRollup = apps.get_model('projects', 'AuditDailyRollup')
+    keys = ('day', 'action', 'resource_type', 'user', 'projet')
+    duplicates = (
+        AuditDailyRollup.objects.values(*keys)
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('count'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for row in duplicates.iterator():
+        lookup = {key: row[key] for key in keys}
+        AuditDailyRollup.objects.filter(pk=row['keep']).update(count=row['total'])
+        AuditDailyRollup.objects.filter(**lookup).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_auditarchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='auditdailyrollup',
+            name='projects_au_day_5c076a_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='auditdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'action', 'resource_type', 'user', 'projet'), name='audit_rollup_unique_key'),
+        ),
+    ]
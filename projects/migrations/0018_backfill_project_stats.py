@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """Crée les statistiques des projets qui n'en ont pas encore.
+
+    Sans elles, la première écriture d'une phase, d'une action, d'un risque,
+    d'un budget ou d'un document de chaque projet passe par la reconstruction
+    paresseuse (``rebuild_if_missing``). Le calcul est celui du service (les
+    compteurs dépendent de plusieurs applications); sur une base neuve, il n'y a
+    aucun projet et rien n'est calculé. Équivalent manuel:
+    ``python manage.py rebuild_project_stats``.
+    """
+    from projects.services import ProjectStatsService
+
+    Projet = apps.get_model('projects', 'Projet')
+    ProjectStats = apps.get_model('projects', 'ProjectStats')
+    existing = set(ProjectStats.objects.values_list('projet_id', flat=True))
+    missing = [pk for pk in Projet.objects.order_by('id').values_list('id', flat=True) if pk not in existing]
+    if missing:
+        ProjectStatsService.rebuild(missing)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_auditdailyrollup_unique_key'),
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0018_backfill_project_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditarchive',
+            name='projets',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
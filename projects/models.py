@@ -2,7 +2,11 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Projet(models.Model):
     STATUT_CHOICES = (
@@ -275,6 +279,89 @@ class Commentaire(models.Model):
         ordering = ['-date_creation'] 
 
 
+class ProjectStats(models.Model):
+    """Statistiques dénormalisées d'un projet (une ligne par projet).
+
+    Tenues à jour par les signaux de projects/signals.py à chaque écriture de
+    Phase, Action, Risque, Budget ou Document; reconstruites et vérifiées par
+    la commande ``rebuild_project_stats``.
+    """
+
+    projet = models.OneToOneField(Projet, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    # Phases par statut
+    phases_en_cours = models.PositiveIntegerField(default=0)
+    phases_terminees = models.PositiveIntegerField(default=0)
+    phases_en_attente = models.PositiveIntegerField(default=0)
+
+    # Actions par statut
+    actions_a_faire = models.PositiveIntegerField(default=0)
+    actions_en_cours = models.PositiveIntegerField(default=0)
+    actions_terminees = models.PositiveIntegerField(default=0)
+    actions_annulees = models.PositiveIntegerField(default=0)
+
+    # Risques par niveau
+    risques_faible = models.PositiveIntegerField(default=0)
+    risques_moyen = models.PositiveIntegerField(default=0)
+    risques_eleve = models.PositiveIntegerField(default=0)
+    risques_critique = models.PositiveIntegerField(default=0)
+
+    # Sommes des lignes de budget
+    budget_prevu_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    budget_reel_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+
+    nombre_documents = models.PositiveIntegerField(default=0)
+    derniere_activite = models.DateTimeField(null=True, blank=True)
+
+    # Colonnes de compteurs par champ source (statut/niveau/type → colonne)
+    PHASE_COLUMNS = {
+        'EN_COURS': 'phases_en_cours',
+        'TERMINEE': 'phases_terminees',
+        'EN_ATTENTE': 'phases_en_attente',
+    }
+    ACTION_COLUMNS = {
+        'A_FAIRE': 'actions_a_faire',
+        'EN_COURS': 'actions_en_cours',
+        'TERMINEE': 'actions_terminees',
+        'ANNULEE': 'actions_annulees',
+    }
+    RISQUE_COLUMNS = {
+        'FAIBLE': 'risques_faible',
+        'MOYEN': 'risques_moyen',
+        'ELEVE': 'risques_eleve',
+        'CRITIQUE': 'risques_critique',
+    }
+    BUDGET_COLUMNS = {
+        'PREVU': 'budget_prevu_total',
+        'REEL': 'budget_reel_total',
+    }
+
+    class Meta:
+        verbose_name = "Statistiques de projet"
+        verbose_name_plural = "Statistiques de projets"
+
+    def __str__(self):
+        return f"Statistiques - {self.projet_id}"
+
+    @property
+    def total_phases(self):
+        return self.phases_en_cours + self.phases_terminees + self.phases_en_attente
+
+    @property
+    def total_actions(self):
+        return self.actions_a_faire + self.actions_en_cours + self.actions_terminees + self.actions_annulees
+
+    @property
+    def total_risques(self):
+        return self.risques_faible + self.risques_moyen + self.risques_eleve + self.risques_critique
+
+    @property
+    def progression(self):
+        """Pourcentage de phases terminées"""
+        total = self.total_phases
+        return int((self.phases_terminees / total) * 100) if total > 0 else 0
+
+
 # --- Traçabilité / Journal d'audit ---
 class AuditLog(models.Model):
     ACTION_CHOICES = (
@@ -288,14 +375,20 @@ class AuditLog(models.Model):
     resource_type = models.CharField(max_length=100)
     resource_id = models.PositiveIntegerField()
     resource_repr = models.TextField()
+    # Modifications: seuls les champs changés (voir audit_history.py)
     before = models.JSONField(null=True, blank=True)
     after = models.JSONField(null=True, blank=True)
+    # État complet périodique servant de point de reprise
+    snapshot = models.JSONField(null=True, blank=True)
     date_creation = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Audit"
         verbose_name_plural = "Audits"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['resource_type', 'resource_id', 'date_creation']),
+        ]
 
     def __str__(self):
         return f"{self.date_creation} {self.action} {self.resource_type}#{self.resource_id}"
@@ -322,7 +415,8 @@ class AuditTrail(models.Model):
     
     # Informations sur l'action
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Horodaté à l'émission de l'événement, pas à son écriture différée (voir audit_buffer.py)
+    timestamp = models.DateTimeField(default=timezone.now)
     
     # Utilisateur qui a effectué l'action
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='audit_actions')
@@ -343,9 +437,11 @@ class AuditTrail(models.Model):
     # Détails de l'action
     description = models.TextField(blank=True)
     
-    # Données avant/après (pour les modifications)
+    # Données avant/après (pour les modifications): seuls les champs changés
     data_before = models.JSONField(null=True, blank=True)
     data_after = models.JSONField(null=True, blank=True)
+    # État complet périodique servant de point de reprise (voir audit_history.py)
+    snapshot = models.JSONField(null=True, blank=True)
     
     # Métadonnées
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -358,12 +454,15 @@ class AuditTrail(models.Model):
     class Meta:
         verbose_name = "Traçabilité"
         verbose_name_plural = "Traçabilités"
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
+        # (timestamp, id) couvre les recherches sur timestamp seul; user et projet
+        # sont déjà indexés par leur clé étrangère
         indexes = [
-            models.Index(fields=['timestamp']),
+            # Clé de la pagination par curseur (timestamp, id)
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['action']),
-            models.Index(fields=['user']),
-            models.Index(fields=['projet']),
+            # Activité récente d'un utilisateur (user_activity)
+            models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['resource_type']),
             models.Index(fields=['content_type', 'object_id']),
         ]
@@ -374,15 +473,13 @@ class AuditTrail(models.Model):
     def get_changes_summary(self):
         """Retourne un résumé des changements pour les modifications"""
         if self.action == 'UPDATE' and self.data_before and self.data_after:
-            changes = []
-            for key in set(self.data_before.keys()) | set(self.data_after.keys()):
-                if self.data_before.get(key) != self.data_after.get(key):
-                    changes.append({
-                        'field': key,
-                        'before': self.data_before.get(key),
-                        'after': self.data_after.get(key)
-                    })
-            return changes
+            # Les deltas ne contiennent que des champs modifiés; la comparaison
+            # ne filtre que les anciens enregistrements en instantanés complets
+            return [
+                {'field': key, 'before': self.data_before.get(key), 'after': self.data_after.get(key)}
+                for key in self.data_before.keys() | self.data_after.keys()
+                if self.data_before.get(key) != self.data_after.get(key)
+            ]
         return []
     
     def get_formatted_timestamp(self):
@@ -392,7 +489,14 @@ class AuditTrail(models.Model):
     @classmethod
     def log_action(cls, action, user, resource, description='', data_before=None, data_after=None, 
                    projet=None, ip_address=None, user_agent=None, session_id=None, context=None):
-        """Méthode utilitaire pour enregistrer une action"""
+        """Méthode utilitaire pour enregistrer une action.
+
+        L'événement est écrit par lots (voir ``projects.audit_buffer``): l'instance
+        retournée n'a pas encore de clé primaire.
+        """
+        from .audit_buffer import enqueue_audit
+        from .audit_history import checkpoint_snapshot, encode_delta
+
         try:
             # Déterminer le type de ressource
             if hasattr(resource, '_meta'):
@@ -404,8 +508,11 @@ class AuditTrail(models.Model):
                 resource_name = str(resource)
                 resource_id = getattr(resource, 'id', 0)
             
-            # Créer l'enregistrement d'audit
-            audit = cls.objects.create(
+            # Deltas uniquement, état complet aux points de reprise
+            data_before, data_after = encode_delta(data_before, data_after)
+            
+            # Préparer l'enregistrement d'audit (type de contenu mis en cache par Django)
+            audit = cls(
                 action=action,
                 user=user,
                 content_type=ContentType.objects.get_for_model(resource),
@@ -417,14 +524,80 @@ class AuditTrail(models.Model):
                 description=description,
                 data_before=data_before,
                 data_after=data_after,
+                snapshot=checkpoint_snapshot(action, resource),
                 ip_address=ip_address,
                 user_agent=user_agent,
                 session_id=session_id,
                 context=context
             )
             
-            return audit
-        except Exception as e:
+            return enqueue_audit(audit)
+        except Exception:
             # En cas d'erreur, on log mais on ne fait pas échouer l'opération principale
-            print(f"Erreur lors de l'enregistrement de l'audit: {e}")
-            return None
\ No newline at end of file
+            logger.exception("Erreur lors de l'enregistrement de l'audit")
+            return None
+
+class AuditDailyRollup(models.Model):
+    """Compteurs journaliers de la traçabilité (jour × action × ressource × utilisateur × projet).
+
+    Alimentés à chaque écriture d'audit (voir audit_buffer.py) et reconstruits
+    par la commande ``rebuild_audit_rollup``. Une seule ligne par clé
+    (contrainte d'unicité). SQL tenant deux NULL pour distincts, une clé sans
+    utilisateur (anonyme, utilisateur supprimé) ou sans projet peut encore
+    apparaître sur plusieurs lignes: chaque événement n'en incrémente qu'une,
+    choisie par clé primaire, et les lectures additionnent ``count``.
+    """
+
+    day = models.DateField()
+    action = models.CharField(max_length=20, choices=AuditTrail.ACTION_CHOICES)
+    resource_type = models.CharField(max_length=100)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_rollups')
+    projet = models.ForeignKey(Projet, on_delete=models.CASCADE, null=True, blank=True, related_name='audit_rollups')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Agrégat journalier d'audit"
+        verbose_name_plural = "Agrégats journaliers d'audit"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'action', 'resource_type', 'user', 'projet'], name='audit_rollup_unique_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.action} {self.resource_type}: {self.count}"
+
+
+class AuditArchive(models.Model):
+    """Fichier d'archive (NDJSON gzip sous MEDIA_ROOT) d'un mois de traçabilité.
+
+    Écrit par la commande ``archive_audit``; les lignes archivées sont ensuite
+    supprimées d'AuditTrail par lots (statut PURGE une fois terminé). Lu par
+    ``projects.audit_archive.iter_audit_trail`` avec les lignes encore en base.
+    """
+
+    STATUT_CHOICES = (
+        ('ECRIT', 'Écrit, purge en cours'),
+        ('PURGE', 'Purgé'),
+    )
+
+    mois = models.DateField()  # premier jour du mois archivé
+    fichier = models.CharField(max_length=255)  # chemin relatif à MEDIA_ROOT
+    nombre_lignes = models.PositiveIntegerField(default=0)
+    taille = models.PositiveBigIntegerField(default=0)  # octets compressés
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='ECRIT')
+    # Ids des projets présents dans le fichier: les lectures filtrées par projet sautent
+    # les autres archives (None: archive antérieure, index écrit à sa première lecture complète)
+    projets = models.JSONField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archive d'audit"
+        verbose_name_plural = "Archives d'audit"
+        ordering = ['-mois', '-id']
+
+    def __str__(self):
+        return f"{self.mois:%Y-%m} ({self.nombre_lignes} lignes)"
@@ -1,11 +1,22 @@
+import csv
+import logging
+from collections import Counter
 import zipfile
+import zlib
 import json
 import os
-from io import BytesIO
+from io import BytesIO, StringIO
 from django.http import HttpResponse
 from django.core.serializers import serialize
 from django.contrib.contenttypes.models import ContentType
-from .models import Projet, Phase, Action, Risque, Budget, Commentaire, AuditTrail
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, PositiveIntegerField, QuerySet, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+from .audit_archive import month_start, next_month
+from .models import (
+    Projet, Phase, Action, Risque, Budget, Commentaire, AuditArchive, AuditTrail, AuditDailyRollup, ProjectStats,
+)
 
 # Import du modèle Document depuis l'application documents
 try:
@@ -14,6 +25,9 @@ except ImportError:
     # Fallback si l'application documents n'est pas disponible
     Document = None
 
+logger = logging.getLogger(__name__)
+
+
 class ProjectExportService:
     """Service pour exporter un projet complet avec toutes ses données"""
     
@@ -99,9 +113,9 @@ class AuditService:
             
             return audit
             
-        except Exception as e:
+        except Exception:
             # En cas d'erreur, on log mais on ne fait pas échouer l'opération principale
-            print(f"Erreur lors de l'enregistrement de l'audit: {e}")
+            logger.exception("Erreur lors de l'enregistrement de l'audit")
             return None
     
     @staticmethod
@@ -148,6 +162,8 @@ class AuditService:
             user=user,
             resource=phase,
             description=f"Changement de statut de la phase '{phase.nom}': {old_status} → {new_status}",
+            data_before={'statut': old_status},
+            data_after={'statut': new_status},
             projet=phase.projet,
             request=request,
             context={
@@ -219,3 +235,327 @@ class AuditService:
             request=request,
             context={'type': 'project_export'}
         )
+
+
+class AuditExportService:
+    """Export en flux de la traçabilité (CSV ou NDJSON, gzip optionnel).
+
+    Les lignes sont lues par paquets côté serveur (``iterator(chunk_size)``) et
+    émises par blocs: la mémoire reste constante quel que soit le volume exporté.
+    """
+
+    COLUMNS = (
+        'Date', 'Action', 'Utilisateur', 'Type_Ressource', 'Nom_Ressource', 'ID_Ressource',
+        'Projet', 'Description', 'IP', 'Données_Avant', 'Données_Après',
+    )
+    FORMATS = {
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+    CHUNK_SIZE = 2000
+    # Taille approximative (en caractères) des blocs envoyés au client
+    BLOCK_SIZE = 64 * 1024
+
+    @staticmethod
+    def row(audit):
+        """Ligne d'export d'un audit (mêmes colonnes que l'export JSON)"""
+        return {
+            'Date': audit.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'Action': audit.get_action_display(),
+            'Utilisateur': audit.user.username if audit.user else 'Système',
+            'Type_Ressource': audit.resource_type,
+            'Nom_Ressource': audit.resource_name,
+            'ID_Ressource': audit.resource_id,
+            'Projet': audit.projet.nom if audit.projet else 'N/A',
+            'Description': audit.description,
+            'IP': audit.ip_address or 'N/A',
+            'Données_Avant': json.dumps(audit.data_before) if audit.data_before else 'N/A',
+            'Données_Après': json.dumps(audit.data_after) if audit.data_after else 'N/A'
+        }
+
+    @staticmethod
+    def iter_audits(source, chunk_size=None):
+        """Parcourt un queryset par paquets (utilisateur et projet joints) ou un itérable d'audits"""
+        if not isinstance(source, QuerySet):
+            return iter(source)
+        return source.select_related('user', 'projet').iterator(
+            chunk_size=chunk_size or AuditExportService.CHUNK_SIZE
+        )
+
+    @staticmethod
+    def stream_csv(queryset, chunk_size=None):
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=AuditExportService.COLUMNS)
+        writer.writeheader()
+        for audit in AuditExportService.iter_audits(queryset, chunk_size):
+            writer.writerow(AuditExportService.row(audit))
+            if buffer.tell() >= AuditExportService.BLOCK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def stream_ndjson(queryset, chunk_size=None):
+        lines = []
+        size = 0
+        for audit in AuditExportService.iter_audits(queryset, chunk_size):
+            line = json.dumps(AuditExportService.row(audit), ensure_ascii=False)
+            lines.append(line)
+            size += len(line) + 1
+            if size >= AuditExportService.BLOCK_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+                size = 0
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def gzip_stream(chunks):
+        """Compresse à la volée un flux de texte (format gzip)"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def stream(queryset, export_format='csv', compress=False, chunk_size=None):
+        """Retourne (flux, content_type, extension) pour le format demandé"""
+        content_type, extension = AuditExportService.FORMATS[export_format]
+        if export_format == 'csv':
+            chunks = AuditExportService.stream_csv(queryset, chunk_size)
+        else:
+            chunks = AuditExportService.stream_ndjson(queryset, chunk_size)
+
+        if compress:
+            return AuditExportService.gzip_stream(chunks), 'application/gzip', f'{extension}.gz'
+        return (chunk.encode('utf-8') for chunk in chunks), content_type, extension
+
+
+class AuditRollupService:
+    """Service pour les agrégats journaliers de la traçabilité (AuditDailyRollup)"""
+
+    KEY_FIELDS = ('day', 'action', 'resource_type', 'user_id', 'projet_id')
+
+    @staticmethod
+    def record(entries):
+        """Ajoute des événements d'audit écrits aux compteurs (deux requêtes par clé distincte)"""
+        counts = Counter(
+            (timezone.localdate(entry.timestamp), entry.action, entry.resource_type, entry.user_id, entry.projet_id)
+            for entry in entries
+        )
+        for key, n in counts.items():
+            lookup = dict(zip(AuditRollupService.KEY_FIELDS, key))
+            # Une seule ligne incrémentée par clé, même si une clé NULL en a plusieurs
+            rows = AuditDailyRollup.objects.filter(**lookup).order_by('pk').values_list('pk', flat=True)
+            pk = rows.first()
+            if pk is None:
+                try:
+                    with transaction.atomic():
+                        AuditDailyRollup.objects.create(count=n, **lookup)
+                    continue
+                except IntegrityError:
+                    # Ligne créée entre-temps par un autre processus (contrainte d'unicité)
+                    pk = rows.first()
+                    if pk is None:
+                        raise
+            AuditDailyRollup.objects.filter(pk=pk).update(count=F('count') + n)
+
+    @staticmethod
+    def rebuild(since=None, batch_size=1000):
+        """Reconstruit les compteurs depuis AuditTrail (tous les jours, ou à partir de ``since``).
+
+        Les mois archivés (AuditArchive) ne sont plus en base: leurs compteurs
+        sont conservés tels quels et leurs éventuelles lignes restantes ignorées.
+        """
+        rollups = AuditDailyRollup.objects.all()
+        audits = AuditTrail.objects.all()
+        if since is not None:
+            rollups = rollups.filter(day__gte=since)
+            audits = audits.filter(timestamp__date__gte=since)
+        for mois in AuditArchive.objects.values_list('mois', flat=True).distinct():
+            start = month_start(mois)
+            end = next_month(start)
+            rollups = rollups.exclude(day__gte=start.date(), day__lt=end.date())
+            audits = audits.exclude(timestamp__gte=start, timestamp__lt=end)
+
+        rows = (
+            audits.annotate(day=TruncDate('timestamp'))
+            .values('day', 'action', 'resource_type', 'user_id', 'projet_id')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            rollups.delete()
+            created = AuditDailyRollup.objects.bulk_create(
+                (
+                    AuditDailyRollup(
+                        day=row['day'], action=row['action'], resource_type=row['resource_type'],
+                        user_id=row['user_id'], projet_id=row['projet_id'], count=row['n'],
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=batch_size,
+            )
+        return len(created)
+
+    @staticmethod
+    def totals(rollups):
+        """Somme des compteurs d'un queryset d'agrégats"""
+        return rollups.aggregate(total=Sum('count'))['total'] or 0
+
+
+class ProjectStatsService:
+    """Service pour les statistiques dénormalisées des projets (ProjectStats)"""
+
+    COUNTER_FIELDS = (
+        list(ProjectStats.PHASE_COLUMNS.values())
+        + list(ProjectStats.ACTION_COLUMNS.values())
+        + list(ProjectStats.RISQUE_COLUMNS.values())
+        + list(ProjectStats.BUDGET_COLUMNS.values())
+        + ['nombre_documents']
+    )
+
+    @staticmethod
+    def compute(projet_ids):
+        """Recalcule les statistiques d'un lot de projets depuis les tables sources.
+
+        Nombre de requêtes fixe (une requête groupée par table), quel que soit
+        le nombre de projets du lot. Retourne {projet_id: ProjectStats} non sauvegardés.
+        """
+        stats = {
+            projet_id: ProjectStats(projet_id=projet_id, derniere_activite=date_modification)
+            for projet_id, date_modification in Projet.objects.filter(id__in=projet_ids).values_list('id', 'date_modification')
+        }
+
+        def _touch(stat, moment):
+            if moment and (stat.derniere_activite is None or moment > stat.derniere_activite):
+                stat.derniere_activite = moment
+
+        for model, field, columns in (
+            (Phase, 'statut', ProjectStats.PHASE_COLUMNS),
+            (Action, 'statut', ProjectStats.ACTION_COLUMNS),
+            (Risque, 'niveau', ProjectStats.RISQUE_COLUMNS),
+        ):
+            rows = model.objects.filter(projet_id__in=projet_ids).values('projet_id', field).annotate(n=Count('id'))
+            for row in rows:
+                column = columns.get(row[field])
+                if column and row['projet_id'] in stats:
+                    setattr(stats[row['projet_id']], column, row['n'])
+
+        rows = Budget.objects.filter(projet_id__in=projet_ids).values('projet_id', 'type').annotate(total=Sum('montant'))
+        for row in rows:
+            column = ProjectStats.BUDGET_COLUMNS.get(row['type'])
+            if column and row['projet_id'] in stats:
+                setattr(stats[row['projet_id']], column, row['total'] or 0)
+
+        rows = Risque.objects.filter(projet_id__in=projet_ids).values('projet_id').annotate(last=Max('date_identification'))
+        for row in rows:
+            if row['projet_id'] in stats:
+                _touch(stats[row['projet_id']], row['last'])
+
+        if Document is not None:
+            rows = Document.objects.filter(projet_id__in=projet_ids).values('projet_id').annotate(
+                n=Count('id'), last=Max('date_upload')
+            )
+            for row in rows:
+                if row['projet_id'] in stats:
+                    stats[row['projet_id']].nombre_documents = row['n']
+                    _touch(stats[row['projet_id']], row['last'])
+
+        return stats
+
+    @staticmethod
+    def rebuild(projet_ids=None, batch_size=1000):
+        """Reconstruit (upsert) les statistiques par lots; tous les projets si projet_ids est None"""
+        if projet_ids is None:
+            projet_ids = Projet.objects.order_by('id').values_list('id', flat=True)
+        projet_ids = list(projet_ids)
+
+        rebuilt = 0
+        for start in range(0, len(projet_ids), batch_size):
+            stats = ProjectStatsService.compute(projet_ids[start:start + batch_size])
+            ProjectStatsService._upsert(list(stats.values()))
+            rebuilt += len(stats)
+        return rebuilt
+
+    @staticmethod
+    def _upsert(stats):
+        """Insère ou remplace des lignes ProjectStats, selon ce que permet la base"""
+        update_fields = ProjectStatsService.COUNTER_FIELDS + ['derniere_activite']
+        features = connection.features
+        if features.supports_update_conflicts_with_target:
+            # PostgreSQL, SQLite: ON CONFLICT (projet_id) DO UPDATE
+            ProjectStats.objects.bulk_create(
+                stats, update_conflicts=True, unique_fields=['projet'], update_fields=update_fields,
+            )
+        elif features.supports_update_conflicts:
+            # MySQL: ON DUPLICATE KEY UPDATE, sans cible (la clé primaire projet est la seule clé unique)
+            ProjectStats.objects.bulk_create(stats, update_conflicts=True, update_fields=update_fields)
+        else:
+            with transaction.atomic():
+                ProjectStats.objects.filter(pk__in=[row.projet_id for row in stats]).delete()
+                ProjectStats.objects.bulk_create(stats)
+
+    @staticmethod
+    def verify(batch_size=1000):
+        """Compare les statistiques stockées aux tables sources.
+
+        Retourne la liste des écarts (projet_id, champ, valeur stockée, valeur attendue);
+        une ligne ProjectStats manquante est signalée avec le champ None.
+        """
+        drift = []
+        projet_ids = list(Projet.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(projet_ids), batch_size):
+            chunk = projet_ids[start:start + batch_size]
+            expected = ProjectStatsService.compute(chunk)
+            stored = ProjectStats.objects.in_bulk(chunk)
+            for projet_id, attendu in expected.items():
+                actuel = stored.get(projet_id)
+                if actuel is None:
+                    drift.append((projet_id, None, None, None))
+                    continue
+                for field in ProjectStatsService.COUNTER_FIELDS:
+                    if getattr(actuel, field) != getattr(attendu, field):
+                        drift.append((projet_id, field, getattr(actuel, field), getattr(attendu, field)))
+        return drift
+
+    @staticmethod
+    def get(projet_id):
+        """Statistiques d'un projet: une lecture par clé primaire (reconstruites si absentes)"""
+        try:
+            return ProjectStats.objects.get(pk=projet_id)
+        except ProjectStats.DoesNotExist:
+            ProjectStatsService.rebuild([projet_id])
+            return ProjectStats.objects.get(pk=projet_id)
+
+    @staticmethod
+    def for_projets(projet_ids):
+        """Statistiques d'un lot de projets {projet_id: ProjectStats} (lignes absentes reconstruites)"""
+        projet_ids = list(projet_ids)
+        stats = ProjectStats.objects.in_bulk(projet_ids)
+        missing = [projet_id for projet_id in projet_ids if projet_id not in stats]
+        if missing:
+            ProjectStatsService.rebuild(missing)
+            stats.update(ProjectStats.objects.in_bulk(missing))
+        return stats
+
+    @staticmethod
+    def apply_delta(projet_id, deltas):
+        """Applique des incréments {colonne: delta} en un seul UPDATE; retourne le nombre de lignes touchées.
+
+        Les compteurs décrémentés restent positifs: un compteur déjà faux (écriture
+        sans signaux, ``bulk_create`` ou ``update``) ne doit pas faire échouer la
+        suppression qui le décrémente. ``rebuild`` le remet d'aplomb.
+        """
+        updates = {}
+        for column, delta in deltas.items():
+            if not delta:
+                continue
+            value = F(column) + delta
+            if delta < 0 and isinstance(ProjectStats._meta.get_field(column), PositiveIntegerField):
+                value = Greatest(value, Value(0))
+            updates[column] = value
+        return ProjectStats.objects.filter(pk=projet_id).update(derniere_activite=timezone.now(), **updates)
@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .access import invalidate_project_access
+from .models import Projet, ProjectStats
+from .services import ProjectStatsService
+
+
+# Modèles suivis: label → (champ de ventilation, colonnes ProjectStats).
+# Document vit dans l'application documents, d'où la référence par label.
+TRACKED_MODELS = {
+    'projects.Phase': ('statut', ProjectStats.PHASE_COLUMNS),
+    'projects.Action': ('statut', ProjectStats.ACTION_COLUMNS),
+    'projects.Risque': ('niveau', ProjectStats.RISQUE_COLUMNS),
+    'projects.Budget': ('type', ProjectStats.BUDGET_COLUMNS),
+    'documents.Document': (None, None),
+}
+
+
+def _contribution(label, values):
+    """Contribution d'une ligne aux compteurs de son projet: {colonne: delta}"""
+    field, columns = TRACKED_MODELS[label]
+    if field is None:
+        return {'nombre_documents': 1}
+    column = columns.get(values.get(field))
+    if column is None:
+        return {}
+    if label == 'projects.Budget':
+        return {column: values.get('montant') or 0}
+    return {column: 1}
+
+
+def _snapshot(label, instance):
+    field, _ = TRACKED_MODELS[label]
+    values = {'projet_id': instance.projet_id}
+    if field:
+        values[field] = getattr(instance, field)
+    if label == 'projects.Budget':
+        values['montant'] = instance.montant
+    return values
+
+
+def _apply(projet_id, deltas, rebuild_if_missing):
+    if projet_id is None:
+        return
+    updated = ProjectStatsService.apply_delta(projet_id, deltas)
+    if not updated and rebuild_if_missing:
+        # Ligne absente (projet antérieur aux statistiques): reconstruction ciblée
+        ProjectStatsService.rebuild([projet_id])
+
+
+def stats_pre_save(sender, instance, raw=False, **kwargs):
+    """Mémorise l'état précédent (une lecture par clé primaire) pour calculer le delta"""
+    if raw or instance.pk is None:
+        return
+    field, _ = TRACKED_MODELS[sender._meta.label]
+    fields = ['projet_id'] + ([field] if field else [])
+    if sender._meta.label == 'projects.Budget':
+        fields.append('montant')
+    instance._stats_previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def stats_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    label = sender._meta.label
+    new = _snapshot(label, instance)
+    previous = None if created else getattr(instance, '_stats_previous', None)
+    instance._stats_previous = None
+
+    deltas = {new['projet_id']: dict(_contribution(label, new))}
+    if previous:
+        old_deltas = deltas.setdefault(previous['projet_id'], {})
+        for column, amount in _contribution(label, previous).items():
+            old_deltas[column] = old_deltas.get(column, 0) - amount
+
+    for projet_id, projet_deltas in deltas.items():
+        _apply(projet_id, projet_deltas, rebuild_if_missing=True)
+
+
+def stats_post_delete(sender, instance, **kwargs):
+    label = sender._meta.label
+    old = _snapshot(label, instance)
+    deltas = {column: -amount for column, amount in _contribution(label, old).items()}
+    # Pas de reconstruction ici: lors de la suppression en cascade d'un projet,
+    # sa ligne de statistiques peut déjà avoir disparu
+    _apply(old['projet_id'], deltas, rebuild_if_missing=False)
+
+
+for _label in TRACKED_MODELS:
+    pre_save.connect(stats_pre_save, sender=_label, dispatch_uid=f'project_stats_pre_save_{_label}')
+    post_save.connect(stats_post_save, sender=_label, dispatch_uid=f'project_stats_post_save_{_label}')
+    post_delete.connect(stats_post_delete, sender=_label, dispatch_uid=f'project_stats_post_delete_{_label}')
+
+
+@receiver(post_save, sender=Projet)
+def create_project_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProjectStats.objects.get_or_create(projet=instance)
+
+
+# --- Index d'accès aux projets (projects/access.py) ---
+
+def _invalidate_on_commit(user_ids):
+    user_ids = set(user_ids)
+    invalidate_project_access(user_ids)
+    transaction.on_commit(lambda: invalidate_project_access(user_ids))
+
+
+@receiver(pre_save, sender=Projet)
+def remember_previous_chef(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_chef_projet_id = (
+        Projet.objects.filter(pk=instance.pk).values_list('chef_projet_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Projet)
+def invalidate_chef_access(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_chef_projet_id', None)
+    if created or previous != instance.chef_projet_id:
+        _invalidate_on_commit([previous, instance.chef_projet_id])
+
+
+@receiver(pre_delete, sender=Projet)
+def invalidate_deleted_project_access(sender, instance, **kwargs):
+    members = list(instance.membres.values_list('id', flat=True))
+    _invalidate_on_commit(members + [instance.chef_projet_id])
+
+
+@receiver(m2m_changed, sender=Projet.membres.through)
+def invalidate_member_access(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.projets_participes.add/remove/clear: seul cet utilisateur change
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate_on_commit([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_member_ids = list(instance.membres.values_list('id', flat=True))
+    elif action == 'post_clear':
+        _invalidate_on_commit(getattr(instance, '_cleared_member_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        _invalidate_on_commit(pk_set or [])
@@ -0,0 +1,309 @@
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from . import audit_archive
+from .audit_buffer import AuditBuffer, get_audit_buffer
+from .audit_history import snapshot as audit_snapshot, state_as_of
+from .models import AuditArchive, AuditDailyRollup, AuditLog, AuditTrail, Phase, ProjectStats, Projet
+from .services import AuditRollupService, AuditService
+from .utils import create_audit_log
+
+
+class AuditBufferTests(TransactionTestCase):
+    """Garanties de projects/audit_buffer.py: ordre, nouvel essai, ligne invalide"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('auditeur')
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        self.autre = Projet.objects.create(
+            nom='Chantier B', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        AuditTrail.objects.all().delete()
+        AuditDailyRollup.objects.all().delete()
+        self.buffer = AuditBuffer(max_size=100, max_age=3600, max_retries=3, max_pending=50)
+
+    def event(self, projet, description, user=None):
+        return AuditTrail(
+            action='UPDATE', user=user or self.user, content_type=ContentType.objects.get_for_model(Projet),
+            object_id=projet.id, resource_type='Projet', resource_name=projet.nom, resource_id=projet.id,
+            projet=projet, description=description,
+        )
+
+    def descriptions(self):
+        return list(AuditTrail.objects.order_by('id').values_list('description', flat=True))
+
+    def test_order_is_preserved(self):
+        for i in range(5):
+            self.buffer.add(self.event(self.projet, f'e{i}'))
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(self.descriptions(), [f'e{i}' for i in range(5)])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_transient_failure_requeues_in_order(self):
+        for i in range(3):
+            self.buffer.add(self.event(self.projet, f'e{i}'))
+        with mock.patch.object(AuditTrail.objects, 'bulk_create', side_effect=OperationalError('down')), \
+                mock.patch.object(AuditTrail, 'save', side_effect=OperationalError('down')), \
+                self.assertLogs('projects.audit_buffer', level='WARNING'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 3)
+
+        self.buffer.add(self.event(self.projet, 'e3'))
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.descriptions(), ['e0', 'e1', 'e2', 'e3'])
+        self.assertEqual(self.buffer.dead_letters, 0)
+        self.assertEqual(sum(AuditDailyRollup.objects.values_list('count', flat=True)), 4)
+
+    def test_size_threshold_flushes(self):
+        buffer = AuditBuffer(max_size=3, max_age=3600)
+        for i in range(2):
+            buffer.add(self.event(self.projet, f'e{i}'))
+        self.assertEqual(self.descriptions(), [])
+        buffer.add(self.event(self.projet, 'e2'))
+        self.assertEqual(self.descriptions(), ['e0', 'e1', 'e2'])
+        self.assertEqual(len(buffer), 0)
+
+    def test_poison_row_does_not_block_other_events(self):
+        self.buffer.add(self.event(self.projet, 'orphelin'))
+        self.projet.delete()
+        AuditTrail.objects.all().delete()
+
+        with self.assertLogs('projects.audit_buffer', level='WARNING') as logs:
+            for flush in range(3):
+                self.buffer.add(self.event(self.autre, f'b{flush}'))
+                self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual([r.name for r in logs.records].count('projects.audit_buffer.dead_letter'), 1)
+        # Abandonné après max_retries échecs: le tampon est vide
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.dead_letters, 1)
+        self.assertEqual(self.descriptions(), ['b0', 'b1', 'b2'])
+
+    def test_pending_events_are_bounded(self):
+        with mock.patch.object(AuditTrail.objects, 'bulk_create', side_effect=OperationalError('down')), \
+                mock.patch.object(AuditTrail, 'save', side_effect=OperationalError('down')), \
+                self.assertLogs('projects.audit_buffer', level='WARNING'):
+            for i in range(60):
+                self.buffer.add(self.event(self.projet, f'e{i}'))
+            self.buffer.flush()
+        self.assertEqual(len(self.buffer), 50)
+        self.assertEqual(self.buffer.dead_letters, 10)
+        # Les plus anciens sont abandonnés
+        self.assertEqual(self.buffer.flush(), 50)
+        self.assertEqual(self.descriptions(), [f'e{i}' for i in range(10, 60)])
+
+    def test_service_errors_are_logged(self):
+        with mock.patch.object(AuditTrail, 'log_action', side_effect=RuntimeError('boom')), \
+                self.assertLogs('projects.services', level='ERROR'):
+            self.assertIsNone(AuditService.log_action('UPDATE', self.user, self.projet))
+
+
+class AuditRollupTests(TransactionTestCase):
+    """Compteurs journaliers: chaque événement compté une fois"""
+
+    def setUp(self):
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        AuditDailyRollup.objects.all().delete()
+
+    def event(self, user=None):
+        return AuditTrail(
+            action='UPDATE', user=user, content_type=ContentType.objects.get_for_model(Projet),
+            object_id=self.projet.id, resource_type='Projet', resource_name=self.projet.nom,
+            resource_id=self.projet.id, projet=self.projet, timestamp=timezone.now(),
+        )
+
+    def test_one_row_per_key(self):
+        user = User.objects.create_user('auditeur')
+        for _ in range(3):
+            AuditRollupService.record([self.event(user)])
+        self.assertEqual(list(AuditDailyRollup.objects.values_list('count', flat=True)), [3])
+
+    def test_duplicate_null_keys_are_counted_once(self):
+        # Deux lignes sans utilisateur (utilisateur supprimé): NULL échappe à la contrainte d'unicité
+        for _ in range(2):
+            AuditDailyRollup.objects.create(
+                day=timezone.localdate(), action='UPDATE', resource_type='Projet', projet=self.projet, count=1,
+            )
+        AuditRollupService.record([self.event() for _ in range(3)])
+        self.assertEqual(AuditRollupService.totals(AuditDailyRollup.objects.all()), 5)
+
+
+@override_settings(AUDIT_CHECKPOINT_INTERVAL=3)
+class AuditCheckpointTests(TransactionTestCase):
+    """Points de reprise: bornés par l'intervalle sans dépendre d'un cache partagé"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('auditeur')
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        AuditLog.objects.all().delete()
+
+    def test_projet_checkpoints_every_interval(self):
+        create_audit_log(self.user, 'CREATE', self.projet)
+        for i in range(10):
+            # Un autre processus (cache local différent) ne doit pas retarder le point de reprise
+            cache.clear()
+            before = audit_snapshot(self.projet)
+            self.projet.nom = f'Chantier {i}'
+            self.projet.save()
+            create_audit_log(self.user, 'UPDATE', self.projet, before=before, after=audit_snapshot(self.projet))
+        snapshots = [row is not None for row in AuditLog.objects.order_by('id').values_list('snapshot', flat=True)]
+        self.assertEqual(snapshots, [False, False, False, True, False, False, True, False, False, True, False])
+
+        result = state_as_of(Projet, self.projet.id, timezone.now())
+        self.assertEqual(result['state']['nom'], 'Chantier 9')
+        self.assertLessEqual(result['deltas_replayed'], 2)
+
+    def test_phase_counts_buffered_events(self):
+        phase = Phase.objects.create(
+            projet=self.projet, nom='Gros oeuvre', date_debut=date.today(), date_fin_prevue=date.today(), ordre=1,
+        )
+        buffer = get_audit_buffer()
+        buffer.flush()
+        AuditTrail.objects.all().delete()
+        AuditTrail.log_action('CREATE', self.user, phase, projet=self.projet)
+        for i in range(5):
+            AuditTrail.log_action('UPDATE', self.user, phase, data_before={'ordre': i}, data_after={'ordre': i + 1},
+                                  projet=self.projet)
+        pending = [entry.snapshot is not None for entry in buffer.pending()]
+        buffer.flush()
+        self.assertEqual(pending, [True, False, False, True, False, False])
+
+
+class StateAsOfAccessTests(TransactionTestCase):
+    """state_as_of: permissions vérifiées avant la reconstruction"""
+
+    def setUp(self):
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        create_audit_log(None, 'CREATE', self.projet)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def get(self, object_id, resource_type='projet'):
+        return self.client.get('/api/audit-trail/state_as_of/', {
+            'resource_type': resource_type, 'object_id': object_id, 'at': timezone.now().isoformat(),
+        })
+
+    def test_outsider_cannot_probe_history(self):
+        self.client.force_authenticate(User.objects.create_user('externe'))
+        self.assertEqual(self.get(self.projet.id).status_code, 403)
+        self.assertEqual(self.get(self.projet.id + 1000).status_code, 403)
+        self.assertEqual(self.get(4242, 'phase').status_code, 403)
+
+    def test_staff_gets_not_found_without_history(self):
+        self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.get(self.projet.id).status_code, 200)
+        self.assertEqual(self.get(self.projet.id + 1000).status_code, 404)
+
+
+class AuditArchiveIndexTests(TransactionTestCase):
+    """Archives: historique d'un projet lu dans ses seules archives, agrégats conservés"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.projets = [
+            Projet.objects.create(nom=nom, date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR')
+            for nom in ('Chantier A', 'Chantier B')
+        ]
+        AuditTrail.objects.all().delete()
+        AuditDailyRollup.objects.all().delete()
+        # Un mois ancien par projet
+        for months, projet in zip((14, 16), self.projets):
+            AuditTrail.objects.create(
+                action='UPDATE', content_type=ContentType.objects.get_for_model(Projet), object_id=projet.id,
+                resource_type='Projet', resource_name=projet.nom, resource_id=projet.id, projet=projet,
+                timestamp=timezone.now() - timedelta(days=31 * months),
+            )
+        AuditRollupService.rebuild()
+        self.archives = audit_archive.apply_retention(months=12)
+
+    def read(self, projet):
+        with mock.patch.object(audit_archive, '_read', wraps=audit_archive._read) as read:
+            audits = list(audit_archive.iter_audit_trail(projet_id=projet.id))
+        return audits, [call.args[0].id for call in read.call_args_list]
+
+    def test_rebuild_keeps_archived_months(self):
+        rollups = AuditDailyRollup.objects.all()
+        self.assertEqual(AuditTrail.objects.count(), 0)
+        self.assertEqual(AuditRollupService.totals(rollups), 2)
+        projet = self.projets[0]
+        AuditTrail.objects.create(
+            action='UPDATE', content_type=ContentType.objects.get_for_model(Projet), object_id=projet.id,
+            resource_type='Projet', resource_name=projet.nom, resource_id=projet.id, projet=projet,
+        )
+        AuditRollupService.rebuild()
+        self.assertEqual(AuditRollupService.totals(rollups), 3)
+        self.assertEqual(AuditRollupService.totals(rollups.filter(projet=self.projets[1])), 1)
+
+    def test_other_projects_archives_are_skipped(self):
+        self.assertEqual([archive.projets for archive in self.archives], [[self.projets[1].id], [self.projets[0].id]])
+        for projet, archive in zip(self.projets, reversed(self.archives)):
+            audits, read = self.read(projet)
+            self.assertEqual([audit.projet_id for audit in audits], [projet.id])
+            self.assertEqual(read, [archive.id])
+
+    def test_legacy_archive_is_indexed_on_first_read(self):
+        AuditArchive.objects.update(projets=None)
+        audits, read = self.read(self.projets[0])
+        self.assertEqual(len(audits), 1)
+        self.assertEqual(len(read), 2)
+        self.assertEqual(self.read(self.projets[0])[1], [self.archives[1].id])
+
+
+class PhaseViewSetTests(TransactionTestCase):
+    """Filtre ?projet= des phases"""
+
+    def setUp(self):
+        self.projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        Phase.objects.create(
+            projet=self.projet, nom='Gros oeuvre', date_debut=date.today(), date_fin_prevue=date.today(), ordre=1,
+        )
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+
+    def test_invalid_projet_is_not_a_server_error(self):
+        response = self.client.get('/api/phases/', {'projet': 'abc'})
+        self.assertLess(response.status_code, 500)
+
+    def test_projet_filter(self):
+        response = self.client.get('/api/phases/', {'projet': self.projet.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+
+class ProjectStatsTests(TransactionTestCase):
+    """Statistiques maintenues par signaux"""
+
+    def test_drifted_counter_does_not_block_delete(self):
+        projet = Projet.objects.create(
+            nom='Chantier A', date_debut=date.today(), date_fin_prevue=date.today(), region='DAKAR',
+        )
+        phase = Phase.objects.create(
+            projet=projet, nom='Gros oeuvre', date_debut=date.today(), date_fin_prevue=date.today(), ordre=1,
+        )
+        self.assertEqual(ProjectStats.objects.get(pk=projet.pk).phases_en_attente, 1)
+        # Compteur faussé par une écriture sans signaux
+        ProjectStats.objects.filter(pk=projet.pk).update(phases_en_attente=0)
+        phase.delete()
+        self.assertEqual(ProjectStats.objects.get(pk=projet.pk).phases_en_attente, 0)
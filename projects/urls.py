@@ -14,6 +14,7 @@ router.register(r'audit-logs', views.AuditLogViewSet)
 router.register(r'audit-trail', views.AuditTrailViewSet, basename='audit-trail')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Avant le routeur, sinon 'public' est capturé comme pk de projets/<pk>/
     path('projets/public/', views.PublicProjetViewSet.as_view({'get': 'list'}), name='public-projets'),
+    path('', include(router.urls)),
 ]
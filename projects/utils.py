@@ -1,8 +1,8 @@
 from typing import Any, Optional
 from django.contrib.auth.models import User
 from django.db import transaction
-from django.forms.models import model_to_dict
 
+from .audit_history import checkpoint_snapshot, encode_delta, snapshot
 from .models import AuditLog
 
 
@@ -18,9 +18,16 @@ def create_audit_log(
     resource_repr = str(instance)
     if after is None:
         try:
-            after = model_to_dict(instance)
+            after = snapshot(instance)
         except Exception:
             after = None
+    # Modification: seuls les champs changés sont conservés
+    if action == 'UPDATE':
+        before, after = encode_delta(before, after)
+    checkpoint = checkpoint_snapshot(action, instance)
+    if action == 'CREATE':
+        # ``after`` contient déjà l'état complet de la création
+        checkpoint = None
 
     with transaction.atomic():
         AuditLog.objects.create(
@@ -31,6 +38,7 @@ def create_audit_log(
             resource_repr=resource_repr,
             before=before,
             after=after,
+            snapshot=checkpoint,
         )
 
 
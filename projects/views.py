@@ -2,23 +2,37 @@ from rest_framework import viewsets, status, filters
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from django.db import models
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import islice
 import json
 from rest_framework.exceptions import PermissionDenied
 from rest_framework import serializers
 
-from .models import Projet, Risque, Phase, Budget, Action, Notification, Commentaire, AuditLog, AuditTrail
+from .models import Projet, Risque, Phase, Budget, Action, Notification, Commentaire, AuditLog, AuditTrail, AuditDailyRollup
 from .serializers import (
     ProjetSerializer, RisqueSerializer, PhaseSerializer, BudgetSerializer,
     ActionSerializer, NotificationSerializer, CommentaireSerializer, AuditLogSerializer,
     AuditTrailSerializer, AuditTrailListSerializer
 )
 from .utils import create_audit_log
-from .services import ProjectExportService
+from .audit_history import snapshot as audit_snapshot, state_as_of
+from .audit_archive import iter_audit_trail, parse_bound
+from .services import AuditExportService, AuditRollupService, ProjectExportService, ProjectStatsService
+from users.models import ProfilUtilisateur
+from users.permissions import get_compiled_permissions
+from .access import accessible_project_ids, can_access_project, visible_projects
 
 class ProjetViewSet(viewsets.ModelViewSet):
     queryset = Projet.objects.all()
@@ -29,17 +43,16 @@ class ProjetViewSet(viewsets.ModelViewSet):
         """Filtrer les projets selon les permissions de l'utilisateur"""
         user = self.request.user
         
-        if hasattr(user, 'profilutilisateur'):
-            if user.profilutilisateur.role == 'ADMINISTRATEUR':
+        # Rôle et permissions compilés (mémorisés par requête et en cache)
+        compiled = get_compiled_permissions(user, create_missing=False)
+        if compiled is not None:
+            if compiled.role == 'ADMINISTRATEUR':
                 return Projet.objects.all()
-            elif user.profilutilisateur.has_permission('peut_gerer_utilisateurs'):
+            elif ProfilUtilisateur.mask_allows(compiled.mask, 'peut_gerer_utilisateurs'):
                 return Projet.objects.all()
             else:
-                # Utilisateurs normaux voient leurs projets
-                return Projet.objects.filter(
-                    models.Q(chef_projet=user) | 
-                    models.Q(membres=user)
-                ).distinct()
+                # Utilisateurs normaux voient leurs projets (index d'accès en cache)
+                return visible_projects(user)
         return Projet.objects.none()
     
     def create(self, request, *args, **kwargs):
@@ -82,8 +95,7 @@ class ProjetViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         before = None
         try:
-            from django.forms.models import model_to_dict
-            before = model_to_dict(instance)
+            before = audit_snapshot(instance)
         except Exception:
             pass
         response = super().update(request, *args, **kwargs)
@@ -110,8 +122,7 @@ class ProjetViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         before = None
         try:
-            from django.forms.models import model_to_dict
-            before = model_to_dict(instance)
+            before = audit_snapshot(instance)
         except Exception:
             pass
         response = super().destroy(request, *args, **kwargs)
@@ -146,22 +157,17 @@ class PhaseViewSet(viewsets.ModelViewSet):
         projet_id = self.request.query_params.get('projet')
         if projet_id:
             try:
-                projet = Projet.objects.get(id=projet_id)
-                # Vérifier les permissions sur ce projet
-                if not (user.is_staff or 
-                       projet.chef_projet == user or 
-                       user in projet.membres.all()):
-                    return Phase.objects.none()  # Aucun accès
-                queryset = queryset.filter(projet=projet)
-            except Projet.DoesNotExist:
-                return Phase.objects.none()
+                projet_id = int(projet_id)
+            except (TypeError, ValueError):
+                return queryset.none()
+            # Vérifier les permissions sur ce projet
+            if not (user.is_staff or can_access_project(user, projet_id)):
+                return Phase.objects.none()  # Aucun accès
+            queryset = queryset.filter(projet_id=projet_id)
         else:
             # Si aucun projet spécifié, filtrer par les projets de l'utilisateur
             if not user.is_staff:
-                user_projects = Projet.objects.filter(
-                    Q(chef_projet=user) | Q(membres=user)
-                ).distinct()
-                queryset = queryset.filter(projet__in=user_projects)
+                queryset = queryset.filter(projet_id__in=accessible_project_ids(user))
         
         return queryset
     
@@ -176,9 +182,7 @@ class PhaseViewSet(viewsets.ModelViewSet):
             user = self.request.user
             
             # Vérifier les permissions
-            if not (user.is_staff or 
-                   projet.chef_projet == user or 
-                   user in projet.membres.all()):
+            if not (user.is_staff or can_access_project(user, projet)):
                 raise PermissionDenied("Vous n'avez pas les permissions pour créer des phases dans ce projet")
             
             # Vérifier que l'ordre est unique dans le projet
@@ -218,9 +222,7 @@ class PhaseViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         # Vérifier les permissions
-        if not (user.is_staff or 
-               phase.projet.chef_projet == user or 
-               user in phase.projet.membres.all()):
+        if not (user.is_staff or can_access_project(user, phase.projet_id)):
             raise PermissionDenied("Vous n'avez pas les permissions pour modifier cette phase")
         
         # Sauvegarder les données avant modification pour l'audit
@@ -266,9 +268,7 @@ class PhaseViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         # Vérifier les permissions
-        if not (user.is_staff or 
-               instance.projet.chef_projet == user or 
-               user in instance.projet.membres.all()):
+        if not (user.is_staff or can_access_project(user, instance.projet_id)):
             raise PermissionDenied("Vous n'avez pas les permissions pour supprimer cette phase")
         
         # Enregistrer l'action dans l'audit avant suppression
@@ -303,9 +303,7 @@ class PhaseViewSet(viewsets.ModelViewSet):
             user = request.user
             
             # Vérifier les permissions
-            if not (user.is_staff or 
-                   projet.chef_projet == user or 
-                   user in projet.membres.all()):
+            if not (user.is_staff or can_access_project(user, projet)):
                 return Response(
                     {'error': 'Accès non autorisé'}, 
                     status=status.HTTP_403_FORBIDDEN
@@ -314,21 +312,14 @@ class PhaseViewSet(viewsets.ModelViewSet):
             # Récupérer les phases du projet
             phases = Phase.objects.filter(projet=projet).order_by('ordre')
             
-            # Calculer la progression du projet
-            total_phases = phases.count()
-            completed_phases = phases.filter(statut='TERMINEE').count()
-            in_progress_phases = phases.filter(statut='EN_COURS').count()
-            pending_phases = phases.filter(statut='EN_ATTENTE').count()
-            
-            progression = int((completed_phases / total_phases) * 100) if total_phases > 0 else 0
-            
-            # Statistiques des phases
+            # Statistiques des phases (lecture de ProjectStats par clé primaire)
+            projet_stats = ProjectStatsService.get(projet.id)
             stats = {
-                'total_phases': total_phases,
-                'completed_phases': completed_phases,
-                'in_progress_phases': in_progress_phases,
-                'pending_phases': pending_phases,
-                'progression': progression
+                'total_phases': projet_stats.total_phases,
+                'completed_phases': projet_stats.phases_terminees,
+                'in_progress_phases': projet_stats.phases_en_cours,
+                'pending_phases': projet_stats.phases_en_attente,
+                'progression': projet_stats.progression
             }
             
             return Response({
@@ -398,9 +389,7 @@ class PhaseViewSet(viewsets.ModelViewSet):
             user = request.user
             
             # Vérifier les permissions
-            if not (user.is_staff or 
-                   projet.chef_projet == user or 
-                   user in projet.membres.all()):
+            if not (user.is_staff or can_access_project(user, projet)):
                 return Response(
                     {'error': 'Accès non autorisé'}, 
                     status=status.HTTP_403_FORBIDDEN
@@ -478,12 +467,24 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['resource_type', 'resource_id', 'utilisateur__id', 'action']
     ordering = ['-date_creation']
 
+class PublicProjetMapPagination(CursorPagination):
+    """Pagination par curseur (clé = id) pour le flux de la carte publique"""
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+    ordering = 'id'
+
+
 class PublicProjetViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les projets publics (accessible sans authentification)"""
     queryset = Projet.objects.all()
     serializer_class = ProjetSerializer
     permission_classes = [AllowAny]
     authentication_classes = []  # Disable authentication for this viewset
+    ordering = ['id']
+
+    # Champs du flux compact de la carte (?mode=map)
+    MAP_FIELDS = ('id', 'nom', 'region', 'departement', 'statut')
     
     def get_queryset(self):
         """Retourner tous les projets publics avec informations limitées"""
@@ -508,53 +509,141 @@ class PublicProjetViewSet(viewsets.ReadOnlyModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """Retourner les projets avec des données enrichies pour la carte"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        if request.query_params.get('mode') == 'map':
+            return self.map_feed(request)
+
+        projects = list(self.get_queryset().prefetch_related('membres'))
+        serializer = self.get_serializer(projects, many=True)
+        # Progression lue dans ProjectStats en une seule requête (pas de COUNT par projet)
+        stats = ProjectStatsService.for_projets(project.id for project in projects)
         
         # Enrichir les données pour la carte
         projects_data = []
-        for project in queryset:
-            project_data = serializer.data[queryset.index(project)]
-            
-            # Calculer la progression (exemple basé sur les phases)
-            phases = project.phase_set.all()
-            if phases.exists():
-                completed_phases = phases.filter(statut='TERMINE').count()
-                total_phases = phases.count()
-                progression = int((completed_phases / total_phases) * 100) if total_phases > 0 else 0
-            else:
-                progression = 0
-            
-            # Enrichir les données pour la carte
-            project_data['progression'] = progression
-            # Remove latitude and longitude fields
-            
+        for project, project_data in zip(projects, serializer.data):
+            project_data['progression'] = stats[project.id].progression
             projects_data.append(project_data)
         
         return Response(projects_data)
 
+    def map_feed(self, request):
+        """Flux compact et paginé par curseur pour la carte publique"""
+        paginator = PublicProjetMapPagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset().values(*self.MAP_FIELDS), request, view=self
+        )
+
+        # Une seule lecture de ProjectStats pour toute la page: le coût d'une
+        # page ne dépend pas de la taille du portefeuille
+        stats = ProjectStatsService.for_projets(row['id'] for row in page)
+
+        results = []
+        for row in page:
+            row['progression'] = stats[row['id']].progression
+            results.append(row)
+
+        return paginator.get_paginated_response(results)
+
+class AuditTrailCursorPagination(CursorPagination):
+    """Pagination par curseur sur (timestamp, id): coût constant quelle que soit la profondeur"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-timestamp', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # L'ordre doit rester celui de l'index (timestamp, id), même avec ?ordering=
+        return self.ordering
+
+
+class AuditTrailPagination(PageNumberPagination):
+    """Pagination de la traçabilité.
+
+    - par défaut: pagination par numéro de page (count/next/previous/results);
+    - ``?count=false``: même format sans le COUNT(*) de la table (count = null);
+    - ``?pagination=cursor`` (ou ``?cursor=``): pagination par curseur sur
+      (timestamp, id), sans COUNT ni OFFSET, pour les pages profondes.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        self.without_count = False
+
+        if request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params:
+            self.cursor_paginator = AuditTrailCursorPagination()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        if request.query_params.get('count', '').lower() in ('0', 'false'):
+            return self._paginate_without_count(queryset, request)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def _paginate_without_count(self, queryset, request):
+        self.without_count = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound('Page invalide.')
+        if self.page_number < 1:
+            raise NotFound('Page invalide.')
+
+        # Une ligne de plus que la page pour savoir s'il existe une page suivante
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        if self.without_count:
+            url = self.request.build_absolute_uri()
+            next_url = replace_query_param(url, self.page_query_param, self.page_number + 1) if self.has_next else None
+            previous_url = None
+            if self.page_number > 1:
+                previous_url = replace_query_param(url, self.page_query_param, self.page_number - 1)
+            return Response({
+                'count': None,
+                'next': next_url,
+                'previous': previous_url,
+                'results': data,
+            })
+
+        return super().get_paginated_response(data)
+
+
 class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet pour la traçabilité et l'audit"""
     
     queryset = AuditTrail.objects.all()
     serializer_class = AuditTrailListSerializer
+    pagination_class = AuditTrailPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['action', 'resource_type', 'user', 'projet']
     search_fields = ['resource_name', 'description', 'user__username']
     ordering_fields = ['timestamp', 'action', 'resource_type']
-    ordering = ['-timestamp']
+    ordering = ['-timestamp', '-id']
+
+    # Colonnes lues par AuditTrailListSerializer (liste allégée)
+    LIST_FIELDS = (
+        'id', 'action', 'timestamp', 'resource_type', 'resource_name',
+        'resource_id', 'description', 'user__username',
+    )
     
     def get_queryset(self):
         """Filtrer les audits selon les permissions de l'utilisateur"""
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('user')
+        if self.action == 'list':
+            queryset = queryset.only(*self.LIST_FIELDS)
         
         # Si l'utilisateur n'est pas admin, filtrer par ses projets
         if not self.request.user.is_staff:
-            user_projects = Projet.objects.filter(
-                Q(chef_projet=self.request.user) | Q(membres=self.request.user)
-            ).distinct()
-            queryset = queryset.filter(projet__in=user_projects)
+            queryset = queryset.filter(projet_id__in=accessible_project_ids(self.request.user))
         
         return queryset
     
@@ -572,34 +661,33 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
             projet = Projet.objects.get(id=projet_id)
             
             # Vérifier les permissions
-            if not (request.user.is_staff or 
-                   projet.chef_projet == request.user or 
-                   request.user in projet.membres.all()):
+            if not (request.user.is_staff or can_access_project(request.user, projet)):
                 return Response(
                     {'error': 'Accès non autorisé'}, 
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Récupérer tous les audits liés au projet
-            audits = AuditTrail.objects.filter(projet=projet).order_by('-timestamp')
+            # Récupérer tous les audits liés au projet (en base et archivés)
+            audits = list(iter_audit_trail(projet_id=projet.id))
+            historique = AuditTrailSerializer(audits, many=True).data
             
             # Grouper par type de ressource
             grouped_audits = {}
-            for audit in audits:
-                resource_type = audit.resource_type
-                if resource_type not in grouped_audits:
-                    grouped_audits[resource_type] = []
-                grouped_audits[resource_type].append(AuditTrailSerializer(audit).data)
+            for audit, data in zip(audits, historique):
+                grouped_audits.setdefault(audit.resource_type, []).append(data)
             
             # Statistiques
+            def _counts(field, key):
+                counter = Counter(key(audit) for audit in audits)
+                return [{field: value, 'count': count} for value, count in counter.items()]
+            
+            since = timezone.now() - timedelta(days=7)
             stats = {
-                'total_actions': audits.count(),
-                'actions_by_type': audits.values('action').annotate(count=Count('id')),
-                'actions_by_resource': audits.values('resource_type').annotate(count=Count('id')),
-                'actions_by_user': audits.values('user__username').annotate(count=Count('id')),
-                'recent_activity': audits.filter(
-                    timestamp__gte=timezone.now() - timedelta(days=7)
-                ).count()
+                'total_actions': len(audits),
+                'actions_by_type': _counts('action', lambda audit: audit.action),
+                'actions_by_resource': _counts('resource_type', lambda audit: audit.resource_type),
+                'actions_by_user': _counts('user__username', lambda audit: audit.user.username if audit.user else None),
+                'recent_activity': sum(1 for audit in audits if audit.timestamp >= since)
             }
             
             return Response({
@@ -610,7 +698,7 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
                 },
                 'statistiques': stats,
                 'historique_par_type': grouped_audits,
-                'historique_complet': AuditTrailSerializer(audits, many=True).data
+                'historique_complet': historique
             })
             
         except Projet.DoesNotExist:
@@ -633,21 +721,23 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Récupérer l'activité de l'utilisateur
         audits = AuditTrail.objects.filter(user_id=user_id).order_by('-timestamp')
+        # Statistiques lues dans les agrégats journaliers (périodes en jours calendaires)
+        rollups = AuditDailyRollup.objects.filter(user_id=user_id)
         
         # Statistiques par période
-        now = timezone.now()
+        today = timezone.localdate()
         periods = {
-            'aujourd_hui': audits.filter(timestamp__date=now.date()).count(),
-            'cette_semaine': audits.filter(timestamp__gte=now - timedelta(days=7)).count(),
-            'ce_mois': audits.filter(timestamp__gte=now - timedelta(days=30)).count(),
-            'total': audits.count()
+            'aujourd_hui': AuditRollupService.totals(rollups.filter(day=today)),
+            'cette_semaine': AuditRollupService.totals(rollups.filter(day__gt=today - timedelta(days=7))),
+            'ce_mois': AuditRollupService.totals(rollups.filter(day__gt=today - timedelta(days=30))),
+            'total': AuditRollupService.totals(rollups)
         }
         
         # Actions par type
-        actions_by_type = audits.values('action').annotate(count=Count('id'))
+        actions_by_type = rollups.values('action').annotate(count=Sum('count')).order_by()
         
         # Projets sur lesquels l'utilisateur a travaillé
-        projets_actifs = audits.values('projet__nom', 'projet__id').distinct()
+        projets_actifs = rollups.values('projet__nom', 'projet__id').distinct()
         
         return Response({
             'utilisateur': {
@@ -669,35 +759,33 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        now = timezone.now()
+        # Statistiques lues dans les agrégats journaliers (périodes en jours calendaires)
+        today = timezone.localdate()
+        rollups = AuditDailyRollup.objects.all()
+        week = rollups.filter(day__gt=today - timedelta(days=7))
         
         # Statistiques globales
         stats = {
-            'total_actions': AuditTrail.objects.count(),
-            'actions_aujourd_hui': AuditTrail.objects.filter(
-                timestamp__date=now.date()
-            ).count(),
-            'actions_cette_semaine': AuditTrail.objects.filter(
-                timestamp__gte=now - timedelta(days=7)
-            ).count(),
-            'utilisateurs_actifs': AuditTrail.objects.filter(
-                timestamp__gte=now - timedelta(days=7)
-            ).values('user').distinct().count(),
-            'projets_actifs': AuditTrail.objects.filter(
-                timestamp__gte=now - timedelta(days=7)
-            ).values('projet').distinct().count()
+            'total_actions': AuditRollupService.totals(rollups),
+            'actions_aujourd_hui': AuditRollupService.totals(rollups.filter(day=today)),
+            'actions_cette_semaine': AuditRollupService.totals(week),
+            'utilisateurs_actifs': week.values('user').distinct().count(),
+            'projets_actifs': week.values('projet').distinct().count()
         }
         
         # Actions par type
-        actions_by_type = AuditTrail.objects.values('action').annotate(count=Count('id'))
+        actions_by_type = rollups.values('action').annotate(count=Sum('count')).order_by()
         
         # Activité par ressource
-        activity_by_resource = AuditTrail.objects.values('resource_type').annotate(count=Count('id'))
+        activity_by_resource = rollups.values('resource_type').annotate(count=Sum('count')).order_by()
         
-        # Utilisateurs les plus actifs
-        top_users = AuditTrail.objects.values('user__username').annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
+        # Utilisateurs les plus actifs (regroupement par id, noms lus ensuite pour 10 lignes)
+        top = list(rollups.values('user_id').annotate(count=Sum('count')).order_by('-count')[:10])
+        usernames = dict(User.objects.filter(id__in=[row['user_id'] for row in top]).values_list('id', 'username'))
+        top_users = [
+            {'user__username': usernames.get(row['user_id']), 'count': row['count']}
+            for row in top
+        ]
         
         return Response({
             'statistiques_globales': stats,
@@ -706,6 +794,53 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
             'utilisateurs_plus_actifs': top_users
         })
     
+    @action(detail=False, methods=['get'])
+    def state_as_of(self, request):
+        """Reconstruire un projet ou une phase à une date (?resource_type=projet|phase&object_id=&at=)"""
+        models_by_type = {'projet': Projet, 'phase': Phase}
+        model = models_by_type.get((request.query_params.get('resource_type') or '').lower())
+        object_id = request.query_params.get('object_id')
+        at = parse_datetime(request.query_params.get('at') or '')
+        if model is None or not (object_id or '').isdigit() or at is None:
+            return Response(
+                {'error': 'resource_type (projet|phase), object_id et at (date ISO 8601) requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        
+        # Permissions vérifiées avant toute reconstruction: la réponse ne révèle pas
+        # l'existence d'un historique (l'objet peut avoir été supprimé depuis)
+        if not request.user.is_staff:
+            if model is Projet:
+                projet_id = int(object_id)
+            else:
+                projet_id = Phase.objects.filter(id=object_id).values_list('projet_id', flat=True).first()
+                if projet_id is None:
+                    projet_id = AuditTrail.objects.filter(
+                        content_type=ContentType.objects.get_for_model(Phase), object_id=object_id,
+                        projet__isnull=False,
+                    ).values_list('projet_id', flat=True).first()
+            if not can_access_project(request.user, projet_id):
+                return Response(
+                    {'error': 'Accès non autorisé'}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        result = state_as_of(model, int(object_id), at)
+        if result is None:
+            return Response(
+                {'error': "Aucun point de reprise antérieur à cette date"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'resource_type': model.__name__,
+            'object_id': int(object_id),
+            'at': at,
+            **result,
+        })
+    
     @action(detail=False, methods=['get'])
     def export_audit(self, request):
         """Exporter les données d'audit (admin seulement)"""
@@ -721,37 +856,33 @@ class AuditTrailViewSet(viewsets.ReadOnlyModelViewSet):
         action_type = request.query_params.get('action')
         resource_type = request.query_params.get('resource_type')
         
-        queryset = self.get_queryset()
-        
-        # Appliquer les filtres
-        if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
-        if action_type:
-            queryset = queryset.filter(action=action_type)
-        if resource_type:
-            queryset = queryset.filter(resource_type=resource_type)
-        
-        # Limiter le nombre de résultats pour l'export
-        queryset = queryset[:10000]  # Max 10k enregistrements
-        
-        # Préparer les données pour l'export
-        export_data = []
-        for audit in queryset:
-            export_data.append({
-                'Date': audit.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                'Action': audit.get_action_display(),
-                'Utilisateur': audit.user.username if audit.user else 'Système',
-                'Type_Ressource': audit.resource_type,
-                'Nom_Ressource': audit.resource_name,
-                'ID_Ressource': audit.resource_id,
-                'Projet': audit.projet.nom if audit.projet else 'N/A',
-                'Description': audit.description,
-                'IP': audit.ip_address or 'N/A',
-                'Données_Avant': json.dumps(audit.data_before) if audit.data_before else 'N/A',
-                'Données_Après': json.dumps(audit.data_after) if audit.data_after else 'N/A'
-            })
+        try:
+            start, end = parse_bound(start_date), parse_bound(end_date)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Lignes en base puis archives du mois concerné, du plus récent au plus ancien
+        audits = iter_audit_trail(
+            start=start, end=end, action=action_type or None, resource_type=resource_type or None
+        )
+        
+        # Export en flux, sans limite de lignes: ?export_format=csv|ndjson[&compression=gzip]
+        export_format = request.query_params.get('export_format')
+        if export_format:
+            if export_format not in AuditExportService.FORMATS:
+                return Response(
+                    {'error': f"Format d'export invalide. Formats disponibles: {', '.join(AuditExportService.FORMATS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            compress = request.query_params.get('compression') == 'gzip'
+            stream, content_type, extension = AuditExportService.stream(audits, export_format, compress)
+            response = StreamingHttpResponse(stream, content_type=content_type)
+            filename = f"audit_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        
+        # Préparer les données pour l'export JSON (limité à 10k enregistrements)
+        export_data = [AuditExportService.row(audit) for audit in islice(audits, 10000)]
         
         return Response({
             'message': f'Export de {len(export_data)} enregistrements',
@@ -4,6 +4,8 @@ from rest_framework import status
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 
+from .permissions import user_has_permission, user_role
+
 def require_permission(permission_name):
     """
     Décorateur pour vérifier les permissions d'un utilisateur
@@ -18,13 +20,8 @@ def require_permission(permission_name):
                 )
             
             try:
-                # Garantir l'existence du profil
-                from .models import ProfilUtilisateur
-                profil, _ = ProfilUtilisateur.objects.get_or_create(
-                    utilisateur=request.user,
-                    defaults={'role': 'ADMINISTRATEUR' if getattr(request.user, 'is_superuser', False) else 'GESTIONNAIRE'}
-                )
-                if not profil.has_permission(permission_name):
+                # Permissions compilées en cache (profil créé seulement s'il manque)
+                if not user_has_permission(request.user, permission_name):
                     return Response(
                         {'message': f'Permission "{permission_name}" requise'}, 
                         status=status.HTTP_403_FORBIDDEN
@@ -53,13 +50,8 @@ def require_role(role_name):
                 )
             
             try:
-                # Garantir l'existence du profil
-                from .models import ProfilUtilisateur
-                profil, _ = ProfilUtilisateur.objects.get_or_create(
-                    utilisateur=request.user,
-                    defaults={'role': 'ADMINISTRATEUR' if getattr(request.user, 'is_superuser', False) else 'GESTIONNAIRE'}
-                )
-                if profil.role != role_name:
+                # Rôle compilé en cache (profil créé seulement s'il manque)
+                if user_role(request.user) != role_name:
                     return Response(
                         {'message': f'Rôle "{role_name}" requis'}, 
                         status=status.HTTP_403_FORBIDDEN
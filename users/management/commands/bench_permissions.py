@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import ProfilUtilisateur
+from users.permissions import CACHE_KEY, user_has_permission
+
+
+class _Rollback(Exception):
+    """Annule l'utilisateur créé pour le benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark du coût d'une vérification de permission: ancien chemin "
+        "(get_or_create + dict de permissions) contre masque compilé en cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--checks-per-request', type=int, default=5,
+                            help="Vérifications simulées par requête")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        per_request = options['checks_per_request']
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user('bench-permissions', 'bench@example.com', 'x')
+                ProfilUtilisateur.objects.get_or_create(utilisateur=user, defaults={'role': 'GESTIONNAIRE'})
+                self._report(iterations, per_request, user)
+                raise _Rollback
+        except _Rollback:
+            pass
+        cache.delete(CACHE_KEY.format(user_id=user.pk))
+
+    def _report(self, iterations, per_request, user):
+        def legacy_check():
+            profil, _ = ProfilUtilisateur.objects.get_or_create(
+                utilisateur=user,
+                defaults={'role': 'GESTIONNAIRE'}
+            )
+            # Reconstruction complète du dict, comme l'ancien get_permissions()
+            permissions = {name: getattr(profil, name) for name in ProfilUtilisateur.PERMISSION_FIELDS}
+            permissions.update(ProfilUtilisateur.ROLE_PERMISSIONS.get(profil.role, {}))
+            return permissions.get('peut_modifier_projet', False)
+
+        def compiled_check(request_user):
+            return user_has_permission(request_user, 'peut_modifier_projet')
+
+        total_checks = iterations * per_request
+
+        start = time.perf_counter()
+        for _ in range(total_checks):
+            legacy_check()
+        legacy = (time.perf_counter() - start) / total_checks
+
+        # Nouvel objet utilisateur par "requête": le cache inter-requêtes sert la
+        # première vérification, la mémoïsation par requête les suivantes
+        cache.delete(CACHE_KEY.format(user_id=user.pk))
+        start = time.perf_counter()
+        for _ in range(iterations):
+            request_user = User(pk=user.pk, username=user.username)
+            for _ in range(per_request):
+                compiled_check(request_user)
+        compiled = (time.perf_counter() - start) / total_checks
+
+        self.stdout.write(f"Vérifications: {total_checks} ({per_request} par requête)")
+        self.stdout.write(f"Avant (get_or_create + dict): {legacy * 1e6:10.2f} µs / vérification")
+        self.stdout.write(f"Après (masque compilé)     : {compiled * 1e6:10.2f} µs / vérification")
+        self.stdout.write(f"Accélération               : x{legacy / compiled:.1f}")
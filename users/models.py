@@ -25,50 +25,65 @@ class ProfilUtilisateur(models.Model):
     def __str__(self):
         return f"{self.utilisateur.username} - {self.get_role_display()}"
     
+    # Permissions dans l'ordre des bits du masque compilé
+    PERMISSION_FIELDS = (
+        'peut_creer_projet',
+        'peut_modifier_projet',
+        'peut_supprimer_projet',
+        'peut_gerer_utilisateurs',
+        'peut_voir_analytics',
+        'peut_exporter_donnees',
+    )
+    PERMISSION_BITS = {name: 1 << position for position, name in enumerate(PERMISSION_FIELDS)}
+
+    # Permissions imposées par le rôle (prioritaires sur les champs du profil)
+    ROLE_PERMISSIONS = {
+        'ADMINISTRATEUR': {
+            'peut_creer_projet': True,
+            'peut_modifier_projet': True,
+            'peut_supprimer_projet': True,
+            'peut_gerer_utilisateurs': True,
+            'peut_voir_analytics': True,
+            'peut_exporter_donnees': True,
+        },
+        'GESTIONNAIRE': {
+            'peut_creer_projet': True,
+            'peut_modifier_projet': True,
+            'peut_supprimer_projet': False,
+            'peut_gerer_utilisateurs': False,
+            'peut_voir_analytics': True,
+            'peut_exporter_donnees': True,
+        },
+        'CONSULTANT': {
+            'peut_creer_projet': False,
+            'peut_modifier_projet': False,
+            'peut_supprimer_projet': False,
+            'peut_gerer_utilisateurs': False,
+            'peut_voir_analytics': True,
+            'peut_exporter_donnees': True,
+        },
+    }
+    
+    def compile_permissions(self):
+        """Retourne les permissions effectives (rôle + champs du profil) sous forme de masque de bits"""
+        permissions = {name: getattr(self, name) for name in self.PERMISSION_FIELDS}
+        permissions.update(self.ROLE_PERMISSIONS.get(self.role, {}))
+        mask = 0
+        for name, allowed in permissions.items():
+            if allowed:
+                mask |= self.PERMISSION_BITS[name]
+        return mask
+
+    @classmethod
+    def mask_allows(cls, mask, permission_name):
+        """Vérifie une permission dans un masque compilé"""
+        return bool(mask & cls.PERMISSION_BITS.get(permission_name, 0))
+    
     def get_permissions(self):
         """Retourne les permissions de l'utilisateur"""
-        permissions = {
-            'peut_creer_projet': self.peut_creer_projet,
-            'peut_modifier_projet': self.peut_modifier_projet,
-            'peut_supprimer_projet': self.peut_supprimer_projet,
-            'peut_gerer_utilisateurs': self.peut_gerer_utilisateurs,
-            'peut_voir_analytics': self.peut_voir_analytics,
-            'peut_exporter_donnees': self.peut_exporter_donnees,
-        }
-        
-        # Permissions basées sur le rôle
-        if self.role == 'ADMINISTRATEUR':
-            permissions.update({
-                'peut_creer_projet': True,
-                'peut_modifier_projet': True,
-                'peut_supprimer_projet': True,
-                'peut_gerer_utilisateurs': True,
-                'peut_voir_analytics': True,
-                'peut_exporter_donnees': True,
-            })
-        elif self.role == 'GESTIONNAIRE':
-            permissions.update({
-                'peut_creer_projet': True,
-                'peut_modifier_projet': True,
-                'peut_supprimer_projet': False,
-                'peut_gerer_utilisateurs': False,
-                'peut_voir_analytics': True,
-                'peut_exporter_donnees': True,
-            })
-        elif self.role == 'CONSULTANT':
-            permissions.update({
-                'peut_creer_projet': False,
-                'peut_modifier_projet': False,
-                'peut_supprimer_projet': False,
-                'peut_gerer_utilisateurs': False,
-                'peut_voir_analytics': True,
-                'peut_exporter_donnees': True,
-            })
-
-        
-        return permissions
+        mask = self.compile_permissions()
+        return {name: self.mask_allows(mask, name) for name in self.PERMISSION_FIELDS}
     
     def has_permission(self, permission_name):
         """Vérifie si l'utilisateur a une permission spécifique"""
-        permissions = self.get_permissions()
-        return permissions.get(permission_name, False)
\ No newline at end of file
+        return self.mask_allows(self.compile_permissions(), permission_name)
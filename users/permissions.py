@@ -0,0 +1,75 @@
+"""
+Cache des permissions compilées (rôle + masque de bits) des utilisateurs.
+
+Deux niveaux:
+- par requête: le résultat est mémorisé sur l'objet ``request.user``;
+- entre requêtes: cache Django (clé par utilisateur), invalidé par les signaux
+  post_save / post_delete de ProfilUtilisateur (donc aussi par update_user_role).
+
+Avec plusieurs workers, configurer un backend CACHES partagé (Redis, Memcached)
+pour que l'invalidation soit vue par tous; avec le cache mémoire local par défaut,
+les autres workers voient le changement au plus tard après PERMISSION_CACHE_TIMEOUT.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ProfilUtilisateur
+
+CompiledPermissions = namedtuple('CompiledPermissions', ['role', 'mask'])
+
+CACHE_KEY = 'users:permissions:{user_id}'
+_REQUEST_ATTR = '_compiled_permissions'
+
+
+def _cache_timeout():
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def get_compiled_permissions(user, create_missing=True):
+    """Retourne CompiledPermissions(role, mask) de l'utilisateur, ou None sans profil.
+
+    Le profil n'est créé (seule écriture possible) que s'il est absent et que
+    create_missing est vrai, avec le même rôle par défaut que les décorateurs.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return None
+
+    compiled = getattr(user, _REQUEST_ATTR, None)
+    if compiled is not None:
+        return compiled
+
+    key = CACHE_KEY.format(user_id=user.pk)
+    compiled = cache.get(key)
+    if compiled is None:
+        profil = ProfilUtilisateur.objects.filter(utilisateur=user).first()
+        if profil is None:
+            if not create_missing:
+                return None
+            profil, _ = ProfilUtilisateur.objects.get_or_create(
+                utilisateur=user,
+                defaults={'role': 'ADMINISTRATEUR' if getattr(user, 'is_superuser', False) else 'GESTIONNAIRE'}
+            )
+        compiled = CompiledPermissions(profil.role, profil.compile_permissions())
+        cache.set(key, tuple(compiled), _cache_timeout())
+    else:
+        compiled = CompiledPermissions(*compiled)
+
+    setattr(user, _REQUEST_ATTR, compiled)
+    return compiled
+
+
+def user_has_permission(user, permission_name, create_missing=True):
+    compiled = get_compiled_permissions(user, create_missing=create_missing)
+    return compiled is not None and ProfilUtilisateur.mask_allows(compiled.mask, permission_name)
+
+
+def user_role(user, create_missing=True):
+    compiled = get_compiled_permissions(user, create_missing=create_missing)
+    return compiled.role if compiled is not None else None
+
+
+def invalidate_permissions(user_id):
+    """Supprime les permissions compilées d'un utilisateur du cache inter-requêtes"""
+    cache.delete(CACHE_KEY.format(user_id=user_id))
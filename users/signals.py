@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import ProfilUtilisateur
+from .permissions import invalidate_permissions
 
 
 @receiver(post_save, sender=User)
@@ -18,3 +20,11 @@ def save_user_profile(sender, instance, **kwargs):
         role = 'ADMINISTRATEUR' if instance.is_superuser else 'GESTIONNAIRE'
         ProfilUtilisateur.objects.create(utilisateur=instance, role=role)
 
+
+@receiver(post_save, sender=ProfilUtilisateur)
+@receiver(post_delete, sender=ProfilUtilisateur)
+def invalidate_profile_permissions(sender, instance, **kwargs):
+    # Rôle ou permissions modifiés (ex: update_user_role): vider le cache compilé,
+    # puis à nouveau au commit pour écarter une relecture concurrente de l'ancien état
+    invalidate_permissions(instance.utilisateur_id)
+    transaction.on_commit(lambda: invalidate_permissions(instance.utilisateur_id))